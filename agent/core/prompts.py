@@ -1,10 +1,7 @@
-from langsmith import Client
 from agent.utils import routes
 
 """Default prompts."""
 
-client = Client()
-
 ROUTER_SYSTEM_PROMPT = """Classify the best action route for answering the provided query.
 
 
@@ -1,16 +1,18 @@
 """Shared utility functions used in the project.
 
 Functions:
-    format_docs: Convert documents to an xml-formatted string.
+    format_docs: Convert documents to a compact prompt string.
 """
 
+import re
+import threading
 import uuid
-from typing import Any, Literal, Optional, Union
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Literal, Optional, Union
 
 from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
-from langsmith import traceable
 
 search_scope_type = {
                 "search_scope_type": [
@@ -32,25 +34,75 @@ routes = {
     "ingredient_check": {"search_scope_type": None},
 }
 
-@traceable(run_type="chain")
-def format_docs(docs: Union[list[Document], Document], config=None):
+_QA_SECTION = re.compile(r"<(question|answer)>\s*(.*?)\s*</\1>", re.DOTALL)
+
+
+def _format_doc(doc: Document) -> str:
+    # Same templates as `chef_agent.utils.format_doc`, without the memoization.
+    doc_type = doc.metadata.get("type")
+    source_id = doc.metadata.get("source_id") or doc.id
+    if doc_type == "recipe":
+        return f"[recipe {source_id}]\n{doc.page_content.strip()}"
+    if doc_type == "question-answer":
+        sections = dict(_QA_SECTION.findall(doc.page_content))
+        if sections:
+            return (
+                f"[question-answer {doc.id} for recipe {source_id}]\n"
+                f"Q: {sections.get('question', '')}\n"
+                f"A: {sections.get('answer', '')}"
+            )
+    return f"[{doc_type or 'source'} {source_id}]\n{doc.page_content.strip()}"
+
+
+def format_docs(docs: Union[list[Document], Document], config: Any = None) -> dict[str, str]:
+    """Format one or more documents into a single prompt context string."""
     if isinstance(docs, Document):
         docs = [docs]
-    print(docs)
-    # formatted_docs = []
-    # for doc in docs:
-    #     doc_type = doc.metadata.get("type")
-    #     f_doc = f"text: {doc.page_content} metadata: {doc.metadata}"
-    #     if doc_type == "recipe":
-    return {
-        "context": "\n\n".join(
-            f"text: {doc.page_content} metadata: {doc.metadata}" for doc in docs
-        )
-    }
+    return {"context": "\n\n".join(_format_doc(doc) for doc in docs)}
+
+
+# The model registry is owned by `chef_agent.utils` in the API package; keep
+# the cache, `_cached_model` and `clear_model_cache` identical to it. `agent`
+# does not depend on that package.
+MODEL_CACHE_SIZE = 8
+"""Maximum number of chat model instances kept alive by the model registry."""
+
+_model_cache: OrderedDict[Hashable, Any] = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def _freeze_kwargs(kwargs: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+
+def _cached_model(key: Hashable, factory: Callable[[], Any]) -> Any:
+    with _model_cache_lock:
+        cached = _model_cache.get(key)
+        if cached is not None:
+            _model_cache.move_to_end(key)
+            return cached
+    # Build outside the lock; a concurrent miss at worst builds a duplicate.
+    model = factory()
+    with _model_cache_lock:
+        model = _model_cache.setdefault(key, model)
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def clear_model_cache() -> None:
+    """Drop all cached chat model instances."""
+    with _model_cache_lock:
+        _model_cache.clear()
+
 
 def load_chat_model(fully_specified_name: str=None) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Instances are cached by provider, model and model kwargs (least recently
+    used are evicted first), so repeated calls reuse the same HTTP client.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
     """
@@ -66,4 +118,8 @@ def load_chat_model(fully_specified_name: str=None) -> BaseChatModel:
     model_kwargs = {"temperature": 0}
     if provider == "google_genai":
         model_kwargs["convert_system_message_to_human"] = True
-    return init_chat_model(model, model_provider=provider, **model_kwargs)
\ No newline at end of file
+
+    key = (provider, model, _freeze_kwargs(model_kwargs), None)
+    return _cached_model(
+        key, lambda: init_chat_model(model, model_provider=provider, **model_kwargs)
+    )
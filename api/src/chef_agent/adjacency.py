@@ -0,0 +1,387 @@
+"""Precomputed adjacency index for graph traversal.
+
+`GraphRetriever` expands every keyword and source_id edge with a filtered
+similarity search against Chroma, i.e. one round trip per edge per hop. The
+adjacency index built at ingestion time stores, for each edge field, the rows
+of the documents having each value (CSR `indptr`/`indices` arrays) together
+with the document embeddings (stored as float16), all memory-mapped from disk.
+`IndexedAdapter` answers edge expansions from it: candidates are gathered and
+scored block by block, and only the selected documents are fetched from the
+store. Expansions with more candidates than `max_candidates` (e.g. a keyword
+shared by most recipes) are left to the store's filtered search, which does
+not bring their embeddings into memory.
+
+The index records the ingest run that last wrote to the collection (see
+`chef_agent.collection.ingest_run`) so the retriever can tell when it no
+longer matches.
+
+This module imports `graph_retriever`: import it where the retriever is built,
+not at module level of modules the graph imports.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+from graph_retriever.adapters import Adapter
+from graph_retriever.content import Content
+from graph_retriever.edges import Edge, IdEdge, MetadataEdge
+from numpy.typing import DTypeLike
+
+from chef_agent.cache import LRUCache
+from chef_agent.collection import field_values, ingest_run
+
+logger = logging.getLogger(__name__)
+
+EDGE_FIELDS = ("keywords", "source_id")
+"""Metadata fields the retriever traverses."""
+
+_META = "meta.json"
+
+_BLOCK_ROWS = 8_192
+"""Candidate rows scored at once, bounding the embeddings read into memory."""
+
+MAX_CANDIDATES = 50_000
+"""Default largest number of candidates an `IndexedAdapter` scores itself."""
+
+
+def adjacency_path_for(persist_directory: str, collection_name: str) -> Path:
+    """Return the default index location for a collection."""
+    directory = Path(persist_directory)
+    return directory.with_name(f"{directory.name}.{collection_name}.adjacency")
+
+
+def _edge_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=dict)
+
+
+def build_adjacency_index(
+    collection: Any,
+    path: os.PathLike[str] | str,
+    fields: Sequence[str] = EDGE_FIELDS,
+    page_size: int = 5_000,
+    dtype: DTypeLike = np.float16,
+) -> int:
+    """Build the adjacency index of a Chroma collection at `path`.
+
+    The collection is read page by page and embeddings are written straight to
+    a memory-mapped file of `dtype`, so memory use does not grow with the
+    collection size. Norms are computed from the stored vectors.
+    The index is written to a temporary directory and moved into place, and
+    records the collection's `ingest_run`.
+
+    Returns:
+        The number of indexed documents.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    run = ingest_run(collection)
+    count = collection.count()
+    ids: list[str] = []
+    postings: dict[str, dict[str, list[int]]] = {field: {} for field in fields}
+    embeddings: np.ndarray | None = None
+    for offset in range(0, count, page_size):
+        page = collection.get(
+            include=["metadatas", "embeddings"], limit=page_size, offset=offset
+        )
+        vectors = np.asarray(page["embeddings"], dtype=dtype)
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(
+                tmp / "embeddings.npy",
+                mode="w+",
+                dtype=vectors.dtype,
+                shape=(count, vectors.shape[1]),
+            )
+            norms = np.lib.format.open_memmap(
+                tmp / "norms.npy", mode="w+", dtype=np.float32, shape=(count,)
+            )
+        embeddings[offset : offset + len(vectors)] = vectors
+        norms[offset : offset + len(vectors)] = np.linalg.norm(
+            vectors.astype(np.float32), axis=1
+        )
+        for row, metadata in enumerate(page["metadatas"], start=len(ids)):
+            for field in fields:
+                for value in field_values(metadata or {}, field):
+                    postings[field].setdefault(_edge_key(value), []).append(row)
+        ids.extend(page["ids"])
+
+    if embeddings is None:
+        np.save(tmp / "embeddings.npy", np.zeros((0, 0), dtype=dtype))
+        np.save(tmp / "norms.npy", np.zeros(0, dtype=np.float32))
+    else:
+        embeddings.flush()
+        norms.flush()
+
+    for field, by_value in postings.items():
+        keys = sorted(by_value)
+        lengths = np.fromiter((len(by_value[k]) for k in keys), dtype=np.int64)
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter(
+            (row for k in keys for row in by_value[k]),
+            dtype=np.int32,
+            count=int(indptr[-1]),
+        )
+        np.save(tmp / f"{field}.indptr.npy", indptr)
+        np.save(tmp / f"{field}.indices.npy", indices)
+        (tmp / f"{field}.keys.json").write_text(json.dumps(keys))
+
+    (tmp / "ids.json").write_text(json.dumps(ids))
+    meta = {"count": len(ids), "fields": list(fields), "ingest_run": run}
+    (tmp / _META).write_text(json.dumps(meta))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return len(ids)
+
+
+class AdjacencyIndex:
+    """Read-only, memory-mapped adjacency index."""
+
+    def __init__(self, path: os.PathLike[str] | str) -> None:
+        """Memory-map the index at `path`."""
+        path = Path(path)
+        meta = json.loads((path / _META).read_text())
+        self.count: int = meta["count"]
+        # None for indexes built before ingest runs were recorded.
+        self.ingest_run: str | None = meta.get("ingest_run")
+        self.fields: tuple[str, ...] = tuple(meta["fields"])
+        self.ids: list[str] = json.loads((path / "ids.json").read_text())
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+        self.norms = np.load(path / "norms.npy", mmap_mode="r")
+        self._keys: dict[str, dict[str, int]] = {}
+        self._indptr: dict[str, np.ndarray] = {}
+        self._indices: dict[str, np.ndarray] = {}
+        for field in self.fields:
+            keys = json.loads((path / f"{field}.keys.json").read_text())
+            self._keys[field] = {key: i for i, key in enumerate(keys)}
+            self._indptr[field] = np.load(path / f"{field}.indptr.npy", mmap_mode="r")
+            self._indices[field] = np.load(path / f"{field}.indices.npy", mmap_mode="r")
+
+    @classmethod
+    def load(cls, path: os.PathLike[str] | str) -> AdjacencyIndex | None:
+        """Load the index at `path`, or return None if there is none."""
+        if not (Path(path) / _META).exists():
+            return None
+        return cls(path)
+
+    def covers(self, edges: Iterable[Edge]) -> bool:
+        """Return whether every edge can be answered from the index."""
+        return all(
+            isinstance(edge, IdEdge)
+            or (isinstance(edge, MetadataEdge) and edge.incoming_field in self.fields)
+            for edge in edges
+        )
+
+    def candidates(self, edges: Iterable[Edge]) -> int:
+        """Return an upper bound of the number of rows `neighbors` returns."""
+        total = 0
+        for edge in edges:
+            if isinstance(edge, IdEdge):
+                total += 1
+                continue
+            assert isinstance(edge, MetadataEdge)
+            position = self._keys[edge.incoming_field].get(_edge_key(edge.value))
+            if position is not None:
+                indptr = self._indptr[edge.incoming_field]
+                total += int(indptr[position + 1] - indptr[position])
+        return total
+
+    def neighbors(self, edges: Iterable[Edge]) -> np.ndarray:
+        """Return the sorted rows of documents with an incoming edge in `edges`."""
+        parts = []
+        for edge in edges:
+            if isinstance(edge, IdEdge):
+                row = self.rows.get(edge.id)
+                if row is not None:
+                    parts.append(np.array([row], dtype=np.int32))
+                continue
+            assert isinstance(edge, MetadataEdge)
+            position = self._keys[edge.incoming_field].get(_edge_key(edge.value))
+            if position is None:
+                continue
+            indptr = self._indptr[edge.incoming_field]
+            parts.append(
+                self._indices[edge.incoming_field][
+                    indptr[position] : indptr[position + 1]
+                ]
+            )
+        if not parts:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(parts))
+
+    def top_k(self, rows: np.ndarray, embedding: Sequence[float], k: int) -> list[str]:
+        """Return the ids of the `k` rows most similar to `embedding`, best first.
+
+        Rows are scored `_BLOCK_ROWS` at a time, keeping the best `k` so far.
+        """
+        if k <= 0 or not len(rows):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query) or 1.0
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = np.asarray(rows[start : start + _BLOCK_ROWS], dtype=np.int64)
+            denominator = self.norms[block] * query_norm
+            scores = (self.embeddings[block].astype(np.float32) @ query) / np.where(
+                denominator, denominator, 1.0
+            )
+            best_rows = np.concatenate([best_rows, block])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                # Kept in row order so the final stable sort breaks ties by row.
+                keep.sort()
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores, kind="stable")
+        return [self.ids[row] for row in best_rows[order]]
+
+
+class IndexedAdapter(Adapter):
+    """Adapter answering edge expansions from an `AdjacencyIndex`.
+
+    Searches and gets are delegated to the wrapped adapter, as are edge
+    expansions with a metadata filter, on fields that are not indexed or with
+    more than `max_candidates` candidates.
+    Fetched content is cached by id. Other attributes (e.g. `vector_store`)
+    are looked up on the wrapped adapter.
+    """
+
+    def __init__(
+        self,
+        adapter: Adapter,
+        index: AdjacencyIndex,
+        cache_size: int = 4096,
+        max_candidates: int = MAX_CANDIDATES,
+    ) -> None:
+        """Wrap `adapter`, caching up to `cache_size` fetched documents."""
+        super().__init__()
+        self.adapter = adapter
+        self.index = index
+        self.max_candidates = max_candidates
+        self._contents: LRUCache[Content] = LRUCache(cache_size)
+
+    def __getattr__(self, name: str) -> Any:
+        """Look up attributes missing here on the wrapped adapter."""
+        if name == "adapter":
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+    def search_with_embedding(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> tuple[list[float], list[Content]]:
+        """Delegate to the wrapped adapter."""
+        return self.adapter.search_with_embedding(query, k, filter, **kwargs)
+
+    async def asearch_with_embedding(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> tuple[list[float], list[Content]]:
+        """Delegate to the wrapped adapter."""
+        return await self.adapter.asearch_with_embedding(query, k, filter, **kwargs)
+
+    def search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Content]:
+        """Delegate to the wrapped adapter."""
+        return self.adapter.search(embedding, k, filter, **kwargs)
+
+    async def asearch(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Content]:
+        """Delegate to the wrapped adapter."""
+        return await self.adapter.asearch(embedding, k, filter, **kwargs)
+
+    def get(
+        self, ids: Sequence[str], filter: dict[str, Any] | None = None, **kwargs: Any
+    ) -> list[Content]:
+        """Delegate to the wrapped adapter."""
+        return self.adapter.get(ids, filter, **kwargs)
+
+    async def aget(
+        self, ids: Sequence[str], filter: dict[str, Any] | None = None, **kwargs: Any
+    ) -> list[Content]:
+        """Delegate to the wrapped adapter."""
+        return await self.adapter.aget(ids, filter, **kwargs)
+
+    def _delegates(
+        self, edges: set[Edge], filter: dict[str, Any] | None, kwargs: dict[str, Any]
+    ) -> bool:
+        return bool(
+            filter
+            or kwargs
+            or not self.index.covers(edges)
+            or self.index.candidates(edges) > self.max_candidates
+        )
+
+    def _select(
+        self, edges: set[Edge], query_embedding: list[float], k: int
+    ) -> tuple[list[str], dict[str, Content], list[str]]:
+        ids = self.index.top_k(self.index.neighbors(edges), query_embedding, k)
+        cached = {i: c for i in ids if (c := self._contents.get(i)) is not None}
+        return ids, cached, [i for i in ids if i not in cached]
+
+    def _ordered(
+        self, ids: list[str], cached: dict[str, Content], fetched: list[Content]
+    ) -> list[Content]:
+        for content in fetched:
+            self._contents.set(content.id, content)
+            cached[content.id] = content
+        return [cached[i] for i in ids if i in cached]
+
+    def adjacent(
+        self,
+        edges: set[Edge],
+        query_embedding: list[float],
+        k: int,
+        filter: dict[str, Any] | None,
+        **kwargs: Any,
+    ) -> Iterable[Content]:
+        """Return the `k` most similar documents with an incoming edge in `edges`."""
+        if self._delegates(edges, filter, kwargs):
+            return self.adapter.adjacent(edges, query_embedding, k, filter, **kwargs)
+        ids, cached, missing = self._select(edges, query_embedding, k)
+        fetched = self.adapter.get(missing) if missing else []
+        return self._ordered(ids, cached, fetched)
+
+    async def aadjacent(
+        self,
+        edges: set[Edge],
+        query_embedding: list[float],
+        k: int,
+        filter: dict[str, Any] | None,
+        **kwargs: Any,
+    ) -> Iterable[Content]:
+        """Return the `k` most similar documents with an incoming edge in `edges`."""
+        if self._delegates(edges, filter, kwargs):
+            return await self.adapter.aadjacent(
+                edges, query_embedding, k, filter, **kwargs
+            )
+        ids, cached, missing = self._select(edges, query_embedding, k)
+        fetched = await self.adapter.aget(missing) if missing else []
+        return self._ordered(ids, cached, fetched)
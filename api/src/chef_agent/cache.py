@@ -0,0 +1,545 @@
+"""Caches shared across graph runs.
+
+Caches are process-wide: an in-memory LRU sits in front of an optional on-disk
+SQLite store so entries survive restarts and can be shared between workers on
+the same machine. Every cache counts hits and misses for monitoring.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Generic, TypeVar, cast
+
+import numpy as np
+
+V = TypeVar("V")
+
+CACHE_DIR = Path(
+    os.getenv("CHEF_AGENT_CACHE_DIR", Path(__file__).parent / "data" / "cache")
+)
+"""Directory holding the on-disk caches. Override with `CHEF_AGENT_CACHE_DIR`."""
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters for a cache."""
+
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe in-memory LRU cache with an optional time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None) -> None:
+        """Hold at most `maxsize` entries, each for at most `ttl` seconds."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> V | None:
+        """Return the cached value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: V, stored_at: float | None = None) -> int:
+        """Store `value` under `key` and return the number of evicted entries."""
+        with self._lock:
+            self._data[key] = (time.time() if stored_at is None else stored_at, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries, including expired ones not yet dropped."""
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Persistent key/value store backed by a local SQLite file.
+
+    Entries older than `ttl` seconds are ignored on read and purged, along with
+    the oldest entries beyond `max_entries`, every `prune_every` writes.
+
+    Writes are buffered and committed in batches of `flush_every`, or on the
+    first write `flush_interval` seconds after the last commit, so a burst of
+    writes costs one transaction. Buffered entries are served by `get`, and
+    are committed by `flush`, `close` and at interpreter exit. Use `aget` and
+    `aset` from the event loop: they run the SQLite calls in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: os.PathLike[str] | str,
+        *,
+        max_entries: int = 100_000,
+        ttl: float | None = None,
+        prune_every: int = 100,
+        flush_every: int = 32,
+        flush_interval: float = 1.0,
+    ) -> None:
+        """Open (creating if needed) the cache database at `path`."""
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._writes = 0
+        self._pending: dict[str, tuple[bytes, float]] = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_created_at ON cache (created_at)"
+        )
+        self._conn.commit()
+        atexit.register(self.flush)
+
+    def get(self, key: str) -> tuple[float, bytes] | None:
+        """Return `(created_at, value)` for `key`, or None if missing or expired."""
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                row: tuple[float, bytes] | None = (pending[1], pending[0])
+            else:
+                row = self._conn.execute(
+                    "SELECT created_at, value FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and time.time() - row[0] > self.ttl:
+            return None
+        return row[0], row[1]
+
+    async def aget(self, key: str) -> tuple[float, bytes] | None:
+        """Like `get`, without blocking the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, value: bytes) -> int:
+        """Store `value` under `key` and return the number of pruned entries."""
+        with self._lock:
+            self._pending[key] = (value, time.time())
+            if (
+                len(self._pending) < self.flush_every
+                and time.monotonic() - self._flushed_at < self.flush_interval
+            ):
+                return 0
+            return self._flush()
+
+    async def aset(self, key: str, value: bytes) -> int:
+        """Like `set`, without blocking the event loop."""
+        return await asyncio.to_thread(self.set, key, value)
+
+    def flush(self) -> int:
+        """Commit buffered writes and return the number of pruned entries."""
+        with self._lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return 0
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+            [
+                (key, value, created_at)
+                for key, (value, created_at) in self._pending.items()
+            ],
+        )
+        written = len(self._pending)
+        self._pending.clear()
+        self._writes += written
+        pruned = 0
+        if self._writes >= self.prune_every:
+            self._writes = 0
+            pruned = self._prune()
+        self._conn.commit()
+        return pruned
+
+    def _prune(self) -> int:
+        pruned = 0
+        if self.ttl is not None:
+            pruned += self._conn.execute(
+                "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        pruned += self._conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        return pruned
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._pending.clear()
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Commit buffered writes and close the underlying connection."""
+        atexit.unregister(self.flush)
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+def _encode_str(value: str) -> bytes:
+    return value.encode("utf-8")
+
+
+def _decode_str(value: bytes) -> str:
+    return value.decode("utf-8")
+
+
+class TieredCache(Generic[V]):
+    """In-memory LRU in front of an optional on-disk `SQLiteCache`."""
+
+    def __init__(
+        self,
+        *,
+        memory_size: int = 1024,
+        ttl: float | None = None,
+        disk: SQLiteCache | None = None,
+        encode: Callable[[V], bytes] = _encode_str,  # type: ignore[assignment]
+        decode: Callable[[bytes], V] = _decode_str,  # type: ignore[assignment]
+    ) -> None:
+        """Keep `memory_size` entries in memory and, if `disk` is given, all on disk.
+
+        `encode` and `decode` convert values to and from the bytes stored on disk.
+        """
+        self.memory: LRUCache[V] = LRUCache(memory_size, ttl)
+        self.disk = disk
+        self.encode = encode
+        self.decode = decode
+        self.stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self.stats, field, getattr(self.stats, field) + n)
+
+    def get(self, key: str) -> V | None:
+        """Return the cached value for `key`, checking memory before disk."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                stored_at, raw = entry
+                value = self.decode(raw)
+                self._count("evictions", self.memory.set(key, value, stored_at))
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    async def aget(self, key: str) -> V | None:
+        """Like `get`, reading the disk tier in a worker thread."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.disk is not None:
+            entry = await self.disk.aget(key)
+            if entry is not None:
+                stored_at, raw = entry
+                value = self.decode(raw)
+                self._count("evictions", self.memory.set(key, value, stored_at))
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: V) -> None:
+        """Store `value` in memory and, if configured, on disk."""
+        self._count("evictions", self.memory.set(key, value))
+        if self.disk is not None:
+            self._count("evictions", self.disk.set(key, self.encode(value)))
+
+    async def aset(self, key: str, value: V) -> None:
+        """Like `set`, writing the disk tier in a worker thread."""
+        self._count("evictions", self.memory.set(key, value))
+        if self.disk is not None:
+            self._count("evictions", await self.disk.aset(key, self.encode(value)))
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current counters and size for monitoring."""
+        with self._stats_lock:
+            return {
+                **asdict(self.stats),
+                "hit_rate": self.stats.hit_rate,
+                "size": len(self.memory),
+            }
+
+
+class SemanticCache(Generic[V]):
+    """Cache values by embedding and serve hits for nearby embeddings.
+
+    Keys are unit-normalized float32 vectors kept in a fixed-size matrix, so a
+    lookup is a single matrix-vector product over every cached key. Once full,
+    the oldest entries are overwritten first. Entries are dropped whenever the
+    `version` passed to `lookup` or `add` changes.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Hold at most `maxsize` entries."""
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._keys: np.ndarray | None = None
+        self._values: list[V | None] = [None] * maxsize
+        self._size = 0
+        self._next = 0
+        self._version: Any = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _reset(self) -> None:
+        self._keys = None
+        self._values = [None] * self.maxsize
+        self._size = self._next = 0
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            self._reset()
+            self._version = version
+
+    def lookup(self, embedding: Any, threshold: float, version: Any = None) -> V | None:
+        """Return the value whose key has the highest cosine similarity to `embedding`.
+
+        Returns None if no cached key reaches `threshold`.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if (
+                self._keys is None
+                or not self._size
+                or self._keys.shape[1] != query.shape[0]
+            ):
+                self.stats.misses += 1
+                return None
+            scores = self._keys[: self._size] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return self._values[best]
+
+    def add(self, embedding: Any, value: V, version: Any = None) -> None:
+        """Cache `value` under `embedding`."""
+        key = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._keys is None or self._keys.shape[1] != key.shape[0]:
+                self._reset()
+                self._keys = np.zeros((self.maxsize, key.shape[0]), dtype=np.float32)
+            if self._size == self.maxsize:
+                self.stats.evictions += 1
+            self._keys[self._next] = key
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.maxsize
+            self._size = min(self._size + 1, self.maxsize)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._reset()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current counters and size for monitoring."""
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "hit_rate": self.stats.hit_rate,
+                "size": self._size,
+            }
+
+
+def normalize_text(text: str) -> str:
+    """Normalize free text for use in cache keys."""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!.").lower()
+
+
+def hash_key(*parts: str) -> str:
+    """Hash `parts` into a fixed-length cache key."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+_caches: dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def _process_cache(name: str, factory: Callable[[], V]) -> V:
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = _caches[name] = factory()
+    return cast(V, cache)
+
+
+def cache_stats() -> dict[str, dict[str, Any]]:
+    """Return counters for every process-wide cache that has been created."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.snapshot() for name, cache in caches.items()}
+
+
+################ Source Explanations ################
+EXPLAINATION_CACHE_MEMORY_SIZE = 2048
+EXPLAINATION_CACHE_DISK_SIZE = 200_000
+EXPLAINATION_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+def get_explaination_cache() -> TieredCache[str]:
+    """Return the process-wide source explanation cache."""
+    return _process_cache(
+        "explainations",
+        lambda: TieredCache(
+            memory_size=EXPLAINATION_CACHE_MEMORY_SIZE,
+            ttl=EXPLAINATION_CACHE_TTL,
+            disk=SQLiteCache(
+                CACHE_DIR / "explainations.sqlite",
+                max_entries=EXPLAINATION_CACHE_DISK_SIZE,
+                ttl=EXPLAINATION_CACHE_TTL,
+            ),
+        ),
+    )
+
+
+def explaination_cache_key(
+    question: str, document_id: str, prompt: str, model: str
+) -> str:
+    """Build the cache key for a source explanation.
+
+    The prompt and model are hashed into a version so that changing either one
+    invalidates previously cached explanations.
+    """
+    prompt_version = hash_key(prompt, model)[:16]
+    return hash_key(normalize_text(question), document_id, prompt_version)
+
+
+################ Query Embeddings ################
+EMBEDDING_CACHE_MEMORY_SIZE = 2048
+"""In-memory query vectors; ~12KB each for 3072-dim float32 embeddings."""
+EMBEDDING_CACHE_DISK_SIZE = 100_000
+EMBEDDING_CACHE_PERSIST = os.getenv(
+    "CHEF_AGENT_EMBEDDING_CACHE_PERSIST", "1"
+).lower() in (
+    "1",
+    "true",
+    "yes",
+)
+"""Whether query vectors are also stored on disk. Override with `CHEF_AGENT_EMBEDDING_CACHE_PERSIST`."""
+
+
+def _encode_vector(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _decode_vector(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+def get_embedding_cache() -> TieredCache[np.ndarray]:
+    """Return the process-wide query embedding cache.
+
+    Vectors are stored as float32 arrays, halving memory relative to the float64
+    lists returned by embedding clients.
+    """
+    return _process_cache(
+        "embeddings",
+        lambda: TieredCache(
+            memory_size=EMBEDDING_CACHE_MEMORY_SIZE,
+            disk=SQLiteCache(
+                CACHE_DIR / "embeddings.sqlite", max_entries=EMBEDDING_CACHE_DISK_SIZE
+            )
+            if EMBEDDING_CACHE_PERSIST
+            else None,
+            encode=_encode_vector,
+            decode=_decode_vector,
+        ),
+    )
+
+
+def embedding_cache_key(text: str, model: str) -> str:
+    """Build the cache key for a query embedding."""
+    return hash_key(model, normalize_text(text))
+
+
+################ Search Results ################
+SEARCH_CACHE_SIZE = 1024
+
+
+def get_search_cache(namespace: str = "") -> SemanticCache[dict[str, Any]]:
+    """Return the process-wide search result cache, keyed by query embedding.
+
+    Each `namespace` (see `search_cache_namespace`) has its own cache, so
+    deployments searching with different retrieval settings do not evict
+    each other's results.
+    """
+    name = f"search_results:{namespace}" if namespace else "search_results"
+    return _process_cache(name, lambda: SemanticCache(SEARCH_CACHE_SIZE))
+
+
+def search_cache_namespace(*settings: Any) -> str:
+    """Return a short search cache namespace identifying the retrieval `settings`."""
+    return hash_key(*map(repr, settings))[:12]
@@ -0,0 +1,514 @@
+"""Persistent checkpointing for the chef graph.
+
+Threads are checkpointed to a local SQLite database by default, so their state
+(including pending `interrupt()` recipe selections) survives restarts and is
+not held in process memory. Retrieved documents are checkpointed as references
+to the vector store they were retrieved from rather than in full, and only the
+most recent checkpoints of each thread are retained. Documents the store does
+not hold with the same content (e.g. a client-supplied recipe) are checkpointed
+in full.
+
+The SQLite saver serves async graph calls (`ainvoke`, `aget_state`) through
+`aiosqlite` and sync ones (`invoke`, `get_state`) through a `SqliteSaver` on
+the same database.
+
+The backend is selected with `CHEF_AGENT_CHECKPOINTER` ("sqlite", "memory" or
+"none") and the database location with `CHEF_AGENT_CHECKPOINT_PATH`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+from contextvars import ContextVar
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
+
+import aiosqlite
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from chef_agent.cache import LRUCache, hash_key
+from chef_agent.configuration import Configuration
+from chef_agent.state import STATE_DOCUMENT_METADATA, compact_document
+
+CHECKPOINT_PATH = Path(
+    os.getenv(
+        "CHEF_AGENT_CHECKPOINT_PATH",
+        Path(__file__).parent / "data" / "checkpoints.sqlite",
+    )
+)
+
+CHECKPOINTS_PER_THREAD = 20
+"""Number of most recent checkpoints retained for each thread."""
+
+_DOCUMENT_REF = "__chef_document_ref__"
+
+StoreKey = tuple[str, str, str]
+"""`RetrieverSettings.store_key` of the vector store a document was retrieved from."""
+
+DocumentLoader = Callable[[Sequence[str], StoreKey | None], dict[str, Document]]
+
+_document_refs: ContextVar[tuple[StoreKey | None, frozenset[str]] | None] = ContextVar(
+    "chef_document_refs", default=None
+)
+"""Store of the documents being checkpointed and the `_ref_key`s of those it holds.
+
+Set by `PrunedSqliteSaver`, which looks them up before serializing.
+"""
+
+
+def _ref_key(store: StoreKey | None, doc: Document) -> str:
+    return hash_key(repr(store), doc.id or "", doc.page_content)
+
+
+def load_documents_from_store(
+    ids: Sequence[str], store_key: StoreKey | None = None
+) -> dict[str, Document]:
+    """Fetch documents by id from the vector store identified by `store_key`.
+
+    Documents checkpointed without a store are fetched from the default one.
+    This opens the store on first use, so call it from a worker thread inside
+    the event loop.
+    """
+    from chef_agent.retrieval import DEFAULT_SETTINGS, get_retriever
+
+    settings = DEFAULT_SETTINGS
+    if store_key is not None:
+        persist_directory, collection_name, embedding_model = store_key
+        settings = replace(
+            settings,
+            persist_directory=persist_directory,
+            collection_name=collection_name,
+            embedding_model=embedding_model,
+        )
+    store = get_retriever(settings).adapter.vector_store
+    return {doc.id: doc for doc in store.get_by_ids(list(ids)) if doc.id}
+
+
+class CompactDocumentSerializer(SerializerProtocol):
+    """Serialize checkpoints with documents stored as vector store references.
+
+    Documents with an id that their store holds with the same content are
+    replaced by their id, the key of the store and their compact metadata when
+    written; other documents are written in full. On read, their page content
+    is fetched in one batch per store. Documents deleted from their store after
+    they were checkpointed are restored with empty content.
+
+    `loads_typed` fetches synchronously. With `rehydrate=False` it leaves the
+    references in place for `arehydrate`, which fetches in a worker thread.
+    """
+
+    def __init__(
+        self,
+        serde: SerializerProtocol | None = None,
+        load_documents: DocumentLoader = load_documents_from_store,
+        *,
+        rehydrate: bool = True,
+        confirmed_size: int = 4096,
+    ) -> None:
+        """Wrap `serde` (JSON+msgpack by default), fetching documents with `load_documents`.
+
+        The `confirmed_size` most recently confirmed documents are not looked
+        up again.
+        """
+        self.serde = serde or JsonPlusSerializer()
+        self.load_documents = load_documents
+        self.rehydrate = rehydrate
+        self._confirmed: LRUCache[bool] = LRUCache(confirmed_size)
+
+    def deferred(self) -> CompactDocumentSerializer:
+        """Return a copy whose `loads_typed` leaves references for `arehydrate`."""
+        copy = CompactDocumentSerializer(
+            self.serde, self.load_documents, rehydrate=False
+        )
+        copy._confirmed = self._confirmed
+        return copy
+
+    def _collect_documents(self, obj: Any, docs: list[Document]) -> None:
+        if isinstance(obj, Document):
+            if obj.id:
+                docs.append(obj)
+        elif isinstance(obj, dict):
+            for v in obj.values():
+                self._collect_documents(v, docs)
+        elif isinstance(obj, (list, tuple)):
+            for v in obj:
+                self._collect_documents(v, docs)
+
+    def stored(self, obj: Any, store: StoreKey | None) -> frozenset[str]:
+        """Return the `_ref_key`s of the documents in `obj` that `store` holds.
+
+        Documents not confirmed recently are fetched with `load_documents`, so
+        call it from a worker thread inside the event loop.
+        """
+        docs: list[Document] = []
+        self._collect_documents(obj, docs)
+        keys = {_ref_key(store, doc): doc for doc in docs}
+        unknown = {k: doc for k, doc in keys.items() if not self._confirmed.get(k)}
+        if unknown:
+            ids = sorted({doc.id for doc in unknown.values() if doc.id})
+            found = self.load_documents(ids, store)
+            for key, doc in unknown.items():
+                match = found.get(doc.id or "")
+                if match is not None and match.page_content == doc.page_content:
+                    self._confirmed.set(key, True)
+                else:
+                    del keys[key]
+        return frozenset(keys)
+
+    def _dehydrate(
+        self, obj: Any, store: StoreKey | None, stored: frozenset[str]
+    ) -> Any:
+        if isinstance(obj, Document):
+            if not obj.id or _ref_key(store, obj) not in stored:
+                return obj
+            metadata = compact_document(obj).metadata
+            return {
+                _DOCUMENT_REF: obj.id,
+                "store": list(store) if store else None,
+                "metadata": metadata,
+            }
+        if isinstance(obj, dict):
+            return {k: self._dehydrate(v, store, stored) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self._dehydrate(v, store, stored) for v in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._dehydrate(v, store, stored) for v in obj)
+        return obj
+
+    @staticmethod
+    def _ref_store(ref: dict[str, Any]) -> StoreKey | None:
+        store = ref.get("store")
+        return tuple(store) if store else None  # type: ignore[return-value]
+
+    def _collect_refs(self, obj: Any, ids: dict[StoreKey | None, set[str]]) -> None:
+        if isinstance(obj, dict):
+            if _DOCUMENT_REF in obj:
+                ids.setdefault(self._ref_store(obj), set()).add(obj[_DOCUMENT_REF])
+                return
+            for v in obj.values():
+                self._collect_refs(v, ids)
+        elif isinstance(obj, (list, tuple)):
+            for v in obj:
+                self._collect_refs(v, ids)
+
+    def _rehydrate(
+        self, obj: Any, docs: dict[StoreKey | None, dict[str, Document]]
+    ) -> Any:
+        if isinstance(obj, dict):
+            if _DOCUMENT_REF in obj:
+                doc_id = obj[_DOCUMENT_REF]
+                stored = docs.get(self._ref_store(obj), {}).get(doc_id)
+                return Document(
+                    id=doc_id,
+                    page_content=stored.page_content if stored else "",
+                    metadata={
+                        **{
+                            k: v
+                            for k, v in (stored.metadata if stored else {}).items()
+                            if k in STATE_DOCUMENT_METADATA
+                        },
+                        **obj["metadata"],
+                    },
+                )
+            return {k: self._rehydrate(v, docs) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self._rehydrate(v, docs) for v in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._rehydrate(v, docs) for v in obj)
+        return obj
+
+    def _load(
+        self, ids: dict[StoreKey | None, set[str]]
+    ) -> dict[StoreKey | None, dict[str, Document]]:
+        return {
+            store: self.load_documents(sorted(store_ids), store)
+            for store, store_ids in ids.items()
+        }
+
+    async def arehydrate(self, obj: Any) -> Any:
+        """Replace the document references in `obj` without blocking the event loop."""
+        ids: dict[StoreKey | None, set[str]] = {}
+        self._collect_refs(obj, ids)
+        if not ids:
+            return obj
+        return self._rehydrate(obj, await asyncio.to_thread(self._load, ids))
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        """Serialize `obj`, replacing documents their store holds with references.
+
+        Outside `PrunedSqliteSaver`, documents are looked up in the default store.
+        """
+        refs = _document_refs.get()
+        store, stored = refs if refs is not None else (None, self.stored(obj, None))
+        return self.serde.dumps_typed(self._dehydrate(obj, store, stored))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        """Deserialize `data`, rehydrating referenced documents."""
+        obj = self.serde.loads_typed(data)
+        if not self.rehydrate:
+            return obj
+        ids: dict[StoreKey | None, set[str]] = {}
+        self._collect_refs(obj, ids)
+        if not ids:
+            return obj
+        return self._rehydrate(obj, self._load(ids))
+
+
+class PrunedSqliteSaver(AsyncSqliteSaver):
+    """`AsyncSqliteSaver` that connects lazily and prunes old checkpoints.
+
+    The connection is opened on first use inside the running event loop, so the
+    saver can be created when the graph module is imported. After every
+    checkpoint, only the `keep_last` most recent checkpoints of the thread (and
+    their pending writes) are retained.
+
+    With a `CompactDocumentSerializer`, documents are referenced to the vector
+    store of the run's `Configuration`. Async calls look them up and rehydrate
+    them in a worker thread.
+
+    Sync calls (e.g. `graph.invoke`) go through a `SqliteSaver` on the same
+    database, opened on first use.
+    """
+
+    def __init__(
+        self,
+        path: os.PathLike[str] | str,
+        *,
+        keep_last: int = CHECKPOINTS_PER_THREAD,
+        serde: SerializerProtocol | None = None,
+    ) -> None:
+        """Store checkpoints in the SQLite database at `path`."""
+        self.documents = serde if isinstance(serde, CompactDocumentSerializer) else None
+        if self.documents is not None:
+            serde = self.documents.deferred()
+        BaseCheckpointSaver.__init__(self, serde=serde)
+        self.jsonplus_serde = JsonPlusSerializer()
+        self.path = Path(path)
+        self.keep_last = keep_last
+        self.conn: aiosqlite.Connection | None = None  # type: ignore[assignment]
+        self.lock = asyncio.Lock()
+        self.loop: asyncio.AbstractEventLoop | None = None  # type: ignore[assignment]
+        self.is_setup = False
+        self._sync: SqliteSaver | None = None
+
+    async def setup(self) -> None:
+        """Open the database connection and create tables if needed."""
+        if self.conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.loop = asyncio.get_running_loop()
+            self.conn = aiosqlite.connect(self.path)
+            # The saver lives as long as the process and is never closed, so its
+            # worker thread must not block interpreter shutdown.
+            worker = getattr(self.conn, "_thread", None)
+            if worker is not None:
+                worker.daemon = True
+        await super().setup()
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint and prune the thread's older checkpoints."""
+        token = _document_refs.set(await self._arefs(config, checkpoint))
+        try:
+            next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        finally:
+            _document_refs.reset(token)
+        await self.aprune(
+            str(next_config["configurable"]["thread_id"]),
+            next_config["configurable"]["checkpoint_ns"],
+        )
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes, referencing documents to the run's vector store."""
+        token = _document_refs.set(await self._arefs(config, writes))
+        try:
+            await super().aput_writes(config, writes, task_id, task_path)
+        finally:
+            _document_refs.reset(token)
+
+    def _refs(
+        self, config: RunnableConfig, obj: Any
+    ) -> tuple[StoreKey | None, frozenset[str]]:
+        store = _store_key(config)
+        if self.documents is None:
+            return store, frozenset()
+        return store, self.documents.stored(obj, store)
+
+    async def _arefs(
+        self, config: RunnableConfig, obj: Any
+    ) -> tuple[StoreKey | None, frozenset[str]]:
+        return await asyncio.to_thread(self._refs, config, obj)
+
+    async def _arehydrate(self, checkpoint_tuple: CheckpointTuple) -> CheckpointTuple:
+        if self.documents is None:
+            return checkpoint_tuple
+        checkpoint, pending_writes = await self.documents.arehydrate(
+            (checkpoint_tuple.checkpoint, checkpoint_tuple.pending_writes)
+        )
+        return checkpoint_tuple._replace(
+            checkpoint=checkpoint, pending_writes=pending_writes
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get a checkpoint tuple, rehydrating its documents."""
+        checkpoint_tuple = await super().aget_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+        return await self._arehydrate(checkpoint_tuple)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoint tuples, rehydrating their documents."""
+        async for checkpoint_tuple in super().alist(
+            config, filter=filter, before=before, limit=limit
+        ):
+            yield await self._arehydrate(checkpoint_tuple)
+
+    async def aprune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Delete all but the `keep_last` most recent checkpoints of a thread."""
+        await self.setup()
+        assert self.conn is not None
+        params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last)
+        async with self.lock:
+            for statement in _PRUNE_STATEMENTS:
+                await self.conn.execute(statement, params)
+            await self.conn.commit()
+
+    ################ Sync interface ################
+
+    def _sync_saver(self) -> SqliteSaver:
+        if self._sync is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            # Reads rehydrate synchronously, which is what sync callers expect.
+            self._sync = SqliteSaver(conn, serde=self.documents or self.serde)
+        return self._sync
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get a checkpoint tuple, rehydrating its documents."""
+        return self._sync_saver().get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoint tuples, rehydrating their documents."""
+        return self._sync_saver().list(
+            config, filter=filter, before=before, limit=limit
+        )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint and prune the thread's older checkpoints."""
+        saver = self._sync_saver()
+        token = _document_refs.set(self._refs(config, checkpoint))
+        try:
+            next_config = saver.put(config, checkpoint, metadata, new_versions)
+        finally:
+            _document_refs.reset(token)
+        self.prune(
+            str(next_config["configurable"]["thread_id"]),
+            next_config["configurable"]["checkpoint_ns"],
+        )
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes, referencing documents to the run's vector store."""
+        token = _document_refs.set(self._refs(config, writes))
+        try:
+            self._sync_saver().put_writes(config, writes, task_id, task_path)
+        finally:
+            _document_refs.reset(token)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and pending write of a thread."""
+        self._sync_saver().delete_thread(thread_id)
+
+    def prune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Delete all but the `keep_last` most recent checkpoints of a thread."""
+        params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last)
+        with self._sync_saver().cursor() as cursor:
+            for statement in _PRUNE_STATEMENTS:
+                cursor.execute(statement, params)
+
+
+_RETAINED = (
+    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+    "ORDER BY checkpoint_id DESC LIMIT ?"
+)
+_PRUNE_STATEMENTS = tuple(
+    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+    f"AND checkpoint_id NOT IN ({_RETAINED})"
+    for table in ("checkpoints", "writes")
+)
+
+
+def _store_key(config: RunnableConfig) -> StoreKey:
+    return Configuration.from_runnable_config(config).retriever_settings().store_key
+
+
+def make_checkpointer(
+    backend: str | None = None,
+) -> BaseCheckpointSaver | None:
+    """Create the checkpointer for the chef graph.
+
+    Args:
+        backend: "sqlite" (default), "memory" or "none". Defaults to the
+            `CHEF_AGENT_CHECKPOINTER` environment variable.
+    """
+    backend = (backend or os.getenv("CHEF_AGENT_CHECKPOINTER") or "sqlite").lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        return PrunedSqliteSaver(CHECKPOINT_PATH, serde=CompactDocumentSerializer())
+    raise ValueError(f"Unknown checkpointer backend: {backend}")
@@ -0,0 +1,59 @@
+"""Chroma adapter compatible with chromadb 1.x.
+
+`langchain_graph_retriever`'s `ChromaAdapter` imports `IncludeEnum` for
+similarity searches, which chromadb 1.x no longer provides: every search then
+fails with an ImportError. `CompatChromaAdapter` passes the include fields as
+strings instead, which every chromadb version accepts (the adapter's own `get`
+already does).
+
+Imported by `chef_agent.retrieval` when the retriever is built.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_graph_retriever._conversion import METADATA_EMBEDDING_KEY
+from langchain_graph_retriever.adapters.chroma import ChromaAdapter
+
+
+class CompatChromaAdapter(ChromaAdapter):
+    """`ChromaAdapter` whose searches work with every chromadb version."""
+
+    def _search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        count = self.vector_store._collection.count()
+        k = min(k, count)
+        if k == 0:
+            return []
+
+        results = self.vector_store._collection.query(
+            query_embeddings=embedding,  # type: ignore[arg-type]
+            n_results=k,
+            where=filter,  # type: ignore[arg-type]
+            include=["documents", "metadatas", "embeddings"],
+            **kwargs,
+        )
+        return [
+            Document(
+                id=doc_id,
+                page_content=content,
+                metadata={
+                    METADATA_EMBEDDING_KEY: np.asarray(vector, dtype=float).tolist(),
+                    **metadata,
+                },
+            )
+            for content, metadata, doc_id, vector in zip(
+                results["documents"][0],  # type: ignore[index]
+                results["metadatas"][0],  # type: ignore[index]
+                results["ids"][0],
+                results["embeddings"][0],  # type: ignore[index]
+            )
+        ]
@@ -0,0 +1,39 @@
+"""Conventions of the persisted recipe collection shared by its readers.
+
+Ingestion, the retriever and the indexes built next to the collection all read
+its shredded metadata and the ingest run stamp. They live here rather than in
+`chef_agent.adjacency` so that importing them does not import
+`graph_retriever`, which is only needed once the retriever is built.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+PATH_DELIMITER = "→"
+"""Separator of shredded metadata keys, e.g. `keywords→"Eggs"`.
+
+Same as `langchain_graph_retriever`'s `DEFAULT_PATH_DELIMITER`, which the
+`ShreddingTransformer` used by ingestion and retrieval writes.
+"""
+
+INGEST_RUN_KEY = "chef_agent:ingest_run"
+"""Collection metadata key holding the id of the ingest run that last wrote to it."""
+
+
+def ingest_run(collection: Any) -> str | None:
+    """Return the id of the ingest run that last wrote to a Chroma collection."""
+    return (collection.metadata or {}).get(INGEST_RUN_KEY)
+
+
+def field_values(metadata: dict[str, Any], field: str) -> list[Any]:
+    """Return the values of `field` in shredded or plain metadata."""
+    prefix = field + PATH_DELIMITER
+    values = [json.loads(k[len(prefix) :]) for k in metadata if k.startswith(prefix)]
+    value = metadata.get(field)
+    if isinstance(value, list):
+        values.extend(value)
+    elif value is not None:
+        values.append(value)
+    return values
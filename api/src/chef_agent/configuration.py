@@ -3,11 +3,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field, fields
-from typing import Annotated, Optional
+from typing import Annotated, Literal
 
 from langchain_core.runnables import RunnableConfig, ensure_config
 
 from chef_agent import prompts
+from chef_agent.retrieval import (
+    COLLECTION_NAME,
+    EDGE_FIELDS,
+    EMBEDDING_MODEL,
+    PERSIST_DIRECTORY,
+    RetrieverSettings,
+)
 
 
 @dataclass(kw_only=True)
@@ -37,9 +44,181 @@ class Configuration:
         },
     )
 
+    retrieval_k: int = field(
+        default=5,
+        metadata={
+            "description": "The number of documents the graph traversal selects for each search query."
+        },
+    )
+
+    retrieval_strategy: Literal["eager", "mmr"] = field(
+        default="eager",
+        metadata={
+            "description": "How the graph retriever selects documents while traversing. 'eager' "
+            "takes every neighbor in order of discovery; 'mmr' trades relevance for diversity "
+            "(maximal marginal relevance, see `mmr_lambda_mult`)."
+        },
+    )
+
+    retrieval_start_k: int = field(
+        default=5,
+        metadata={
+            "description": "The number of documents found by similarity search to start the "
+            "graph traversal from."
+        },
+    )
+
+    retrieval_adjacent_k: int = field(
+        default=10,
+        metadata={
+            "description": "The number of neighbors fetched for each edge expansion during the traversal."
+        },
+    )
+
+    retrieval_max_depth: int = field(
+        default=3,
+        metadata={
+            "description": "The maximum number of edges followed from the start documents. "
+            "Lower values reduce latency; 0 disables the traversal."
+        },
+    )
+
+    retrieval_edges: list[str] = field(
+        default_factory=lambda: list(EDGE_FIELDS),
+        metadata={
+            "description": "The metadata fields the traversal follows between documents sharing "
+            "a value, e.g. recipes sharing a keyword or a question linked to its recipe by source_id."
+        },
+    )
+
+    mmr_lambda_mult: float = field(
+        default=0.5,
+        metadata={
+            "description": "The relevance/diversity trade-off of the 'mmr' strategy, from 0 "
+            "(maximum diversity) to 1 (maximum relevance)."
+        },
+    )
+
+    persist_directory: str = field(
+        default=PERSIST_DIRECTORY,
+        metadata={
+            "description": "The directory of the Chroma collection written by chef-ingest."
+        },
+    )
+
+    collection_name: str = field(
+        default=COLLECTION_NAME,
+        metadata={"description": "The name of the Chroma collection to search."},
+    )
+
+    embedding_model: str = field(
+        default=EMBEDDING_MODEL,
+        metadata={
+            "description": "The model embedding search queries. Must match the model the "
+            "collection was ingested with. Prefix a sentence-transformers model with 'local/' "
+            "(e.g. 'local/sentence-transformers/all-MiniLM-L6-v2') to embed in-process on the "
+            "CPU instead of calling OpenAI."
+        },
+    )
+
+    retrieval_mode: Literal["graph", "hybrid"] = field(
+        default="hybrid",
+        metadata={
+            "description": "How sources are retrieved. 'graph' uses the graph retriever alone; "
+            "'hybrid' also searches the lexical (BM25) index of recipe titles, ingredients and "
+            "keywords, using the selected ingredients, and fuses both rankings."
+        },
+    )
+
+    rrf_k: int = field(
+        default=60,
+        metadata={
+            "description": "The rank constant of reciprocal rank fusion in hybrid retrieval. "
+            "Higher values flatten the difference between top and lower ranks."
+        },
+    )
+
+    use_fast_router: bool = field(
+        default=True,
+        metadata={
+            "description": "Whether to handle unambiguous turns (small talk, recipe choices, obvious "
+            "recipe searches and ingredient checks) with local rules instead of a model call."
+        },
+    )
+
+    max_explaination_concurrency: int = field(
+        default=5,
+        metadata={
+            "description": "The maximum number of source explanations generated concurrently for each search."
+        },
+    )
+
+    explaination_mode: Literal["per_source", "batched"] = field(
+        default="per_source",
+        metadata={
+            "description": "How source explanations are generated. 'per_source' issues one request per "
+            "retrieved source; 'batched' explains all sources in a single structured-output request "
+            "and falls back to per-source requests for sources it could not map back."
+        },
+    )
+
+    use_explaination_cache: bool = field(
+        default=True,
+        metadata={
+            "description": "Whether to reuse cached source explanations for previously seen "
+            "question and source pairs."
+        },
+    )
+
+    use_search_cache: bool = field(
+        default=True,
+        metadata={
+            "description": "Whether to reuse search results from earlier queries with a similar embedding."
+        },
+    )
+
+    search_cache_threshold: float = field(
+        default=0.95,
+        metadata={
+            "description": "The minimum cosine similarity between query embeddings for a cached "
+            "search result to be reused."
+        },
+    )
+
+    max_context_tokens: int = field(
+        default=12_000,
+        metadata={
+            "description": "The token budget for each model call, covering the system prompt, "
+            "retrieved documents and conversation history. Older turns are dropped first."
+        },
+    )
+
+    max_document_tokens: int = field(
+        default=4_000,
+        metadata={
+            "description": "The share of the context budget available to retrieved documents. "
+            "Documents are ranked by retrieval similarity and added until it is spent."
+        },
+    )
+
+    def retriever_settings(self) -> RetrieverSettings:
+        """Return the settings of the graph retriever this configuration searches with."""
+        return RetrieverSettings(
+            persist_directory=self.persist_directory,
+            collection_name=self.collection_name,
+            embedding_model=self.embedding_model,
+            edges=tuple(self.retrieval_edges),
+            strategy=self.retrieval_strategy,
+            k=self.retrieval_k,
+            start_k=self.retrieval_start_k,
+            adjacent_k=self.retrieval_adjacent_k,
+            max_depth=self.retrieval_max_depth,
+            lambda_mult=self.mmr_lambda_mult,
+        )
+
     @classmethod
     def from_runnable_config(
-        cls, config: Optional[RunnableConfig] = None
+        cls, config: RunnableConfig | None = None
     ) -> Configuration:
         """Create a Configuration instance from a RunnableConfig object."""
         config = ensure_config(config)
@@ -0,0 +1,200 @@
+"""Token-budgeted prompt assembly for the agent.
+
+`call_model` sends the system prompt, the conversation and the retrieved
+documents on every turn. `build_context` fits all three into a fixed token
+budget so the cost of a turn stays flat as the conversation grows: documents
+are ranked and added until their share of the budget is spent, and the oldest
+turns are dropped (leaving a one-line note of what the user asked) once the
+history no longer fits.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Sequence
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    trim_messages,
+)
+
+from chef_agent.cache import LRUCache
+from chef_agent.utils import format_docs, get_message_text
+
+MESSAGE_OVERHEAD_TOKENS = 4
+"""Tokens added per message for role and separator markup."""
+
+EARLIER_QUESTIONS_LIMIT = 5
+"""Maximum number of dropped user questions listed in the history note."""
+
+
+class TokenCounter:
+    """Count tokens with a chat model's tokenizer.
+
+    Counts are memoized per text since the same messages and documents are
+    counted on every turn. If the model's tokenizer is unavailable (e.g. it
+    cannot be downloaded), counts fall back to a four-characters-per-token
+    estimate.
+    """
+
+    def __init__(self, model: BaseChatModel, cache_size: int = 4096) -> None:
+        """Count with the tokenizer of `model`, memoizing up to `cache_size` texts."""
+        self.model = model
+        self._counts: LRUCache[int] = LRUCache(cache_size)
+        self._use_tokenizer = True
+
+    def count_text(self, text: str) -> int:
+        """Return the number of tokens in `text`."""
+        if not text:
+            return 0
+        count = self._counts.get(text)
+        if count is None:
+            count = self._tokenize(text)
+            self._counts.set(text, count)
+        return count
+
+    def _tokenize(self, text: str) -> int:
+        if self._use_tokenizer:
+            try:
+                return self.model.get_num_tokens(text)
+            except Exception:
+                self._use_tokenizer = False
+        return len(text) // 4 + 1
+
+    def count_message(self, message: BaseMessage) -> int:
+        """Return the number of tokens in `message`, including its tool calls."""
+        tokens = self.count_text(get_message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tokens += self.count_text(json.dumps(message.tool_calls, default=str))
+        return tokens
+
+    def __call__(self, messages: list[BaseMessage]) -> int:
+        """Return the number of tokens in `messages`."""
+        return sum(self.count_message(m) for m in messages)
+
+
+_counters: dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: str, model: BaseChatModel) -> TokenCounter:
+    """Return the shared token counter for `model_name`."""
+    with _counters_lock:
+        counter = _counters.get(model_name)
+        if counter is None:
+            counter = _counters[model_name] = TokenCounter(model)
+        return counter
+
+
+def rank_documents(documents: Sequence[Document]) -> list[Document]:
+    """Order documents by retrieval similarity, most recent first on ties."""
+    ranked = list(reversed(documents))
+    ranked.sort(key=lambda d: -float(d.metadata.get("_similarity_score") or 0.0))
+    return ranked
+
+
+def select_documents(
+    documents: Sequence[Document], counter: TokenCounter, max_tokens: int
+) -> list[Document]:
+    """Return the highest ranked documents whose formatted text fits `max_tokens`."""
+    selected = []
+    used = 0
+    for doc in rank_documents(documents):
+        tokens = counter.count_text(format_docs(doc)["context"])
+        if used + tokens > max_tokens:
+            continue
+        selected.append(doc)
+        used += tokens
+    return selected
+
+
+def _history_note(dropped: Sequence[AnyMessage]) -> str:
+    questions = [
+        get_message_text(m)[:200] for m in dropped if isinstance(m, HumanMessage)
+    ][-EARLIER_QUESTIONS_LIMIT:]
+    if not questions:
+        return ""
+    return "Earlier in this conversation the user asked: " + "; ".join(questions)
+
+
+def trim_history(
+    messages: Sequence[AnyMessage], counter: TokenCounter, max_tokens: int
+) -> list[BaseMessage]:
+    """Keep the most recent turns of `messages` that fit `max_tokens`.
+
+    The kept history always starts on a user message so tool calls are never
+    separated from their results. If even the latest turn does not fit, it is
+    kept anyway. Dropped turns are replaced by a short note listing the user's
+    earlier questions when there is room for it.
+    """
+    if counter(list(messages)) <= max_tokens:
+        return list(messages)
+    kept = _trim_to(messages, counter, max_tokens)
+
+    note = _history_note(messages[: len(messages) - len(kept)])
+    if note:
+        # Make room for the note by dropping further turns if needed.
+        note_tokens = counter.count_message(SystemMessage(content=note))
+        if counter(kept) + note_tokens > max_tokens:
+            kept = _trim_to(messages, counter, max_tokens - note_tokens)
+            note = _history_note(messages[: len(messages) - len(kept)])
+        note_message = SystemMessage(content=note)
+        if counter([note_message, *kept]) <= max_tokens:
+            return [note_message, *kept]
+    return kept
+
+
+def _trim_to(
+    messages: Sequence[AnyMessage], counter: TokenCounter, max_tokens: int
+) -> list[BaseMessage]:
+    kept = trim_messages(
+        list(messages),
+        max_tokens=max(max_tokens, 0),
+        token_counter=counter,
+        strategy="last",
+        start_on="human",
+    )
+    if kept:
+        return kept
+    last_human = max(
+        (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)),
+        default=len(messages) - 1,
+    )
+    return list(messages[last_human:])
+
+
+def build_context(
+    system_message: str,
+    messages: Sequence[AnyMessage],
+    documents: Sequence[Document],
+    counter: TokenCounter,
+    *,
+    max_tokens: int,
+    max_document_tokens: int,
+) -> list[Any]:
+    """Assemble the model input within a token budget.
+
+    The system prompt is always included. Documents get up to
+    `max_document_tokens` of what remains, and the conversation history gets
+    the rest.
+    """
+    system = SystemMessage(content=system_message)
+    remaining = max_tokens - counter.count_message(system)
+
+    docs = select_documents(
+        documents, counter, min(max_document_tokens, max(remaining, 0))
+    )
+    document_info: list[BaseMessage] = []
+    if docs:
+        document_info.append(AIMessage(content=format_docs(docs)["context"]))
+        remaining -= counter(document_info)
+
+    history = trim_history(messages, counter, max(remaining, 0))
+    return [system, *history, *document_info]
@@ -0,0 +1,280 @@
+"""Ingredient coverage over the whole recipe corpus.
+
+Answers "what can I cook with these ingredients" and "what am I missing"
+deterministically instead of asking the model to reason over search results.
+Every recipe's keywords are normalized into a vocabulary and each recipe is
+stored as the ids of its ingredients in that vocabulary (CSR `indptr` and
+`indices` arrays, memory-mapped from disk). A query is a boolean mask over the
+vocabulary, so the ingredients a recipe is missing are its ids outside the
+mask. They are counted one block of recipes at a time, which keeps memory use
+independent of the size of the corpus and the vocabulary.
+
+An ingredient covers the keywords naming it, possibly with descriptive
+modifiers ("beef" covers "Ground beef", "sugar" covers "Brown sugar"), but not
+compounds naming another ingredient ("cream" does not cover "Ice cream").
+Pantry staples only cover keywords naming exactly them, so "pepper" does not
+cover "Green pepper".
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from chef_agent.collection import field_values
+from chef_agent.lexical import tokenize
+
+PANTRY_STAPLES = ("salt", "pepper", "water")
+"""Ingredients assumed to be available in every kitchen."""
+
+_DESCRIPTORS = frozenset(
+    """
+    baby black boneless brown chilled chopped coarse coarsely cold cooked crushed
+    cubed dark diced dried drained dry extra fine finely firm fresh freshly frozen
+    golden granulated grated green ground halved large lean light mashed medium
+    melted minced packed peeled pitted plain purpose raw red ripe roasted rinsed
+    salted seedless shelled shredded skinless sliced small smoked softened toasted
+    trimmed unsalted unsweetened virgin warm white whole yellow
+    """.split()
+)
+"""Normalized modifiers that describe an ingredient rather than name another one."""
+
+_META = "meta.json"
+_BLOCK_ROWS = 65_536
+
+
+def coverage_path_for(persist_directory: str, collection_name: str) -> Path:
+    """Return the default index location for a collection."""
+    directory = Path(persist_directory)
+    return directory.with_name(f"{directory.name}.{collection_name}.coverage")
+
+
+def normalize_ingredient(name: str) -> str:
+    """Return the matching key of an ingredient name, e.g. "Brown Eggs" -> "brown egg"."""
+    return " ".join(tokenize(name))
+
+
+def _title(content: str) -> str:
+    if content.startswith("# "):
+        return content[2:].split("\n", 1)[0].strip()
+    return ""
+
+
+def build_coverage_index(
+    collection: Any,
+    path: os.PathLike[str] | str,
+    page_size: int = 5_000,
+) -> int:
+    """Build the ingredient index of the recipe documents in a Chroma collection.
+
+    Ingredient ids are appended to flat arrays as the collection is read page
+    by page; only the vocabulary is kept as Python objects.
+
+    Returns:
+        The number of indexed recipes.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    ids: list[str] = []
+    titles: list[str] = []
+    # Ingredient ids in order of first appearance, renumbered once sorted.
+    positions: dict[str, int] = {}
+    labels: list[str] = []
+    indptr = array("q", [0])
+    indices = array("i")
+    count = collection.count()
+    for offset in range(0, count, page_size):
+        page = collection.get(
+            where={"type": "recipe"},
+            include=["documents", "metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        for doc_id, content, metadata in zip(
+            page["ids"], page["documents"], page["metadatas"]
+        ):
+            row: dict[int, None] = {}
+            for keyword in field_values(metadata or {}, "keywords"):
+                key = normalize_ingredient(str(keyword))
+                if not key:
+                    continue
+                position = positions.get(key)
+                if position is None:
+                    position = positions[key] = len(labels)
+                    labels.append(str(keyword))
+                row[position] = None
+            indices.extend(row)
+            indptr.append(len(indices))
+            ids.append(doc_id)
+            titles.append(_title(content or ""))
+
+    terms = sorted(positions)
+    renumber = np.empty(len(terms), dtype=np.int32)
+    renumber[[positions[term] for term in terms]] = np.arange(len(terms))
+    np.save(tmp / "indptr.npy", np.frombuffer(indptr, dtype=np.int64))
+    np.save(tmp / "indices.npy", renumber[np.frombuffer(indices, dtype=np.intc)])
+    (tmp / "terms.json").write_text(json.dumps(terms))
+    (tmp / "labels.json").write_text(
+        json.dumps([labels[positions[term]] for term in terms])
+    )
+    (tmp / "ids.json").write_text(json.dumps(ids))
+    (tmp / "titles.json").write_text(json.dumps(titles))
+    (tmp / _META).write_text(json.dumps({"count": len(ids), "terms": len(terms)}))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return len(ids)
+
+
+def _row_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Return the number of true `values` in each row delimited by `offsets`."""
+    totals = np.zeros(len(values) + 1, dtype=np.int32)
+    np.cumsum(values, dtype=np.int32, out=totals[1:])
+    return totals[offsets[1:]] - totals[offsets[:-1]]
+
+
+@dataclass(frozen=True)
+class CoverageMatch:
+    """How well the available ingredients cover one recipe."""
+
+    id: str
+    title: str
+    matched: list[str]
+    missing: list[str]
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the recipe's ingredients that are available."""
+        total = len(self.matched) + len(self.missing)
+        return len(self.matched) / total if total else 0.0
+
+
+class CoverageIndex:
+    """Read-only, memory-mapped recipe ingredient index."""
+
+    def __init__(self, path: os.PathLike[str] | str) -> None:
+        """Memory-map the index at `path`."""
+        path = Path(path)
+        self.count: int = json.loads((path / _META).read_text())["count"]
+        self.ids: list[str] = json.loads((path / "ids.json").read_text())
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.titles: list[str] = json.loads((path / "titles.json").read_text())
+        terms = json.loads((path / "terms.json").read_text())
+        self._terms = {term: i for i, term in enumerate(terms)}
+        # A keyword is also found by its head after leading descriptive
+        # modifiers, so "sugar" finds "brown sugar" but "cream" not "ice cream".
+        self._heads: dict[str, list[int]] = {}
+        for i, term in enumerate(terms):
+            words = term.split()
+            for start in range(len(words)):
+                self._heads.setdefault(" ".join(words[start:]), []).append(i)
+                if words[start] not in _DESCRIPTORS:
+                    break
+        self.labels: list[str] = json.loads((path / "labels.json").read_text())
+        self.indptr = np.load(path / "indptr.npy", mmap_mode="r")
+        self.indices = np.load(path / "indices.npy", mmap_mode="r")
+
+    @classmethod
+    def load(cls, path: os.PathLike[str] | str) -> CoverageIndex | None:
+        """Load the index at `path`, or return None if there is none."""
+        if not (Path(path) / _META).exists():
+            return None
+        return cls(path)
+
+    def encode(
+        self, ingredients: Iterable[str], *, exact: bool = False
+    ) -> tuple[np.ndarray, list[str]]:
+        """Return the vocabulary mask of `ingredients` and the names not in it.
+
+        An ingredient also covers the keywords naming it with descriptive
+        modifiers, so "sugar" covers "brown sugar", unless `exact` is set.
+        """
+        bits = np.zeros(len(self.labels), dtype=bool)
+        unknown = []
+        for name in ingredients:
+            key = normalize_ingredient(name)
+            if not key:
+                continue
+            if exact:
+                term = self._terms.get(key)
+                matches = [] if term is None else [term]
+            else:
+                matches = self._heads.get(key, [])
+            if matches:
+                bits[matches] = True
+            else:
+                unknown.append(name)
+        return bits, unknown
+
+    def _available(
+        self, ingredients: Iterable[str], staples: Iterable[str]
+    ) -> np.ndarray:
+        given, _ = self.encode(ingredients)
+        pantry, _ = self.encode(staples, exact=True)
+        return given | pantry
+
+    def _match(self, row: int, available: np.ndarray) -> CoverageMatch:
+        terms = np.sort(self.indices[self.indptr[row] : self.indptr[row + 1]])
+        have = available[terms]
+        return CoverageMatch(
+            id=self.ids[row],
+            title=self.titles[row],
+            matched=[self.labels[i] for i in terms[have]],
+            missing=[self.labels[i] for i in terms[~have]],
+        )
+
+    def cookable(
+        self,
+        ingredients: Iterable[str],
+        *,
+        max_missing: int = 0,
+        k: int = 10,
+        staples: Iterable[str] = PANTRY_STAPLES,
+    ) -> list[CoverageMatch]:
+        """Return the recipes missing at most `max_missing` of their ingredients.
+
+        Recipes are ranked by the number of missing ingredients, then by the
+        number of available ingredients they use. Recipes using none of the
+        given ingredients (staples aside) are left out.
+        """
+        ingredients = list(ingredients)
+        available = self._available(ingredients, staples)
+        given, _ = self.encode(ingredients)
+        if k <= 0 or not self.count:
+            return []
+        rows, missing, used = [], [], []
+        for start in range(0, self.count, _BLOCK_ROWS):
+            indptr = np.asarray(self.indptr[start : start + _BLOCK_ROWS + 1])
+            terms = self.indices[indptr[0] : indptr[-1]]
+            offsets = indptr - indptr[0]
+            block_missing = _row_sums(~available[terms], offsets)
+            block_used = _row_sums(given[terms], offsets)
+            matches = np.flatnonzero((block_missing <= max_missing) & (block_used > 0))
+            rows.append(matches + start)
+            missing.append(block_missing[matches])
+            used.append(block_used[matches])
+        candidates = np.concatenate(rows)
+        order = np.lexsort((-np.concatenate(used), np.concatenate(missing)))[:k]
+        return [self._match(row, available) for row in candidates[order]]
+
+    def check(
+        self,
+        recipe_id: str,
+        ingredients: Iterable[str],
+        *,
+        staples: Iterable[str] = PANTRY_STAPLES,
+    ) -> CoverageMatch | None:
+        """Return what `ingredients` cover of one recipe, or None if it is not indexed."""
+        row = self.rows.get(recipe_id)
+        if row is None:
+            return None
+        return self._match(row, self._available(ingredients, staples))
@@ -0,0 +1,184 @@
+"""Embedding clients and wrappers used by the retriever and ingestion.
+
+`load_embeddings` returns the client for an embedding model name: OpenAI by
+default, or an in-process sentence-transformers model for names prefixed with
+`local/` (e.g. `local/sentence-transformers/all-MiniLM-L6-v2`). Local models
+run on the CPU without a network round trip; they need the `local` extra (or
+`local-onnx` with `CHEF_AGENT_LOCAL_EMBEDDING_BACKEND=onnx`). A collection
+must be searched with the model it was ingested with, since vectors of
+different models (and dimensions) are not comparable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import time
+from typing import Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from chef_agent.cache import TieredCache, embedding_cache_key, get_embedding_cache
+from chef_agent.metrics import EMBEDDING_DURATION
+
+
+class CachedEmbeddings(Embeddings):
+    """Cache query embeddings in front of another embeddings client.
+
+    Query vectors are keyed by model and normalized text, so repeated queries
+    skip the embedding round trip. Document embeddings are passed through
+    uncached since they are only computed during ingestion.
+
+    Every call is timed in the `chef_embedding_duration_seconds` metric.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        cache: TieredCache | None = None,
+    ) -> None:
+        """Wrap `embeddings` of `model`, caching in `cache` or the shared cache."""
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def _observe(self, start: float, hit: bool) -> None:
+        EMBEDDING_DURATION.observe(
+            time.perf_counter() - start,
+            model=self.model,
+            operation="query",
+            cache="hit" if hit else "miss",
+        )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents with the wrapped client."""
+        with EMBEDDING_DURATION.time(
+            model=self.model, operation="documents", cache="none"
+        ):
+            return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Asynchronously embed documents with the wrapped client."""
+        with EMBEDDING_DURATION.time(
+            model=self.model, operation="documents", cache="none"
+        ):
+            return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query, reusing a cached vector when available."""
+        start = time.perf_counter()
+        key = embedding_cache_key(text, self.model)
+        vector = self.cache.get(key)
+        if vector is None:
+            embedding = self.embeddings.embed_query(text)
+            self.cache.set(key, np.asarray(embedding, dtype=np.float32))
+        else:
+            embedding = vector.tolist()
+        self._observe(start, vector is not None)
+        return embedding
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Asynchronously embed a query, reusing a cached vector when available."""
+        start = time.perf_counter()
+        key = embedding_cache_key(text, self.model)
+        vector = await self.cache.aget(key)
+        if vector is None:
+            embedding = await self.embeddings.aembed_query(text)
+            await self.cache.aset(key, np.asarray(embedding, dtype=np.float32))
+        else:
+            embedding = vector.tolist()
+        self._observe(start, vector is not None)
+        return embedding
+
+
+LOCAL_EMBEDDING_PREFIX = "local/"
+"""Prefix of embedding model names computed in-process."""
+
+LOCAL_EMBEDDING_BACKEND = os.getenv("CHEF_AGENT_LOCAL_EMBEDDING_BACKEND", "torch")
+"""sentence-transformers backend of local models: "torch" or "onnx"."""
+
+
+@functools.cache
+def _load_sentence_transformer(model_name: str, backend: str) -> Any:
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "Local embedding models require sentence-transformers. "
+            "Install the `local` extra: pip install 'react-agent[local]'"
+        ) from e
+    return SentenceTransformer(model_name, device="cpu", backend=backend)
+
+
+class LocalEmbeddings(Embeddings):
+    """Embed in-process with a sentence-transformers model on the CPU.
+
+    Models are loaded once per process and name. Vectors are L2-normalized, so
+    Chroma's default L2 distance ranks them like cosine similarity. Documents
+    are encoded in batches of `batch_size`; async calls run in a worker thread
+    so encoding does not block the event loop.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        backend: str = LOCAL_EMBEDDING_BACKEND,
+        batch_size: int = 64,
+        warm_up: bool = True,
+    ) -> None:
+        """Load `model_name` with `backend`, warming it up unless `warm_up` is false."""
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = _load_sentence_transformer(model_name, backend)
+        if warm_up:
+            # The first encode initializes the runtime; pay for it at startup.
+            self.embed_query("warm up")
+
+    @property
+    def dimension(self) -> int:
+        """The number of dimensions of the vectors."""
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents in batches."""
+        return self._encode(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents in batches in a worker thread."""
+        return await asyncio.to_thread(self._encode, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query."""
+        return self._encode([text])[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a query in a worker thread."""
+        return (await asyncio.to_thread(self._encode, [text]))[0]
+
+
+def load_embeddings(model: str) -> Embeddings:
+    """Return the embeddings client for the model name `model`.
+
+    Names prefixed with `LOCAL_EMBEDDING_PREFIX` are loaded as local
+    sentence-transformers models (warmed up before returning); any other name
+    is an OpenAI embedding model.
+    """
+    if model.startswith(LOCAL_EMBEDDING_PREFIX):
+        return LocalEmbeddings(model[len(LOCAL_EMBEDDING_PREFIX) :])
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=model)
@@ -0,0 +1,373 @@
+"""Offline evaluation of graph traversal settings on the cooking QA questions.
+
+The collection holds question-answer documents from `cooking_squad`, each
+linked to the recipe it was asked about by its `source_id`. `chef-eval-retrieval`
+replays a sample of those questions through the `GraphRetriever` with every
+combination of the given `Eager` parameters (`k`, `start_k`, `max_depth`) and
+reports, per setting:
+
+- recall@k: the fraction of questions whose linked recipe is among the `k`
+  retrieved documents, and its mean reciprocal rank;
+- the latency of each retrieval (p50, p95 and mean);
+- the number of vector store calls per retrieval, by method. Edge expansions
+  answered by the adjacency index do not reach the store.
+
+Settings on the latency/recall frontier (no other setting is both at least as
+fast at p50 and better at recall) are marked, so traversal settings can be
+chosen on measurements. They map to the `retrieval_k`,
+`retrieval_start_k` and `retrieval_max_depth` fields of
+`chef_agent.configuration.Configuration`.
+
+    chef-eval-retrieval --questions 300 --k 5,10 --start-k 2,5 --max-depth 1,2,3
+
+Query embeddings are computed once before the first setting runs, so the
+reported latency is traversal only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+from graph_retriever.adapters import Adapter
+from graph_retriever.content import Content
+
+from chef_agent.retrieval import COLLECTION_NAME, EMBEDDING_MODEL, PERSIST_DIRECTORY
+
+if TYPE_CHECKING:
+    from langchain_graph_retriever import GraphRetriever
+
+logger = logging.getLogger(__name__)
+
+QA_TYPE = "question-answer"
+"""The `type` metadata of question-answer documents written by `chef-ingest`."""
+
+_QUESTION = re.compile(r"<question>\s*(.*?)\s*</question>", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class QAExample:
+    """A question and the id of the recipe it was asked about."""
+
+    qa_id: str
+    question: str
+    source_id: str
+
+
+@dataclass
+class SettingResult:
+    """Measurements of one traversal setting over every question."""
+
+    k: int
+    start_k: int
+    max_depth: int
+    questions: int
+    recall: float
+    mrr: float
+    p50_ms: float
+    p95_ms: float
+    mean_ms: float
+    store_calls: float
+    store_calls_by_method: dict[str, float] = field(default_factory=dict)
+    frontier: bool = False
+
+
+def load_qa_examples(
+    collection: Any, limit: int = 200, seed: int = 0
+) -> list[QAExample]:
+    """Sample question-answer documents linked to a recipe from a Chroma collection.
+
+    Args:
+        collection: The Chroma collection written by `chef-ingest`.
+        limit: The number of questions to sample (0 for all).
+        seed: The seed of the sample.
+    """
+    ids = collection.get(where={"type": QA_TYPE}, include=[])["ids"]
+    if limit and len(ids) > limit:
+        ids = list(np.random.default_rng(seed).choice(ids, limit, replace=False))
+    if not ids:
+        return []
+    page = collection.get(ids=ids, include=["documents", "metadatas"])
+    examples = []
+    for qa_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+        match = _QUESTION.search(text or "")
+        source_id = (metadata or {}).get("source_id")
+        if match and source_id:
+            examples.append(QAExample(qa_id, match.group(1), str(source_id)))
+    return examples
+
+
+class CountingAdapter(Adapter):
+    """Adapter counting the calls that reach the wrapped vector store adapter.
+
+    Edge expansions use the default `Adapter` implementation, i.e. one search
+    per metadata edge and one get for id edges, each counted.
+    """
+
+    def __init__(self, adapter: Adapter) -> None:
+        """Wrap `adapter`, counting its calls by method name."""
+        super().__init__()
+        self.adapter = adapter
+        self.calls: Counter[str] = Counter()
+
+    def __getattr__(self, name: str) -> Any:
+        """Look up attributes missing here on the wrapped adapter."""
+        if name == "adapter":
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+    def search_with_embedding(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> tuple[list[float], list[Content]]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["search"] += 1
+        return self.adapter.search_with_embedding(query, k, filter, **kwargs)
+
+    async def asearch_with_embedding(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> tuple[list[float], list[Content]]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["search"] += 1
+        return await self.adapter.asearch_with_embedding(query, k, filter, **kwargs)
+
+    def search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Content]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["search"] += 1
+        return self.adapter.search(embedding, k, filter, **kwargs)
+
+    async def asearch(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Content]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["search"] += 1
+        return await self.adapter.asearch(embedding, k, filter, **kwargs)
+
+    def get(
+        self, ids: Sequence[str], filter: dict[str, Any] | None = None, **kwargs: Any
+    ) -> list[Content]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["get"] += 1
+        return self.adapter.get(ids, filter, **kwargs)
+
+    async def aget(
+        self, ids: Sequence[str], filter: dict[str, Any] | None = None, **kwargs: Any
+    ) -> list[Content]:
+        """Count and delegate to the wrapped adapter."""
+        self.calls["get"] += 1
+        return await self.adapter.aget(ids, filter, **kwargs)
+
+
+def _counting_retriever(
+    base: GraphRetriever, k: int, start_k: int, max_depth: int
+) -> tuple[GraphRetriever, CountingAdapter]:
+    """Return a retriever like `base` with an `Eager` strategy and counted store calls."""
+    from graph_retriever.strategies import Eager
+    from langchain_graph_retriever import GraphRetriever
+
+    from chef_agent.adjacency import IndexedAdapter
+
+    store = base.store
+    if isinstance(store, IndexedAdapter):
+        counting = CountingAdapter(store.adapter)
+        store = IndexedAdapter(
+            counting, store.index, max_candidates=store.max_candidates
+        )
+    else:
+        counting = store = CountingAdapter(store)
+    retriever = GraphRetriever(
+        store=store,
+        edges=base.edges,
+        strategy=Eager(k=k, start_k=start_k, max_depth=max_depth),
+    )
+    return retriever, counting
+
+
+async def evaluate_setting(
+    base: GraphRetriever,
+    examples: Sequence[QAExample],
+    k: int,
+    start_k: int,
+    max_depth: int,
+) -> SettingResult:
+    """Replay `examples` one at a time through `base` with the given `Eager` setting."""
+    retriever, counting = _counting_retriever(base, k, start_k, max_depth)
+    durations = []
+    reciprocal_ranks = []
+    for example in examples:
+        start = time.perf_counter()
+        docs = await retriever.ainvoke(example.question)
+        durations.append(time.perf_counter() - start)
+        ids = [doc.id for doc in docs]
+        rank = ids.index(example.source_id) + 1 if example.source_id in ids else None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    n = max(len(examples), 1)
+    milliseconds = np.asarray(durations or [0.0]) * 1000
+    return SettingResult(
+        k=k,
+        start_k=start_k,
+        max_depth=max_depth,
+        questions=len(examples),
+        recall=round(sum(rr > 0 for rr in reciprocal_ranks) / n, 4),
+        mrr=round(sum(reciprocal_ranks) / n, 4),
+        p50_ms=round(float(np.percentile(milliseconds, 50)), 3),
+        p95_ms=round(float(np.percentile(milliseconds, 95)), 3),
+        mean_ms=round(float(milliseconds.mean()), 3),
+        store_calls=round(sum(counting.calls.values()) / n, 2),
+        store_calls_by_method={
+            method: round(count / n, 2)
+            for method, count in sorted(counting.calls.items())
+        },
+    )
+
+
+def mark_frontier(results: Sequence[SettingResult]) -> None:
+    """Flag the settings that no faster setting matches or beats on recall."""
+    best_recall = -1.0
+    for result in sorted(results, key=lambda r: (r.p50_ms, -r.recall)):
+        result.frontier = result.recall > best_recall
+        best_recall = max(best_recall, result.recall)
+
+
+async def _warm_query_embeddings(
+    base: GraphRetriever, examples: Sequence[QAExample], concurrency: int = 8
+) -> None:
+    embeddings = base.store.vector_store.embeddings
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(question: str) -> None:
+        async with semaphore:
+            await embeddings.aembed_query(question)
+
+    await asyncio.gather(*(embed(example.question) for example in examples))
+
+
+async def evaluate(
+    base: GraphRetriever,
+    examples: Sequence[QAExample],
+    k: Sequence[int] = (5,),
+    start_k: Sequence[int] = (5,),
+    max_depth: Sequence[int] = (3,),
+) -> list[SettingResult]:
+    """Evaluate every combination of the given `Eager` parameters."""
+    await _warm_query_embeddings(base, examples)
+    results = []
+    for setting in itertools.product(k, start_k, max_depth):
+        logger.info("Evaluating k=%d start_k=%d max_depth=%d", *setting)
+        results.append(await evaluate_setting(base, examples, *setting))
+    mark_frontier(results)
+    return results
+
+
+def format_results(results: Sequence[SettingResult]) -> str:
+    """Format `results` as a table, fastest first, frontier settings starred."""
+    header = (
+        f"{'':1} {'k':>3} {'start_k':>7} {'depth':>5} {'recall':>7} {'mrr':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'store calls':>11}"
+    )
+    rows = [header]
+    for r in sorted(results, key=lambda r: r.p50_ms):
+        rows.append(
+            f"{'*' if r.frontier else '':1} {r.k:>3} {r.start_k:>7} {r.max_depth:>5} "
+            f"{r.recall:>7.3f} {r.mrr:>6.3f} {r.p50_ms:>8.2f} {r.p95_ms:>8.2f} "
+            f"{r.store_calls:>11.1f}"
+        )
+    return "\n".join(rows)
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser for `chef-eval-retrieval`."""
+    parser = argparse.ArgumentParser(
+        prog="chef-eval-retrieval",
+        description="Measure recall and latency of graph traversal settings on the cooking QA questions.",
+    )
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument(
+        "--questions",
+        type=int,
+        default=200,
+        help="Number of questions to sample (0 for all).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--k", type=_int_list, default=[5], help="Comma-separated values."
+    )
+    parser.add_argument(
+        "--start-k", type=_int_list, default=[5], help="Comma-separated values."
+    )
+    parser.add_argument(
+        "--max-depth", type=_int_list, default=[1, 2, 3], help="Comma-separated values."
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run an evaluation from command line arguments."""
+    from dotenv import load_dotenv
+
+    from chef_agent.retrieval import RetrieverSettings, load_retriver
+
+    args = build_parser().parse_args(argv)
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    base = load_retriver(
+        RetrieverSettings(
+            persist_directory=args.persist_directory,
+            collection_name=args.collection,
+            embedding_model=args.embedding_model,
+        )
+    )
+    examples = load_qa_examples(
+        base.store.vector_store._collection, args.questions, args.seed
+    )
+    if not examples:
+        logger.error(
+            "No question-answer documents linked to a recipe in %s", args.collection
+        )
+        return 1
+    results = asyncio.run(
+        evaluate(base, examples, args.k, args.start_k, args.max_depth)
+    )
+    logger.info("Results:\n%s", format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,19 +3,96 @@
 Works with a chat model with tool calling support.
 """
 
+import os
+import uuid
 from datetime import datetime, timezone
 from typing import Dict, List, Literal, cast
 
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolNode
+from langgraph.types import Command
 
+from chef_agent.checkpoint import make_checkpointer
 from chef_agent.configuration import Configuration
+from chef_agent.context import build_context, get_token_counter
+from chef_agent.metrics import serve_metrics
+from chef_agent.retrieval import warm_retriever
+from chef_agent.router import classify, record_route
 from chef_agent.state import InputState, ChefState
 from chef_agent.tools import TOOLS
-from chef_agent.utils import load_chat_model, format_docs
-from langgraph.checkpoint.memory import MemorySaver
+from chef_agent.utils import (
+    get_message_text,
+    load_chat_model,
+    load_chat_model_with_tools,
+)
+
+# Define the function that routes each user turn
+
+
+def _tool_call(name: str, args: dict) -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex}"}],
+    )
+
+
+async def route_turn(
+    state: ChefState, config: RunnableConfig
+) -> Command[Literal["call_model", "tools", "__end__"]]:
+    """Handle unambiguous user turns without calling the model.
+
+    Small talk and recipe choices are answered directly; obvious recipe
+    searches and ingredient checks are dispatched to their tools. Every other
+    turn goes to `call_model`, as do short replies that may answer the
+    assistant's previous message (see `chef_agent.router`).
+    """
+    configuration = Configuration.from_runnable_config(config)
+    last_message = state.messages[-1] if state.messages else None
+    if not configuration.use_fast_router or not isinstance(last_message, HumanMessage):
+        return Command(goto="call_model")
+
+    previous = next(
+        (m for m in reversed(state.messages[:-1]) if isinstance(m, AIMessage)), None
+    )
+    decision = classify(
+        get_message_text(last_message),
+        state.documents,
+        get_message_text(previous) if previous is not None else "",
+    )
+    record_route(decision.route)
+    if decision.route == "smalltalk":
+        return Command(
+            goto="__end__", update={"messages": [AIMessage(content=decision.reply)]}
+        )
+    if decision.route == "recipe_choice" and decision.recipe is not None:
+        title = decision.recipe.metadata.get("title", decision.recipe.id)
+        return Command(
+            goto="__end__",
+            update={
+                "messages": [
+                    AIMessage(content=f"Great! You have selected recipe {title}.")
+                ],
+                "selected_recipe": decision.recipe,
+            },
+        )
+    if decision.route == "search":
+        return Command(
+            goto="tools",
+            update={"messages": [_tool_call("search", {"query": decision.query})]},
+        )
+    if decision.route == "ingredient_check":
+        return Command(
+            goto="tools",
+            update={
+                "messages": [
+                    _tool_call("check_ingredients", {"ingredients": decision.ingredients})
+                ]
+            },
+        )
+    return Command(goto="call_model")
+
 
 # Define the function that calls the model
 
@@ -36,24 +113,29 @@ async def call_model(
     """
     configuration = Configuration.from_runnable_config(config)
 
-    # Initialize the model with tool binding. Change the model or add more tools here.
-    model = load_chat_model(configuration.model).bind_tools(TOOLS)
+    # Load the cached model with tool binding. Change the model or add more tools here.
+    model = load_chat_model_with_tools(configuration.model, TOOLS)
 
     # Format the system prompt. Customize this to change the agent's behavior.
     system_message = configuration.system_prompt.format(
         system_time=datetime.now(tz=timezone.utc).isoformat()
     )
 
-    document_info = [
-        {"role": "assistant", "content": format_docs(doc)["context"]} for doc in state.documents]
+    # Fit the system prompt, retrieved documents and history into the token budget
+    counter = get_token_counter(
+        configuration.model, load_chat_model(configuration.model)
+    )
+    context = build_context(
+        system_message,
+        state.messages,
+        state.documents,
+        counter,
+        max_tokens=configuration.max_context_tokens,
+        max_document_tokens=configuration.max_document_tokens,
+    )
 
     # Get the model's response
-    response = cast(
-        AIMessage,
-        await model.ainvoke(
-            [{"role": "system", "content": system_message}, *state.messages, *document_info], config
-        ),
-    )
+    response = cast(AIMessage, await model.ainvoke(context, config))
 
     # Handle the case when it's the last step and the model still wants to use a tool
     if state.is_last_step and response.tool_calls:
@@ -71,17 +153,26 @@ async def call_model(
     return {"messages": [response]}
     
 
+# Open the persisted index at startup instead of on the first search
+if os.getenv("CHEF_AGENT_WARM_RETRIEVER", "").lower() in ("1", "true", "yes"):
+    warm_retriever()
+
+# Export the metrics registry for Prometheus scraping
+if os.getenv("CHEF_AGENT_METRICS_PORT"):
+    serve_metrics(int(os.environ["CHEF_AGENT_METRICS_PORT"]))
+
 # Define a new graph
-checkpointer = MemorySaver()
+checkpointer = make_checkpointer()
 builder = StateGraph(ChefState, input=InputState, config_schema=Configuration)
 
-# Define the two nodes we will cycle between
+# Define the two nodes we will cycle between, and the router in front of them
+builder.add_node(route_turn)
 builder.add_node(call_model)
 builder.add_node("tools", ToolNode(TOOLS))
 
-# Set the entrypoint as `call_model`
+# Set the entrypoint as `route_turn`
 # This means that this node is the first one called
-builder.add_edge("__start__", "call_model")
+builder.add_edge("__start__", "route_turn")
 
 
 def route_model_output(state: ChefState) -> Literal["__end__", "tools"]:
@@ -0,0 +1,18 @@
+"""Offline ingestion of the recipe datasets into the Chroma collection.
+
+Run `chef-ingest --help` (or `python -m chef_agent.ingest`) for the command
+line interface. Requires the `ingest` extra.
+"""
+
+from chef_agent.ingest.embedding import BatchEmbedder
+from chef_agent.ingest.pipeline import IngestSettings, IngestStats, aingest, ingest
+from chef_agent.ingest.store import ChromaWriter
+
+__all__ = [
+    "BatchEmbedder",
+    "ChromaWriter",
+    "IngestSettings",
+    "IngestStats",
+    "aingest",
+    "ingest",
+]
@@ -0,0 +1,5 @@
+"""Run the ingestion CLI with `python -m chef_agent.ingest`."""
+
+from chef_agent.ingest.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""Command line entry point for building the recipe collection."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import asdict
+from typing import Sequence
+
+from dotenv import load_dotenv
+
+from chef_agent.ingest.pipeline import IngestSettings, ingest
+
+logger = logging.getLogger("chef_agent.ingest")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser for `chef-ingest`."""
+    defaults = IngestSettings(recipes_path="")
+    parser = argparse.ArgumentParser(
+        prog="chef-ingest",
+        description="Embed the recipe and cooking QA datasets into a Chroma collection.",
+    )
+    parser.add_argument("recipes", help="Path to the recipes parquet file.")
+    parser.add_argument("--qa", help="Path or URL of the cooking SQuAD JSON file.")
+    parser.add_argument(
+        "--keywords",
+        help="Parquet file of precomputed `source_id`, `cleaned_ner` keywords.",
+    )
+    parser.add_argument("--persist-directory", default=defaults.persist_directory)
+    parser.add_argument("--collection", default=defaults.collection_name)
+    parser.add_argument(
+        "--embedding-model",
+        default=defaults.embedding_model,
+        help="OpenAI embedding model, or 'local/<sentence-transformers model>' to embed "
+        "in-process. Use a collection per model.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=defaults.limit,
+        help="Number of recipe rows to read (0 for all).",
+    )
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--batch-size", type=int, default=defaults.embed_batch_size)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=defaults.max_concurrency,
+        help="Maximum number of embedding requests in flight.",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Delete the collection before writing.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Embed every document instead of only new and changed ones.",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Path of the content-hash manifest (defaults to next to the persist directory).",
+    )
+    parser.add_argument(
+        "--no-adjacency-index",
+        action="store_true",
+        help="Skip building the adjacency index used for graph traversal.",
+    )
+    parser.add_argument(
+        "--no-lexical-index",
+        action="store_true",
+        help="Skip building the lexical index used for hybrid retrieval.",
+    )
+    parser.add_argument(
+        "--no-coverage-index",
+        action="store_true",
+        help="Skip building the ingredient coverage index used by check_ingredients.",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run an ingestion from command line arguments."""
+    args = build_parser().parse_args(argv)
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    settings = IngestSettings(
+        recipes_path=args.recipes,
+        qa_path=args.qa,
+        keywords_path=args.keywords,
+        persist_directory=args.persist_directory,
+        collection_name=args.collection,
+        embedding_model=args.embedding_model,
+        limit=args.limit or None,
+        chunk_size=args.chunk_size,
+        embed_batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        reset=args.reset,
+        incremental=not args.full,
+        manifest_path=args.manifest,
+        adjacency_index=not args.no_adjacency_index,
+        lexical_index=not args.no_lexical_index,
+        coverage_index=not args.no_coverage_index,
+    )
+    stats = ingest(settings)
+    logger.info("Done: %s", asdict(stats))
+    return 0
@@ -0,0 +1,101 @@
+"""Batched, concurrent document embedding for ingestion."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    """Return the server-requested delay for a rate limit error, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Return whether `exc` signals that the embedding API is rate limiting us."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    return "RateLimit" in type(exc).__name__
+
+
+class BatchEmbedder:
+    """Embed documents in batches with bounded, rate-limit-aware concurrency.
+
+    Up to `max_concurrency` batches are in flight at once. When the provider
+    rate limits a batch, every worker pauses until the requested (or an
+    exponentially growing) cool-down has passed, and the batch is retried.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+        max_retries: int = 8,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        """Embed with `embeddings` in batches of `batch_size` documents.
+
+        A rate-limited batch is retried up to `max_retries` times, backing off
+        from `initial_backoff` up to `max_backoff` seconds.
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.rate_limited = 0
+        self._resume_at = 0.0
+
+    async def _wait_for_cooldown(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _embed_batch(
+        self, texts: list[str], semaphore: asyncio.Semaphore
+    ) -> list[list[float]]:
+        backoff = self.initial_backoff
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await self._wait_for_cooldown()
+                self.requests += 1
+                try:
+                    return await self.embeddings.aembed_documents(texts)
+                except Exception as exc:
+                    if not is_rate_limit_error(exc) or attempt == self.max_retries:
+                        raise
+                    self.rate_limited += 1
+                    delay = _retry_after(exc) or backoff * (1 + random.random())
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    logger.warning("Rate limited; pausing embeddings for %.1fs", delay)
+        raise AssertionError("unreachable")
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts`, preserving their order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._embed_batch(batch, semaphore) for batch in batches)
+        )
+        return [vector for result in results for vector in result]
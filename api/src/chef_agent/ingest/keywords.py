@@ -0,0 +1,260 @@
+"""Merge near-identical NER ingredient names into shared recipe keywords.
+
+Recipes share a keyword edge in the graph retriever when they have an
+ingredient name in common. Names that are spelled differently but have
+(almost) the same word vector, e.g. "Powdered sugar" and "Powder sugar", are
+merged so those recipes are linked too: a recipe gets keyword `a` if it lists
+`a` or any name whose vector has a cosine similarity above the threshold with
+`a`.
+
+Similar pairs are found with blocked matrix multiplication over a single
+normalized float32 matrix of name vectors, split across worker processes.
+The output is the `source_id`, `cleaned_ner` parquet consumed by
+`chef-ingest --keywords`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from chef_agent.ingest.pipeline import read_recipe_chunks
+from chef_agent.ingest.transforms import clean_keyword_names, normalize_ner, recipe_ner
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 0.99
+BLOCK_SIZE = 2048
+
+Vectorizer = Callable[[Sequence[str]], np.ndarray]
+"""Maps names to a (len(names), dim) matrix; names without a vector get zeros."""
+
+
+def spacy_vectorizer(
+    model: str = "en_core_web_lg", batch_size: int = 1000
+) -> Vectorizer:
+    """Return a vectorizer using a spaCy pipeline's static word vectors."""
+    import spacy
+
+    spacy.prefer_gpu()
+    nlp = spacy.load(
+        model, exclude=["tagger", "parser", "ner", "attribute_ruler", "lemmatizer"]
+    )
+
+    def vectorize(names: Sequence[str]) -> np.ndarray:
+        return np.stack(
+            [
+                doc.vector if doc.has_vector else np.zeros(nlp.vocab.vectors_length)
+                for doc in nlp.pipe(names, batch_size=batch_size)
+            ]
+        ).astype(np.float32)
+
+    return vectorize
+
+
+def normalize_rows(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return unit-length float32 rows and a mask of the rows that had a vector."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    has_vector = norms > 0
+    normalized = np.zeros_like(vectors)
+    normalized[has_vector] = vectors[has_vector] / norms[has_vector, None]
+    return normalized, has_vector
+
+
+_worker_matrix: np.ndarray | None = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_matrix
+    _worker_matrix = np.load(path, mmap_mode="r")
+
+
+def _block_pairs(
+    task: tuple[int, int, int, float], matrix: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the (row, col) pairs with row < col above the threshold in one block."""
+    row_start, col_start, block_size, threshold = task
+    m = _worker_matrix if matrix is None else matrix
+    assert m is not None
+    rows = np.asarray(m[row_start : row_start + block_size])
+    cols = np.asarray(m[col_start : col_start + block_size])
+    r, c = np.nonzero(rows @ cols.T > threshold)
+    r += row_start
+    c += col_start
+    upper = r < c
+    return r[upper].astype(np.int32), c[upper].astype(np.int32)
+
+
+def similar_pairs(
+    vectors: np.ndarray,
+    threshold: float = SIMILARITY_THRESHOLD,
+    *,
+    block_size: int = BLOCK_SIZE,
+    workers: int | None = None,
+) -> np.ndarray:
+    """Return an (n, 2) array of index pairs `i < j` with cosine similarity above `threshold`.
+
+    Only the upper triangle of the similarity matrix is computed, one
+    `block_size` square at a time, so memory is bounded by the block size.
+    Blocks are spread over `workers` processes (all CPUs by default), which
+    read the normalized matrix from a shared memory-mapped file.
+    """
+    normalized, _ = normalize_rows(vectors)
+    n = len(normalized)
+    starts = range(0, n, block_size)
+    tasks = [(i, j, block_size, threshold) for i in starts for j in starts if j >= i]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tasks) == 1:
+        results = [_block_pairs(task, normalized) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "vectors.npy")
+            np.save(path, normalized)
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(path,)
+            ) as pool:
+                results = list(pool.map(_block_pairs, tasks, chunksize=4))
+
+    if not results:
+        return np.empty((0, 2), dtype=np.int32)
+    return np.stack(
+        [
+            np.concatenate([r for r, _ in results]),
+            np.concatenate([c for _, c in results]),
+        ],
+        axis=1,
+    )
+
+
+def keyword_groups(
+    recipes: pd.DataFrame,
+    vectorize: Vectorizer,
+    threshold: float = SIMILARITY_THRESHOLD,
+    *,
+    block_size: int = BLOCK_SIZE,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """Compute each recipe's merged keywords.
+
+    Args:
+        recipes: `source_id` and `ner` (list of raw names) per recipe.
+        vectorize: Maps ingredient names to word vectors.
+
+    Returns:
+        A frame of `source_id` and `cleaned_ner` (list of keywords). Names
+        without a word vector are dropped, as in the indexing notebook.
+    """
+    membership = (
+        recipes[["source_id", "ner"]].explode("ner").dropna().reset_index(drop=True)
+    )
+    names = normalize_ner(membership["ner"].astype(str))
+    membership = membership.loc[names.index].assign(ner=names)
+
+    vocab = pd.Index(membership["ner"].unique())
+    vectors, has_vector = normalize_rows(vectorize(list(vocab)))
+    logger.info("Vectorized %d names (%d with vectors)", len(vocab), has_vector.sum())
+    vocab = vocab[has_vector]
+    vectors = vectors[has_vector]
+
+    pairs = similar_pairs(vectors, threshold, block_size=block_size, workers=workers)
+    logger.info("Found %d similar name pairs", len(pairs))
+
+    # (source_id, name) for every name a recipe lists...
+    direct = pd.DataFrame(
+        {
+            "source_id": membership["source_id"].to_numpy(),
+            "name": vocab.get_indexer(membership["ner"]),
+        }
+    )
+    direct = direct[direct["name"] >= 0]
+    # ...plus every name similar to one of them.
+    links = pd.DataFrame(
+        {
+            "name": np.concatenate([pairs[:, 0], pairs[:, 1]]),
+            "similar": np.concatenate([pairs[:, 1], pairs[:, 0]]),
+        }
+    )
+    merged = direct.merge(links, on="name")[["source_id", "similar"]].rename(
+        columns={"similar": "name"}
+    )
+    keywords = pd.concat([direct, merged], ignore_index=True)
+    keywords["name"] = clean_keyword_names(
+        pd.Series(vocab.to_numpy(), dtype=object)
+    ).to_numpy()[keywords["name"].to_numpy()]
+    keywords = keywords[keywords["name"] != ""].drop_duplicates()
+    return (
+        keywords.groupby("source_id", sort=False)["name"]
+        .agg(list)
+        .rename("cleaned_ner")
+        .reset_index()
+    )
+
+
+def build_keywords(
+    recipes_path: str,
+    output_path: str,
+    *,
+    vectorize: Vectorizer | None = None,
+    limit: int | None = 250_000,
+    chunk_size: int = 50_000,
+    threshold: float = SIMILARITY_THRESHOLD,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """Compute merged keywords for the recipes parquet and write them to `output_path`.
+
+    Recipes are read with the same row limit and title de-duplication as
+    `chef-ingest`, so the `source_id`s match.
+    """
+    seen_titles: set[str] = set()
+    recipes = pd.concat(
+        [
+            recipe_ner(chunk, seen_titles)
+            for chunk in read_recipe_chunks(recipes_path, chunk_size, limit)
+        ],
+        ignore_index=True,
+    )
+    groups = keyword_groups(
+        recipes, vectorize or spacy_vectorizer(), threshold, workers=workers
+    )
+    groups.to_parquet(output_path)
+    return groups
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Compute merged recipe keywords from command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="chef-keywords",
+        description="Merge near-identical ingredient names into recipe keywords.",
+    )
+    parser.add_argument("recipes", help="Path to the recipes parquet file.")
+    parser.add_argument("output", help="Parquet file to write the keywords to.")
+    parser.add_argument("--limit", type=int, default=250_000, help="0 for all rows.")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--workers", type=int, help="Defaults to the CPU count.")
+    parser.add_argument("--spacy-model", default="en_core_web_lg")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    groups = build_keywords(
+        args.recipes,
+        args.output,
+        vectorize=spacy_vectorizer(args.spacy_model),
+        limit=args.limit or None,
+        threshold=args.threshold,
+        workers=args.workers,
+    )
+    logger.info("Wrote keywords for %d recipes to %s", len(groups), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+"""Content-hash manifest for incremental, resumable indexing.
+
+The manifest is a SQLite file next to the Chroma persist directory recording
+the content hash, kind (recipe or question-answer) and last run that saw each
+indexed document. Documents are only embedded when their hash changed, and a
+hash is recorded only after the document has been written to Chroma, so a run
+that is interrupted can be started again without re-embedding anything it
+already wrote. Documents of a kind a run covered in full, but did not see, are
+deleted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Sequence
+
+from langchain_core.documents import Document
+
+
+def manifest_path_for(persist_directory: str, collection_name: str) -> Path:
+    """Return the default manifest location for a collection."""
+    directory = Path(persist_directory)
+    return directory.with_name(f"{directory.name}.{collection_name}.manifest.sqlite")
+
+
+def content_hash(doc: Document, embedding_model: str) -> str:
+    """Hash everything that determines a document's stored embedding and data."""
+    payload = json.dumps(
+        [embedding_model, doc.page_content, doc.metadata],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """Document hashes and run progress for one collection."""
+
+    def __init__(self, path: Path | str) -> None:
+        """Open (creating if needed) the manifest database at `path`."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, "
+                "hash TEXT NOT NULL, run_id INTEGER NOT NULL, "
+                "kind TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(documents)")
+            }
+            if "kind" not in columns:
+                # Manifests written before kinds were recorded.
+                self._conn.execute(
+                    "ALTER TABLE documents ADD COLUMN kind TEXT NOT NULL DEFAULT ''"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, "
+                "started_at REAL NOT NULL, finished_at REAL)"
+            )
+
+    def start_run(self) -> tuple[int, bool]:
+        """Return the run to write to and whether it resumes an interrupted one."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NULL "
+                "ORDER BY run_id DESC LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                return row[0], True
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started_at) VALUES (?)", (time.time(),)
+            )
+            return int(cursor.lastrowid or 0), False
+
+    def changed(
+        self, ids: Sequence[str], hashes: Sequence[str], run_id: int
+    ) -> list[int]:
+        """Return the positions of documents whose hash differs from the manifest.
+
+        Unchanged documents are marked as seen by `run_id`.
+        """
+        with self._lock, self._conn:
+            stored: dict[str, str] = {}
+            for start in range(0, len(ids), 500):
+                batch = list(ids[start : start + 500])
+                stored.update(
+                    self._conn.execute(
+                        "SELECT id, hash FROM documents WHERE id IN "
+                        f"({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                )
+            unchanged = [
+                (run_id, doc_id)
+                for doc_id, digest in zip(ids, hashes)
+                if stored.get(doc_id) == digest
+            ]
+            self._conn.executemany(
+                "UPDATE documents SET run_id = ? WHERE id = ?", unchanged
+            )
+        return [
+            i
+            for i, (doc_id, digest) in enumerate(zip(ids, hashes))
+            if stored.get(doc_id) != digest
+        ]
+
+    def record(
+        self,
+        ids: Sequence[str],
+        hashes: Sequence[str],
+        kinds: Sequence[str],
+        run_id: int,
+    ) -> None:
+        """Record documents of the given `kinds` written to the collection by `run_id`."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO documents (id, hash, run_id, kind) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET hash = excluded.hash, "
+                "run_id = excluded.run_id, kind = excluded.kind",
+                [
+                    (doc_id, digest, run_id, kind)
+                    for doc_id, digest, kind in zip(ids, hashes, kinds)
+                ],
+            )
+
+    def stale(self, run_id: int, kinds: Sequence[str]) -> list[str]:
+        """Return the ids of documents of `kinds` not seen by `run_id`.
+
+        Documents recorded before kinds were tracked have the kind "".
+        """
+        if not kinds:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM documents WHERE run_id != ? AND kind IN "
+                f"({','.join('?' * len(kinds))})",
+                (run_id, *kinds),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, ids: Sequence[str]) -> None:
+        """Remove documents from the manifest."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids]
+            )
+
+    def finish_run(self, run_id: int) -> None:
+        """Mark `run_id` as complete."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                (time.time(), run_id),
+            )
+
+    def count(self) -> int:
+        """Return the number of documents in the manifest."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def clear(self) -> None:
+        """Forget every document and run, e.g. when the collection is reset."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM runs")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
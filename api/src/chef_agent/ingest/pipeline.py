@@ -0,0 +1,319 @@
+"""Build the recipe and question-answer collection from the raw datasets.
+
+Recipes are streamed from parquet one chunk at a time. Each chunk is
+transformed, embedded and written before the next one is read, with the write
+of one chunk overlapping the embedding of the next, so memory use is bounded
+by the chunk size rather than the size of the dataset.
+
+Runs are incremental by default: a `Manifest` of content hashes next to the
+persist directory limits embedding to new and changed documents and lets an
+interrupted run be resumed. Documents that are no longer produced are removed,
+but only for the kinds of document a run covered in full: recipes when the
+whole recipes file was read (no `limit` cutting it short), question-answer
+pairs when a QA file was given.
+Finally, the adjacency index used for graph traversal, the lexical (BM25)
+index used for hybrid retrieval and the ingredient coverage index are rebuilt
+from the collection.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Iterator
+
+import pandas as pd
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_graph_retriever.transformers import ShreddingTransformer
+
+from chef_agent.adjacency import adjacency_path_for, build_adjacency_index
+from chef_agent.coverage import build_coverage_index, coverage_path_for
+from chef_agent.embeddings import load_embeddings
+from chef_agent.ingest.embedding import BatchEmbedder
+from chef_agent.ingest.manifest import Manifest, content_hash, manifest_path_for
+from chef_agent.ingest.store import ChromaWriter
+from chef_agent.ingest.transforms import (
+    QA_TYPE,
+    RECIPE_TYPE,
+    batched,
+    load_keywords,
+    load_qa,
+    prepare_recipes,
+    qa_documents,
+    recipe_documents,
+)
+from chef_agent.lexical import build_lexical_index, lexical_path_for
+from chef_agent.retrieval import COLLECTION_NAME, EMBEDDING_MODEL, PERSIST_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+RECIPE_COLUMNS = ("Unnamed: 0", "i64", "title", "ingredients", "directions", "NER")
+
+LEGACY_KIND = ""
+"""Manifest kind of documents recorded before kinds were tracked."""
+
+
+@dataclass
+class IngestSettings:
+    """Inputs, outputs and limits of an ingestion run."""
+
+    recipes_path: str
+    qa_path: str | None = None
+    keywords_path: str | None = None
+    persist_directory: str = PERSIST_DIRECTORY
+    collection_name: str = COLLECTION_NAME
+    embedding_model: str = EMBEDDING_MODEL
+    limit: int | None = 250_000
+    chunk_size: int = 5_000
+    embed_batch_size: int = 256
+    max_concurrency: int = 4
+    reset: bool = False
+    incremental: bool = True
+    manifest_path: str | None = None
+    adjacency_index: bool = True
+    lexical_index: bool = True
+    coverage_index: bool = True
+
+
+@dataclass
+class IngestStats:
+    """Counters reported at the end of an ingestion run."""
+
+    recipes: int = 0
+    qa: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    written: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    resumed: bool = False
+    embedding_requests: int = 0
+    rate_limited: int = 0
+    elapsed: float = 0.0
+
+
+def covers_all_recipes(path: str, limit: int | None = None) -> bool:
+    """Return whether reading the first `limit` rows reads the whole recipes file."""
+    return limit is None or limit >= pq.ParquetFile(path).metadata.num_rows
+
+
+def read_recipe_chunks(
+    path: str, chunk_size: int, limit: int | None = None
+) -> Iterator[pd.DataFrame]:
+    """Stream the first `limit` rows of the recipes parquet in chunks."""
+    parquet = pq.ParquetFile(path)
+    columns = [c for c in RECIPE_COLUMNS if c in parquet.schema_arrow.names]
+    remaining = limit
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=columns):
+        frame = batch.to_pandas()
+        if remaining is not None:
+            frame = frame.head(remaining)
+            remaining -= len(frame)
+        yield frame
+        if remaining is not None and remaining <= 0:
+            return
+
+
+class _Indexer:
+    """Shred, embed and write batches of documents, one write in flight.
+
+    With a manifest, documents whose content hash is unchanged are skipped and
+    hashes are recorded once their documents have been written.
+    """
+
+    def __init__(
+        self,
+        embedder: BatchEmbedder,
+        writer: ChromaWriter,
+        embedding_model: str,
+        manifest: Manifest | None = None,
+        run_id: int = 0,
+    ) -> None:
+        self.embedder = embedder
+        self.writer = writer
+        self.embedding_model = embedding_model
+        self.manifest = manifest
+        self.run_id = run_id
+        self.shredder = ShreddingTransformer()
+        self.written = 0
+        self.unchanged = 0
+        self._pending: asyncio.Task[None] | None = None
+
+    async def add(self, documents: list[Document]) -> None:
+        hashes = [content_hash(doc, self.embedding_model) for doc in documents]
+        if self.manifest is not None:
+            changed = await asyncio.to_thread(
+                self.manifest.changed,
+                [doc.id or "" for doc in documents],
+                hashes,
+                self.run_id,
+            )
+            self.unchanged += len(documents) - len(changed)
+            documents = [documents[i] for i in changed]
+            hashes = [hashes[i] for i in changed]
+            if not documents:
+                return
+        shredded = list(self.shredder.transform_documents(documents))
+        vectors = await self.embedder.aembed([doc.page_content for doc in shredded])
+        await self.flush()
+        self._pending = asyncio.create_task(
+            asyncio.to_thread(self._write, shredded, vectors, hashes)
+        )
+
+    def _write(
+        self, documents: list[Document], vectors: list[list[float]], hashes: list[str]
+    ) -> None:
+        self.writer.upsert(documents, vectors)
+        if self.manifest is not None:
+            self.manifest.record(
+                [doc.id or "" for doc in documents],
+                hashes,
+                [doc.metadata.get("type", LEGACY_KIND) for doc in documents],
+                self.run_id,
+            )
+        self.written += len(documents)
+
+    async def flush(self) -> None:
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+
+async def aingest(
+    settings: IngestSettings,
+    *,
+    embeddings: Embeddings | None = None,
+    writer: ChromaWriter | None = None,
+) -> IngestStats:
+    """Build (or update) the collection described by `settings`.
+
+    Documents are upserted by id, so re-running over the same data replaces
+    documents instead of duplicating them. Incremental runs only embed
+    documents that changed since the last run and delete the documents it no
+    longer produces, for the kinds of document the run covered in full; an
+    interrupted incremental run is resumed by running it again.
+    """
+    if embeddings is None:
+        embeddings = load_embeddings(settings.embedding_model)
+    if writer is None:
+        writer = ChromaWriter(
+            settings.persist_directory, settings.collection_name, reset=settings.reset
+        )
+    embedder = BatchEmbedder(
+        embeddings,
+        batch_size=settings.embed_batch_size,
+        max_concurrency=settings.max_concurrency,
+    )
+    stats = IngestStats()
+    manifest = None
+    run_id = 0
+    if settings.incremental:
+        manifest = Manifest(
+            settings.manifest_path
+            or manifest_path_for(settings.persist_directory, settings.collection_name)
+        )
+        # A reset (or externally deleted) collection invalidates every hash.
+        if settings.reset or (manifest.count() and not writer.count()):
+            manifest.clear()
+        run_id, stats.resumed = manifest.start_run()
+        if stats.resumed:
+            logger.info("Resuming interrupted run %d", run_id)
+    # Marked before anything is written, so an interrupted run also leaves
+    # the indexes built by earlier runs stale.
+    writer.mark_run(uuid.uuid4().hex)
+    indexer = _Indexer(embedder, writer, settings.embedding_model, manifest, run_id)
+    start = time.perf_counter()
+    try:
+        keywords = (
+            load_keywords(settings.keywords_path) if settings.keywords_path else None
+        )
+        qa = load_qa(settings.qa_path) if settings.qa_path else None
+        # Only the recipes that QA pairs refer to are kept in memory for linking.
+        qa_titles = set(qa["title"]) if qa is not None else set()
+        recipes_by_title: dict[str, tuple[str, str]] = {}
+        seen_titles: set[str] = set()
+
+        for chunk in read_recipe_chunks(
+            settings.recipes_path, settings.chunk_size, settings.limit
+        ):
+            recipes = prepare_recipes(chunk, seen_titles, keywords)
+            stats.chunks += 1
+            stats.skipped += len(chunk) - len(recipes)
+            if qa_titles:
+                matched = recipes[recipes["title"].isin(qa_titles)]
+                recipes_by_title.update(
+                    zip(matched["title"], zip(matched["source_id"], matched["md"]))
+                )
+            documents = recipe_documents(recipes)
+            if documents:
+                await indexer.add(documents)
+            stats.recipes += len(documents)
+            logger.info("Indexed %d recipes (chunk %d)", stats.recipes, stats.chunks)
+
+        if qa is not None:
+            for documents in batched(
+                qa_documents(qa, recipes_by_title), settings.chunk_size
+            ):
+                await indexer.add(documents)
+                stats.qa += len(documents)
+            logger.info("Indexed %d question-answer pairs", stats.qa)
+
+        await indexer.flush()
+        if manifest is not None:
+            covered = []
+            if covers_all_recipes(settings.recipes_path, settings.limit):
+                covered.append(RECIPE_TYPE)
+            if qa is not None:
+                covered.append(QA_TYPE)
+            if len(covered) == 2:
+                covered.append(LEGACY_KIND)
+            stale = manifest.stale(run_id, covered)
+            writer.delete(stale)
+            manifest.forget(stale)
+            manifest.finish_run(run_id)
+            stats.deleted = len(stale)
+        # Marked again once every write is done: caches filled while the run
+        # was writing are stale, and the indexes record the final mark.
+        writer.mark_run(uuid.uuid4().hex)
+        if settings.adjacency_index:
+            indexed = await asyncio.to_thread(
+                build_adjacency_index,
+                writer.collection,
+                adjacency_path_for(
+                    settings.persist_directory, settings.collection_name
+                ),
+            )
+            logger.info("Built adjacency index over %d documents", indexed)
+        if settings.lexical_index:
+            indexed = await asyncio.to_thread(
+                build_lexical_index,
+                writer.collection,
+                lexical_path_for(settings.persist_directory, settings.collection_name),
+            )
+            logger.info("Built lexical index over %d recipes", indexed)
+        if settings.coverage_index:
+            indexed = await asyncio.to_thread(
+                build_coverage_index,
+                writer.collection,
+                coverage_path_for(settings.persist_directory, settings.collection_name),
+            )
+            logger.info("Built ingredient coverage index over %d recipes", indexed)
+        stats.written = indexer.written
+        stats.unchanged = indexer.unchanged
+        stats.embedding_requests = embedder.requests
+        stats.rate_limited = embedder.rate_limited
+        stats.elapsed = time.perf_counter() - start
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return stats
+
+
+def ingest(settings: IngestSettings, **kwargs: object) -> IngestStats:
+    """Run `aingest` to completion."""
+    return asyncio.run(aingest(settings, **kwargs))  # type: ignore[arg-type]
@@ -0,0 +1,98 @@
+"""Bulk writes to the persisted Chroma collection."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import chromadb
+from langchain_core.documents import Document
+
+from chef_agent.collection import INGEST_RUN_KEY
+
+
+class ChromaWriter:
+    """Upsert pre-embedded documents into a persisted Chroma collection.
+
+    Writes go straight to the Chroma collection in batches of the client's
+    maximum size, so embedding and writing can be scheduled independently.
+    The collection is the one `chef_agent.retrieval` opens through
+    `langchain_chroma`.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        collection_name: str,
+        *,
+        reset: bool = False,
+        batch_size: int | None = None,
+    ) -> None:
+        """Open `collection_name` in `persist_directory`, emptying it if `reset`.
+
+        `batch_size` defaults to the client's maximum batch size.
+        """
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        if reset:
+            try:
+                self.client.delete_collection(collection_name)
+            except Exception:  # The collection does not exist yet.
+                pass
+        self.collection = self.client.get_or_create_collection(collection_name)
+        self.batch_size = batch_size or self.client.get_max_batch_size()
+        self._dimension: int | None = None
+
+    def dimension(self) -> int | None:
+        """Return the dimension of the stored embeddings, or None if the collection is empty."""
+        if self._dimension is None:
+            stored = self.collection.peek(1)["embeddings"]
+            if stored is not None and len(stored):
+                self._dimension = len(stored[0])
+        return self._dimension
+
+    def _check_dimension(self, dimension: int) -> None:
+        expected = self.dimension()
+        if expected is not None and expected != dimension:
+            raise ValueError(
+                f"Collection {self.collection.name} stores {expected}-dimensional embeddings, "
+                f"but the embedding model returns {dimension} dimensions. Ingest into another "
+                "collection or reset this one."
+            )
+        self._dimension = dimension
+
+    def upsert(
+        self, documents: Sequence[Document], embeddings: Sequence[Sequence[float]]
+    ) -> None:
+        """Insert or replace `documents` with their precomputed `embeddings`.
+
+        Raises:
+            ValueError: If the embeddings do not have the dimension of the
+                embeddings already in the collection.
+        """
+        if len(embeddings):
+            self._check_dimension(len(embeddings[0]))
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start : start + self.batch_size]
+            self.collection.upsert(
+                ids=[doc.id or "" for doc in batch],
+                documents=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata or None for doc in batch],  # type: ignore[misc]
+                embeddings=list(embeddings[start : start + self.batch_size]),  # type: ignore[arg-type]
+            )
+
+    def mark_run(self, run: str) -> None:
+        """Record in the collection metadata that ingest run `run` writes to it.
+
+        Indexes built from the collection record the run they were built
+        after, which tells the retriever whether they are stale.
+        """
+        metadata = {**(self.collection.metadata or {}), INGEST_RUN_KEY: run}
+        self.collection.modify(metadata=metadata)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete documents by id."""
+        for start in range(0, len(ids), self.batch_size):
+            self.collection.delete(ids=list(ids[start : start + self.batch_size]))
+
+    def count(self) -> int:
+        """Return the number of documents in the collection."""
+        return self.collection.count()
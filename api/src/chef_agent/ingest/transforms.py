@@ -0,0 +1,226 @@
+"""Column-wise transforms from the raw datasets to indexable documents.
+
+Every transform works on a whole chunk of rows at once with pandas string
+operations; the only per-row Python work left is building the `Document`
+objects themselves.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Iterable, Iterator, Mapping
+
+import pandas as pd
+from langchain_core.documents import Document
+
+_NON_ALPHA = r"[^a-zA-Z]"
+
+RECIPE_TYPE = "recipe"
+QA_TYPE = "question-answer"
+
+
+def parse_json_lists(values: pd.Series) -> list[list[str]]:
+    """Parse a column of JSON-encoded lists.
+
+    The whole column is decoded with a single `json.loads` call; rows are only
+    parsed one by one if that fails, in which case malformed rows become empty
+    lists.
+    """
+    texts = values.fillna("[]").astype(str).tolist()
+    try:
+        parsed = json.loads("[" + ",".join(texts) + "]")
+        if len(parsed) == len(texts):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    rows = []
+    for text in texts:
+        try:
+            rows.append(json.loads(text))
+        except json.JSONDecodeError:
+            rows.append([])
+    return rows
+
+
+def make_source_ids(row_ids: pd.Series, titles: pd.Series) -> pd.Series:
+    """Build recipe ids from the row number and the letters of the title."""
+    slug = titles.str.replace(_NON_ALPHA, "", regex=True).str.lower()
+    return row_ids.astype(str) + "_" + slug
+
+
+def normalize_ner(names: pd.Series) -> pd.Series:
+    """Normalize raw NER ingredient names and drop the ones too short to be useful."""
+    names = names.str.strip()
+    names = names[(names.str.len() > 2) & (names != "A.")]
+    return names.str.capitalize()
+
+
+def clean_keyword_names(names: pd.Series) -> pd.Series:
+    """Strip quotes and leading punctuation from normalized ingredient names."""
+    return (
+        names.str.replace(r"^'s", "", regex=True)
+        .str.replace('"', "", regex=False)
+        .str.lstrip("()+/:,.")
+        .str.strip()
+        .str.capitalize()
+    )
+
+
+def clean_keywords(ner: pd.Series) -> pd.Series:
+    """Normalize each recipe's NER ingredient names into keywords.
+
+    Applies the same cleanup as the indexing notebook without merging similar
+    names; see `chef_agent.ingest.keywords` for that.
+    """
+    names = clean_keyword_names(normalize_ner(ner.explode().dropna().astype(str)))
+    names = names[names != ""]
+    deduped = names.reset_index().drop_duplicates().set_index("index").iloc[:, 0]
+    grouped = deduped.groupby(level=0).agg(list)
+    return grouped.reindex(ner.index).apply(lambda v: v if isinstance(v, list) else [])
+
+
+def format_recipes(
+    ingredients: pd.Series, directions: pd.Series, titles: pd.Series
+) -> pd.Series:
+    """Render recipes as the markdown the agent receives as context."""
+    return (
+        "# "
+        + titles
+        + "\n\n## Ingredients\n- "
+        + ingredients.str.join("\n- ")
+        + "\n\n## Directions\n- "
+        + directions.str.join("\n- ")
+        + "\n"
+    )
+
+
+def dedupe_titles(chunk: pd.DataFrame, seen_titles: set[str]) -> pd.DataFrame:
+    """Drop untitled rows and titles already seen; `seen_titles` is updated in place."""
+    chunk = chunk.rename(columns={"Unnamed: 0": "i64", "NER": "ner"})
+    chunk = chunk[chunk["title"].notna()]
+    chunk = chunk[~chunk["title"].isin(seen_titles)]
+    chunk = chunk.drop_duplicates(subset="title")
+    seen_titles.update(chunk["title"])
+    return chunk
+
+
+def recipe_ner(chunk: pd.DataFrame, seen_titles: set[str]) -> pd.DataFrame:
+    """Return the `source_id` and parsed `ner` list of each new recipe in a chunk."""
+    chunk = dedupe_titles(chunk, seen_titles)
+    return pd.DataFrame(
+        {
+            "source_id": make_source_ids(chunk["i64"], chunk["title"]),
+            "ner": parse_json_lists(chunk["ner"]),
+        },
+        index=chunk.index,
+    )
+
+
+def prepare_recipes(
+    chunk: pd.DataFrame,
+    seen_titles: set[str],
+    keywords: Mapping[str, list[str]] | None = None,
+) -> pd.DataFrame:
+    """Turn a chunk of raw recipe rows into `source_id`, `title`, `md`, `keywords`.
+
+    Rows without a title, or whose title was already seen in this or an earlier
+    chunk, are dropped. `seen_titles` is updated in place.
+    """
+    chunk = dedupe_titles(chunk, seen_titles)
+    if chunk.empty:
+        return pd.DataFrame(columns=["source_id", "title", "md", "keywords"])
+
+    index = chunk.index
+    out = pd.DataFrame(index=index)
+    out["source_id"] = make_source_ids(chunk["i64"], chunk["title"])
+    out["title"] = chunk["title"]
+    out["md"] = format_recipes(
+        pd.Series(parse_json_lists(chunk["ingredients"]), index=index),
+        pd.Series(parse_json_lists(chunk["directions"]), index=index),
+        chunk["title"],
+    )
+    if keywords is not None:
+        out["keywords"] = [keywords.get(sid, []) for sid in out["source_id"]]
+    else:
+        out["keywords"] = clean_keywords(
+            pd.Series(parse_json_lists(chunk["ner"]), index=index)
+        )
+    return out
+
+
+def recipe_documents(recipes: pd.DataFrame) -> list[Document]:
+    """Build recipe documents from the output of `prepare_recipes`."""
+    return [
+        Document(
+            id=source_id,
+            page_content=md,
+            metadata={
+                "keywords": keywords,
+                "source_id": source_id,
+                "type": RECIPE_TYPE,
+            },
+        )
+        for source_id, md, keywords in zip(
+            recipes["source_id"], recipes["md"], recipes["keywords"]
+        )
+    ]
+
+
+def load_qa(path: str) -> pd.DataFrame:
+    """Load the cooking SQuAD dataset as `qa_id`, `question`, `answer`, `title`."""
+    qa = pd.read_json(path)
+    return pd.DataFrame(
+        {
+            "qa_id": qa["id"].astype(str),
+            "question": qa["question"],
+            "answer": qa["answers"].str.get("text"),
+            "title": qa["context"].str.split("\n", n=1).str[0],
+        }
+    )
+
+
+def qa_documents(
+    qa: pd.DataFrame, recipes_by_title: Mapping[str, tuple[str, str]]
+) -> Iterator[Document]:
+    """Build question-answer documents linked to their recipe by title.
+
+    Args:
+        qa: Output of `load_qa`.
+        recipes_by_title: Maps recipe titles to their `(source_id, md)`.
+    """
+    for qa_id, question, answer, title in zip(
+        qa["qa_id"], qa["question"], qa["answer"], qa["title"]
+    ):
+        source_id, md = recipes_by_title.get(title, (None, ""))
+        metadata = {"type": QA_TYPE}
+        if source_id is not None:
+            metadata["source_id"] = source_id
+        yield Document(
+            id=qa_id,
+            page_content=(
+                f"\n<question>\n{question} \n</question>\n\n"
+                f"<answer>\n{answer} \n</answer>\n\n"
+                f"<context>\n{md}\n</context>\n"
+            ),
+            metadata=metadata,
+        )
+
+
+def load_keywords(path: str) -> dict[str, list[str]]:
+    """Load precomputed keywords from a parquet file of `source_id`, `cleaned_ner`."""
+    frame = pd.read_parquet(path, columns=["source_id", "cleaned_ner"])
+    return {
+        sid: list(names) for sid, names in zip(frame["source_id"], frame["cleaned_ner"])
+    }
+
+
+def batched(items: Iterable[Document], size: int) -> Iterator[list[Document]]:
+    """Yield lists of at most `size` items."""
+    batch: list[Document] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,180 @@
+"""BM25 index over recipe titles, ingredients and keywords.
+
+Dense search is a poor fit for ingredient lists ("what can I make with eggs
+and spinach"): exact ingredient names matter more than overall meaning. The
+lexical index is built at ingestion time from the recipe documents and
+answers such queries locally, without an embedding call. Its results are
+fused with the graph retriever's by reciprocal rank fusion (`rrf_fuse`).
+
+The index is stored like the adjacency index: term postings as CSR arrays
+(`indptr`, document rows and term frequencies) memory-mapped at startup.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Sequence, TypeVar
+
+import numpy as np
+
+from chef_agent.collection import field_values
+
+T = TypeVar("T", bound=Hashable)
+
+_TOKEN = re.compile(r"[a-z]+")
+_STOPWORDS = frozenset(
+    """a an and are as at be but by can for from have i in is it me my of on or
+    some that the this to up what with you your make cook recipe recipes using
+    use""".split()
+)
+_META = "meta.json"
+
+
+def lexical_path_for(persist_directory: str, collection_name: str) -> Path:
+    """Return the default index location for a collection."""
+    directory = Path(persist_directory)
+    return directory.with_name(f"{directory.name}.{collection_name}.bm25")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, drop stop words and strip plural endings."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS or len(token) < 2:
+            continue
+        if token.endswith("ies") and len(token) > 4:
+            token = token[:-3] + "y"
+        elif token.endswith("oes") and len(token) > 4:
+            token = token[:-2]
+        elif token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def recipe_text(content: str, metadata: dict[str, Any]) -> str:
+    """Return the title, ingredients and keywords of a recipe document."""
+    head = content.partition("## Directions")[0]
+    return " ".join([head, *map(str, field_values(metadata, "keywords"))])
+
+
+def build_lexical_index(
+    collection: Any,
+    path: os.PathLike[str] | str,
+    page_size: int = 5_000,
+) -> int:
+    """Build the BM25 index of the recipe documents in a Chroma collection.
+
+    Returns:
+        The number of indexed documents.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    ids: list[str] = []
+    lengths: list[int] = []
+    postings: dict[str, list[tuple[int, int]]] = {}
+    count = collection.count()
+    for offset in range(0, count, page_size):
+        page = collection.get(
+            where={"type": "recipe"},
+            include=["documents", "metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        for doc_id, content, metadata in zip(
+            page["ids"], page["documents"], page["metadatas"]
+        ):
+            terms = Counter(tokenize(recipe_text(content or "", metadata or {})))
+            row = len(ids)
+            ids.append(doc_id)
+            lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((row, tf))
+
+    terms = sorted(postings)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(postings[t]) for t in terms], out=indptr[1:])
+    flat = [p for t in terms for p in postings[t]]
+    np.save(tmp / "indptr.npy", indptr)
+    np.save(tmp / "rows.npy", np.array([r for r, _ in flat], dtype=np.int32))
+    np.save(tmp / "tfs.npy", np.array([tf for _, tf in flat], dtype=np.float32))
+    np.save(tmp / "lengths.npy", np.array(lengths, dtype=np.float32))
+    (tmp / "terms.json").write_text(json.dumps(terms))
+    (tmp / "ids.json").write_text(json.dumps(ids))
+    (tmp / _META).write_text(json.dumps({"count": len(ids)}))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return len(ids)
+
+
+class LexicalIndex:
+    """Read-only, memory-mapped BM25 index."""
+
+    def __init__(
+        self, path: os.PathLike[str] | str, k1: float = 1.2, b: float = 0.75
+    ) -> None:
+        """Memory-map the index at `path`, scoring with BM25 parameters `k1` and `b`."""
+        path = Path(path)
+        self.count: int = json.loads((path / _META).read_text())["count"]
+        self.ids: list[str] = json.loads((path / "ids.json").read_text())
+        self.terms = {
+            term: i
+            for i, term in enumerate(json.loads((path / "terms.json").read_text()))
+        }
+        self.indptr = np.load(path / "indptr.npy", mmap_mode="r")
+        self.rows = np.load(path / "rows.npy", mmap_mode="r")
+        self.tfs = np.load(path / "tfs.npy", mmap_mode="r")
+        lengths = np.load(path / "lengths.npy")
+        average = float(lengths.mean()) if len(lengths) else 1.0
+        # Per-document part of the BM25 denominator, precomputed once.
+        self._length_norm = (k1 * (1 - b + b * lengths / (average or 1.0))).astype(
+            np.float32
+        )
+        self.k1 = k1
+
+    @classmethod
+    def load(cls, path: os.PathLike[str] | str) -> LexicalIndex | None:
+        """Load the index at `path`, or return None if there is none."""
+        if not (Path(path) / _META).exists():
+            return None
+        return cls(path)
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """Return the ids and BM25 scores of the `k` best matching documents."""
+        positions = [self.terms[t] for t in set(tokenize(query)) if t in self.terms]
+        if not positions or k <= 0:
+            return []
+        scores = np.zeros(self.count, dtype=np.float32)
+        for position in positions:
+            start, end = self.indptr[position], self.indptr[position + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end]
+            df = end - start
+            idf = np.log1p((self.count - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[rows])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[row], float(scores[row])) for row in matched]
+
+
+def rrf_fuse(rankings: Iterable[Sequence[T]], k: int = 60) -> list[tuple[T, float]]:
+    """Fuse rankings with reciprocal rank fusion.
+
+    Each item scores `sum(1 / (k + rank))` over the rankings it appears in
+    (ranks start at 1). Ties keep the order in which items were first seen.
+    """
+    scores: dict[T, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,635 @@
+"""In-process metrics for the chef graph, exportable in Prometheus text format.
+
+Metrics are recorded into a process-wide `REGISTRY` without LangSmith:
+
+- `MetricsCallbackHandler` is attached to every LangChain run in the process
+  (through a configure hook, like LangSmith's tracer) and times graph nodes,
+  tools, retrievers and chat model calls, and counts tokens and retrieved
+  documents.
+- Code that does not run as a LangChain run records directly: query
+  embeddings (`chef_agent.embeddings`), source explanations and searches
+  (`chef_agent.tools`) and routing decisions (`chef_agent.router`).
+- Cache hit and miss counters of `chef_agent.cache` are collected on export.
+
+`render_prometheus` returns every metric in the Prometheus text exposition
+format. Set `CHEF_AGENT_METRICS_PORT` to also serve it on `/metrics` from a
+background thread (on 127.0.0.1 unless `CHEF_AGENT_METRICS_HOST` is set), or
+`CHEF_AGENT_METRICS=0` to disable the callback handler.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterable, Iterator, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from langgraph.errors import GraphBubbleUp
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"""Histogram buckets in seconds, from local index lookups to slow model calls."""
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+"""Histogram buckets for document counts."""
+
+STAGE_METADATA_KEY = "chef_stage"
+"""Run metadata key naming the stage of model calls, e.g. "explaination".
+
+Model calls without it are attributed to the graph node they run in.
+"""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {list(self.labelnames)}, got {sorted(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], tuple[str, ...], float]]:
+        """Yield `(sample name, label names, label values, value)` tuples."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Return the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, values, value in self.samples():
+            lines.append(
+                f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        """Create an unregistered counter; use `MetricsRegistry.counter` to register one."""
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Add `amount` to the counter for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Return the current value for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def values(self) -> dict[tuple[str, ...], float]:
+        """Return the current value of every label set."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        """Drop every value."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], tuple[str, ...], float]]:
+        """Yield the value of every label set."""
+        for key, value in sorted(self.values().items()):
+            yield self.name, self.labelnames, key, value
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Set the gauge for `labels` to `value`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Observations per label set, counted into cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        """Create an unregistered histogram with the upper bounds `buckets`."""
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (the last one is +Inf), sum.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one observation for `labels`."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the wall-clock duration of the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        """Return the number of observations for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels: Any) -> float:
+        """Return the sum of the observations for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return entry[1][0] if entry else 0.0
+
+    def reset(self) -> None:
+        """Drop every observation."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], tuple[str, ...], float]]:
+        """Yield the cumulative buckets, sum and count of every label set."""
+        with self._lock:
+            values = {
+                key: (list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            }
+        bucket_labels = (*self.labelnames, "le")
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    bucket_labels,
+                    (*key, _format_value(bound)),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", self.labelnames, key, total
+            yield f"{self.name}_count", self.labelnames, key, cumulative
+
+
+class MetricsRegistry:
+    """A named set of metrics plus collectors evaluated on export."""
+
+    def __init__(self) -> None:
+        """Create an empty registry."""
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[_Metric]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if (
+                    type(existing) is not type(metric)
+                    or existing.labelnames != metric.labelnames
+                ):
+                    raise ValueError(
+                        f"Metric {metric.name} is already registered differently"
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter `name`, registering it on first use."""
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Return the gauge `name`, registering it on first use."""
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram `name`, registering it on first use."""
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        """Register a function returning metrics built from external state on export."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """Drop the values of every registered metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()  # type: ignore[attr-defined]
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+        return "".join(metric.render() + "\n" for metric in metrics)
+
+
+REGISTRY = MetricsRegistry()
+"""The process-wide metrics registry."""
+
+NODE_DURATION = REGISTRY.histogram(
+    "chef_node_duration_seconds", "Duration of graph node runs.", ["node"]
+)
+NODE_ERRORS = REGISTRY.counter(
+    "chef_node_errors_total", "Graph node runs that raised an error.", ["node"]
+)
+TOOL_DURATION = REGISTRY.histogram(
+    "chef_tool_duration_seconds", "Duration of tool calls.", ["tool"]
+)
+TOOL_ERRORS = REGISTRY.counter(
+    "chef_tool_errors_total", "Tool calls that raised an error.", ["tool"]
+)
+LLM_DURATION = REGISTRY.histogram(
+    "chef_llm_duration_seconds", "Duration of chat model calls.", ["stage", "model"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "chef_llm_tokens_total",
+    "Tokens used by chat model calls, by direction (input or output).",
+    ["stage", "model", "direction"],
+)
+RETRIEVAL_DURATION = REGISTRY.histogram(
+    "chef_retrieval_duration_seconds", "Duration of retriever calls.", ["retriever"]
+)
+RETRIEVAL_DOCUMENTS = REGISTRY.histogram(
+    "chef_retrieval_documents",
+    "Documents returned by retriever calls.",
+    ["retriever"],
+    COUNT_BUCKETS,
+)
+EMBEDDING_DURATION = REGISTRY.histogram(
+    "chef_embedding_duration_seconds",
+    "Duration of embedding requests, by operation and query embedding cache result.",
+    ["model", "operation", "cache"],
+)
+EXPLAINATION_DURATION = REGISTRY.histogram(
+    "chef_explaination_duration_seconds",
+    "Duration of explaining the sources of one search.",
+    ["mode"],
+)
+EXPLAINATION_SOURCES = REGISTRY.counter(
+    "chef_explaination_sources_total",
+    "Sources explained, by origin (cache or model).",
+    ["origin"],
+)
+SEARCH_SOURCES = REGISTRY.histogram(
+    "chef_search_sources",
+    "Sources returned by the search tool, by search result cache result.",
+    ["cache"],
+    COUNT_BUCKETS,
+)
+ROUTES = REGISTRY.counter(
+    "chef_router_routes_total", "User turns handled by each router route.", ["route"]
+)
+
+
+def _cache_metrics() -> list[_Metric]:
+    from chef_agent.cache import cache_stats
+
+    lookups = Counter(
+        "chef_cache_lookups_total",
+        "Cache lookups by result (hit, disk_hit or miss).",
+        ["cache", "result"],
+    )
+    evictions = Counter("chef_cache_evictions_total", "Cache evictions.", ["cache"])
+    entries = Gauge(
+        "chef_cache_entries", "Entries in the in-memory cache tier.", ["cache"]
+    )
+    hit_ratio = Gauge(
+        "chef_cache_hit_ratio", "Fraction of lookups served from the cache.", ["cache"]
+    )
+    for cache, stats in cache_stats().items():
+        for field, result in (
+            ("hits", "hit"),
+            ("disk_hits", "disk_hit"),
+            ("misses", "miss"),
+        ):
+            lookups.inc(stats[field], cache=cache, result=result)
+        evictions.inc(stats["evictions"], cache=cache)
+        entries.set(stats["size"], cache=cache)
+        hit_ratio.set(stats["hit_rate"], cache=cache)
+    return [lookups, evictions, entries, hit_ratio]
+
+
+REGISTRY.add_collector(_cache_metrics)
+
+
+def render_prometheus() -> str:
+    """Return the metrics of this process in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+################ LangChain Callbacks ################
+
+
+def _token_usage(response: LLMResult) -> tuple[int, int]:
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            if not isinstance(generation, ChatGeneration):
+                continue
+            usage = getattr(generation.message, "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Record the duration of node, tool, retriever and chat model runs.
+
+    Node runs are recognized by their name matching the `langgraph_node` run
+    metadata. Chat model calls are labeled with `STAGE_METADATA_KEY` when set,
+    else with their node, and with the `ls_model_name` metadata LangChain sets.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        """Create a handler with no runs in flight."""
+        self._runs: dict[UUID, tuple[float, Callable[[float, Any], None]]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, finish: Callable[[float, Any], None]) -> None:
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), finish)
+
+    def _end(self, run_id: UUID, result: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            start, finish = run
+            finish(time.perf_counter() - start, result)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        tags: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start timing the run if it is a graph node run."""
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+
+        def finish(duration: float, result: Any) -> None:
+            NODE_DURATION.observe(duration, node=node)
+            if isinstance(result, BaseException) and not isinstance(
+                result, GraphBubbleUp
+            ):
+                NODE_ERRORS.inc(node=node)
+
+        self._start(run_id, finish)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the duration of a node run."""
+        self._end(run_id, outputs)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """Record the duration of a failed node run and count the error."""
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any] | None,
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        """Start timing a tool call."""
+        tool = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+
+        def finish(duration: float, result: Any) -> None:
+            TOOL_DURATION.observe(duration, tool=tool)
+            if isinstance(result, BaseException) and not isinstance(
+                result, GraphBubbleUp
+            ):
+                TOOL_ERRORS.inc(tool=tool)
+
+        self._start(run_id, finish)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the duration of a tool call."""
+        self._end(run_id, output)
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """Record the duration of a failed tool call and count the error."""
+        self._end(run_id, error)
+
+    def on_retriever_start(
+        self,
+        serialized: dict[str, Any] | None,
+        query: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        """Start timing a retriever call."""
+        retriever = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+
+        def finish(duration: float, result: Any) -> None:
+            RETRIEVAL_DURATION.observe(duration, retriever=retriever)
+            if isinstance(result, list):
+                RETRIEVAL_DOCUMENTS.observe(len(result), retriever=retriever)
+
+        self._start(run_id, finish)
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the duration and document count of a retriever call."""
+        self._end(run_id, documents)
+
+    def on_retriever_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """Record the duration of a failed retriever call."""
+        self._end(run_id, error)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any] | None,
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start timing a chat model call."""
+        metadata = metadata or {}
+        stage = metadata.get(STAGE_METADATA_KEY) or metadata.get(
+            "langgraph_node", "unknown"
+        )
+        model = metadata.get("ls_model_name", "unknown")
+
+        def finish(duration: float, result: Any) -> None:
+            LLM_DURATION.observe(duration, stage=stage, model=model)
+            if isinstance(result, LLMResult):
+                input_tokens, output_tokens = _token_usage(result)
+                LLM_TOKENS.inc(
+                    input_tokens, stage=stage, model=model, direction="input"
+                )
+                LLM_TOKENS.inc(
+                    output_tokens, stage=stage, model=model, direction="output"
+                )
+
+        self._start(run_id, finish)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the duration and token usage of a chat model call."""
+        self._end(run_id, response)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """Record the duration of a failed chat model call."""
+        self._end(run_id, error)
+
+
+METRICS_ENABLED = os.getenv("CHEF_AGENT_METRICS", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+"""Whether LangChain runs are instrumented. Override with `CHEF_AGENT_METRICS`."""
+
+_handler_var: ContextVar[MetricsCallbackHandler | None] = ContextVar(
+    "chef_agent_metrics_handler",
+    default=MetricsCallbackHandler() if METRICS_ENABLED else None,
+)
+register_configure_hook(_handler_var, inheritable=True)
+
+
+################ Export ################
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+_servers: dict[tuple[str, int], ThreadingHTTPServer] = {}
+_servers_lock = threading.Lock()
+
+
+def serve_metrics(port: int, host: str | None = None) -> ThreadingHTTPServer:
+    """Serve `render_prometheus` on `/metrics` from a daemon thread.
+
+    Binds to `host`, else to `CHEF_AGENT_METRICS_HOST`, else to localhost only.
+    Starting it again on the same address (e.g. when the graph module is
+    imported twice) returns the running server. Port 0 always starts a new
+    server on a free port.
+    """
+    host = host or os.getenv("CHEF_AGENT_METRICS_HOST", "127.0.0.1")
+    with _servers_lock:
+        server = _servers.get((host, port))
+        if server is not None:
+            return server
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        if port:
+            _servers[host, port] = server
+    threading.Thread(
+        target=server.serve_forever, name="chef-agent-metrics", daemon=True
+    ).start()
+    return server
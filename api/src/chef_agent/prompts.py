@@ -25,4 +25,24 @@ SOURCE_EXPLAINATION_PROMPT = """You are a helpful assistant that helps to gather
     <question> {question} </question>
     <source> {context} </source>
 </context>
-"""
\ No newline at end of file
+"""
+
+BATCHED_SOURCE_EXPLAINATION_PROMPT = """You are a helpful assistant that helps to gather information about recipes and cooking related topics.
+
+<instructions>
+<instruction> For each provided source, provide an short sentence explaination on why the source is relevent to the question. </instruction>
+<instruction> Return exactly one explaination per source and identify it by the `source_id` attribute of its source tag. </instruction>
+<instruction> Use the provided explaination template to generate the sentences</instruction>
+</instructions>
+
+<explaination_template>
+    Found relevent source [source_id] : [explaination]
+</explaination_template>
+
+<context>
+    <question> {question} </question>
+    <sources>
+{sources}
+    </sources>
+</context>
+"""
@@ -0,0 +1,443 @@
+"""Graph retriever construction and lifecycle.
+
+Opening a persisted Chroma collection (SQLite + HNSW files) creates a new
+embeddings client, so each collection is opened once per process and shared by
+every graph run. `RetrieverSettings` select the collection, embedding model,
+edges and traversal strategy (see the retrieval fields of
+`chef_agent.configuration.Configuration`); one retriever is cached per distinct
+settings, on top of the shared vector store of its collection. Both caches are
+bounded LRUs, and since runs can select another collection, only directories
+under `STORAGE_ROOT` are opened. Call `reload_retriever` after the persisted
+index has been rebuilt so subsequent searches pick up the new collection.
+
+If `chef-ingest` built an adjacency index for the collection, edge expansions
+are answered from it instead of Chroma (set `CHEF_AGENT_ADJACENCY_INDEX=0` to
+disable). If it built a lexical (BM25) index, `ahybrid_retrieve` fuses its
+results with the graph retriever's, and its ingredient coverage index answers
+`check_ingredients` (see `chef_agent.coverage`).
+
+The vector store, graph retriever and embeddings provider packages are only
+imported when the retriever is first built, which keeps them out of the
+import of the graph module and of worker cold starts. Local embedding models
+are loaded and warmed up when their collection is opened, so set
+`CHEF_AGENT_WARM_RETRIEVER=1` to pay for it at server startup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Sequence
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chef_agent.cache import LRUCache
+from chef_agent.collection import ingest_run
+from chef_agent.coverage import CoverageIndex, coverage_path_for
+from chef_agent.embeddings import CachedEmbeddings, load_embeddings
+from chef_agent.lexical import LexicalIndex, lexical_path_for, rrf_fuse
+
+if TYPE_CHECKING:
+    from graph_retriever.strategies import Strategy
+    from langchain_graph_retriever import GraphRetriever
+    from langchain_graph_retriever.adapters.chroma import ChromaAdapter
+
+    from chef_agent.adjacency import IndexedAdapter
+
+logger = logging.getLogger(__name__)
+
+PERSIST_DIRECTORY = os.getenv(
+    "CHEF_AGENT_PERSIST_DIRECTORY",
+    str(Path(__file__).parent / "data" / "recipe_qa_combined_chroma_db"),
+)
+"""Directory of the ingested Chroma collection. Override with `CHEF_AGENT_PERSIST_DIRECTORY`."""
+STORAGE_ROOT = os.getenv("CHEF_AGENT_STORAGE_ROOT", str(Path(PERSIST_DIRECTORY).parent))
+"""Directory holding the collections runs may select. Override with `CHEF_AGENT_STORAGE_ROOT`."""
+MAX_OPEN_STORES = int(os.getenv("CHEF_AGENT_MAX_OPEN_STORES", "4"))
+"""Number of vector stores kept open. Override with `CHEF_AGENT_MAX_OPEN_STORES`."""
+COLLECTION_NAME = os.getenv("CHEF_AGENT_COLLECTION_NAME", "recipe_qa_combined")
+"""Name of the ingested collection. Override with `CHEF_AGENT_COLLECTION_NAME`."""
+EMBEDDING_MODEL = os.getenv("CHEF_AGENT_EMBEDDING_MODEL", "text-embedding-3-large")
+"""Model embedding the collection and queries (see `chef_agent.embeddings.load_embeddings`).
+
+Override with `CHEF_AGENT_EMBEDDING_MODEL`, together with the collection
+ingested with that model.
+"""
+EDGE_FIELDS = ("keywords", "source_id")
+"""Metadata fields linking documents to the documents sharing a value."""
+SHREDDED_FIELDS = frozenset({"keywords"})
+"""List-valued metadata fields, stored shredded into one key per value."""
+
+
+@dataclass(frozen=True)
+class RetrieverSettings:
+    """The collection and traversal strategy of a graph retriever.
+
+    Retrievers are cached per distinct settings. Retrievers over the same
+    collection and embedding model share one vector store.
+    """
+
+    persist_directory: str = PERSIST_DIRECTORY
+    collection_name: str = COLLECTION_NAME
+    embedding_model: str = EMBEDDING_MODEL
+    edges: tuple[str, ...] = EDGE_FIELDS
+    strategy: Literal["eager", "mmr"] = "eager"
+    k: int = 5
+    start_k: int = 5
+    adjacent_k: int = 10
+    max_depth: int | None = 3
+    lambda_mult: float = 0.5
+
+    @property
+    def store_key(self) -> tuple[str, str, str]:
+        """The settings that determine the vector store."""
+        return (self.persist_directory, self.collection_name, self.embedding_model)
+
+    def build_strategy(self) -> Strategy:
+        """Return a new traversal strategy for these settings."""
+        from graph_retriever.strategies import Eager, Mmr
+
+        if self.strategy == "mmr":
+            return Mmr(
+                k=self.k,
+                start_k=self.start_k,
+                adjacent_k=self.adjacent_k,
+                max_depth=self.max_depth,
+                lambda_mult=self.lambda_mult,
+            )
+        return Eager(
+            k=self.k,
+            start_k=self.start_k,
+            adjacent_k=self.adjacent_k,
+            max_depth=self.max_depth,
+        )
+
+
+DEFAULT_SETTINGS = RetrieverSettings()
+
+# Keyed by the repr of the `store_key` and of the settings respectively.
+_stores: LRUCache[ChromaAdapter | IndexedAdapter] = LRUCache(MAX_OPEN_STORES)
+_retrievers: LRUCache[GraphRetriever] = LRUCache(8 * MAX_OPEN_STORES)
+_retriever_lock = threading.Lock()
+# Bumped whenever the store of a `store_key` is opened or dropped.
+_generations: dict[tuple[str, str, str], int] = {}
+_lexical_indexes: dict[tuple[str, str], LexicalIndex | None] = {}
+_coverage_indexes: dict[tuple[str, str], CoverageIndex | None] = {}
+
+
+def load_store(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+    embeddings: Embeddings | None = None,
+) -> ChromaAdapter | IndexedAdapter:
+    """Open the persisted collection of `settings` as a graph retriever adapter.
+
+    Args:
+        settings: The collection and embedding model to open.
+        embeddings: The query embeddings to use instead of loading
+            `settings.embedding_model`, e.g. fake embeddings in benchmarks.
+    """
+    from langchain_chroma.vectorstores import Chroma
+    from langchain_graph_retriever.transformers import ShreddingTransformer
+
+    from chef_agent.adjacency import adjacency_path_for
+    from chef_agent.chroma import CompatChromaAdapter
+
+    logger.info(
+        "Opening collection %s in %s",
+        settings.collection_name,
+        settings.persist_directory,
+    )
+    if embeddings is None:
+        embeddings = load_embeddings(settings.embedding_model)
+    embeddings = CachedEmbeddings(embeddings, model=settings.embedding_model)
+    vector_store = CompatChromaAdapter(
+        Chroma(
+            embedding_function=embeddings,
+            collection_name=settings.collection_name,
+            persist_directory=settings.persist_directory,
+        ),
+        ShreddingTransformer(),
+        set(SHREDDED_FIELDS),
+    )
+    return _with_adjacency_index(
+        vector_store,
+        adjacency_path_for(settings.persist_directory, settings.collection_name),
+    )
+
+
+def build_retriever(
+    store: ChromaAdapter | IndexedAdapter,
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> GraphRetriever:
+    """Return a graph retriever traversing `store` with the strategy of `settings`."""
+    from langchain_graph_retriever import GraphRetriever
+
+    return GraphRetriever(
+        store=store,
+        edges=[(field, field) for field in settings.edges],
+        strategy=settings.build_strategy(),
+    )
+
+
+def load_retriver(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+    embeddings: Embeddings | None = None,
+) -> GraphRetriever:
+    """Build a new graph retriever over a persisted recipe collection.
+
+    Prefer `get_retriever`, which reuses one instance per settings and one
+    vector store per collection.
+    """
+    return build_retriever(load_store(settings, embeddings), settings)
+
+
+def check_storage(settings: RetrieverSettings) -> None:
+    """Raise ValueError unless the collection directory of `settings` may be opened.
+
+    Runs may select another collection, so apart from `PERSIST_DIRECTORY`
+    (created on first use) only existing directories under `STORAGE_ROOT`
+    are opened: opening a missing one would create it.
+    """
+    directory = Path(settings.persist_directory).resolve()
+    if directory == Path(PERSIST_DIRECTORY).resolve():
+        return
+    if Path(STORAGE_ROOT).resolve() not in directory.parents:
+        raise ValueError(
+            f"persist_directory {settings.persist_directory!r} is outside {STORAGE_ROOT}"
+        )
+    if not directory.is_dir():
+        raise ValueError(
+            f"persist_directory {settings.persist_directory!r} does not exist"
+        )
+
+
+def _with_adjacency_index(
+    adapter: ChromaAdapter, directory: Path | str
+) -> ChromaAdapter | IndexedAdapter:
+    """Wrap `adapter` with the collection's adjacency index if it is usable.
+
+    The index is stale when an ingest run wrote to the collection after it was
+    built, or when the document count changed (e.g. writes outside ingestion).
+    """
+    from chef_agent.adjacency import AdjacencyIndex, IndexedAdapter
+
+    if os.getenv("CHEF_AGENT_ADJACENCY_INDEX", "1").lower() in ("0", "false", "no"):
+        return adapter
+    index = AdjacencyIndex.load(directory)
+    if index is None:
+        return adapter
+    collection = adapter.vector_store._collection
+    run = ingest_run(collection)
+    if index.ingest_run != run:
+        logger.warning(
+            "Ignoring stale adjacency index (built after ingest run %s, "
+            "collection last written by %s)",
+            index.ingest_run,
+            run,
+        )
+        return adapter
+    count = collection.count()
+    if index.count != count:
+        logger.warning(
+            "Ignoring stale adjacency index (%d documents, collection has %d)",
+            index.count,
+            count,
+        )
+        return adapter
+    return IndexedAdapter(adapter, index)
+
+
+def _bump_generation(key: tuple[str, str, str]) -> None:
+    _generations[key] = _generations.get(key, 0) + 1
+
+
+def get_retriever(settings: RetrieverSettings = DEFAULT_SETTINGS) -> GraphRetriever:
+    """Return the process-wide graph retriever for `settings`, building it on first use.
+
+    Raises:
+        ValueError: If the collection directory may not be opened, see
+            `check_storage`.
+    """
+    retriever = _retrievers.get(repr(settings))
+    if retriever is not None:
+        return retriever
+    with _retriever_lock:
+        retriever = _retrievers.get(repr(settings))
+        if retriever is None:
+            store = _stores.get(repr(settings.store_key))
+            if store is None:
+                check_storage(settings)
+                store = load_store(settings)
+                _stores.set(repr(settings.store_key), store)
+                _bump_generation(settings.store_key)
+            retriever = build_retriever(store, settings)
+            _retrievers.set(repr(settings), retriever)
+        return retriever
+
+
+async def aget_retriever(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> GraphRetriever:
+    """Return the process-wide graph retriever without blocking the event loop.
+
+    The first call for a collection opens it in a worker thread since opening
+    the persisted collection is blocking I/O.
+    """
+    retriever = _retrievers.get(repr(settings))
+    if retriever is not None:
+        return retriever
+    return await asyncio.to_thread(get_retriever, settings)
+
+
+def warm_retriever(settings: RetrieverSettings = DEFAULT_SETTINGS) -> threading.Thread:
+    """Build the process-wide retriever for `settings` in a background thread.
+
+    Intended to be called at server startup so the first search does not pay the
+    cost of opening the collection.
+    """
+    thread = threading.Thread(
+        target=get_retriever,
+        args=(settings,),
+        name="chef-retriever-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def invalidate_retriever() -> None:
+    """Drop every process-wide retriever and index so the next search rebuilds them.
+
+    Runs that already hold a reference keep using the previous instance until
+    they finish.
+    """
+    with _retriever_lock:
+        _stores.clear()
+        _retrievers.clear()
+        _lexical_indexes.clear()
+        _coverage_indexes.clear()
+        for key in list(_generations):
+            _bump_generation(key)
+
+
+def reload_retriever(settings: RetrieverSettings = DEFAULT_SETTINGS) -> GraphRetriever:
+    """Rebuild the process-wide retrievers, e.g. after the persisted index changes.
+
+    The collection of `settings` is reopened right away; other collections are
+    reopened on their next use.
+    """
+    store = load_store(settings)
+    with _retriever_lock:
+        _stores.clear()
+        _retrievers.clear()
+        _lexical_indexes.clear()
+        _coverage_indexes.clear()
+        _stores.set(repr(settings.store_key), store)
+        retriever = build_retriever(store, settings)
+        _retrievers.set(repr(settings), retriever)
+        for key in {*_generations, settings.store_key}:
+            _bump_generation(key)
+    return retriever
+
+
+def get_lexical_index(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> LexicalIndex | None:
+    """Return the process-wide lexical index of a collection, or None if none was built."""
+    key = (settings.persist_directory, settings.collection_name)
+    if key in _lexical_indexes:
+        return _lexical_indexes[key]
+    check_storage(settings)
+    with _retriever_lock:
+        if key not in _lexical_indexes:
+            _lexical_indexes[key] = LexicalIndex.load(lexical_path_for(*key))
+        return _lexical_indexes[key]
+
+
+def get_coverage_index(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> CoverageIndex | None:
+    """Return the process-wide ingredient coverage index of a collection, or None if none was built."""
+    key = (settings.persist_directory, settings.collection_name)
+    if key in _coverage_indexes:
+        return _coverage_indexes[key]
+    check_storage(settings)
+    with _retriever_lock:
+        if key not in _coverage_indexes:
+            _coverage_indexes[key] = CoverageIndex.load(coverage_path_for(*key))
+        return _coverage_indexes[key]
+
+
+async def ahybrid_retrieve(
+    query: str,
+    ingredients: Sequence[str] = (),
+    *,
+    k: int = 10,
+    rrf_k: int = 60,
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> list[Document]:
+    """Retrieve with the graph retriever and the lexical index, fused by rank.
+
+    The lexical query is the query plus the user's selected ingredients and
+    runs locally. Documents found only by the lexical index are fetched from
+    the vector store in one batch. Falls back to the graph retriever alone if
+    there is no lexical index.
+    """
+    retriever = await aget_retriever(settings)
+    lexical = await asyncio.to_thread(get_lexical_index, settings)
+    if lexical is None:
+        return await retriever.ainvoke(query)
+
+    lexical_query = " ".join([query, *ingredients])
+    graph_docs, lexical_hits = await asyncio.gather(
+        retriever.ainvoke(query), asyncio.to_thread(lexical.search, lexical_query, k)
+    )
+    graph_ids = [doc.id for doc in graph_docs if doc.id]
+    docs = {doc.id: doc for doc in graph_docs if doc.id}
+    lexical_ids = [doc_id for doc_id, _ in lexical_hits]
+    missing = [doc_id for doc_id in lexical_ids if doc_id not in docs]
+    if missing:
+        from langchain_graph_retriever.transformers import ShreddingTransformer
+
+        store = retriever.adapter.vector_store
+        fetched = await store.aget_by_ids(missing)
+        for doc in ShreddingTransformer().restore_documents(fetched):
+            docs[doc.id or ""] = doc
+    lexical_scores = dict(lexical_hits)
+
+    fused = []
+    for doc_id, score in rrf_fuse([graph_ids, lexical_ids], rrf_k)[:k]:
+        doc = docs.get(doc_id)
+        if doc is None:
+            continue
+        doc.metadata["_rrf_score"] = score
+        if doc_id in lexical_scores:
+            doc.metadata["_lexical_score"] = lexical_scores[doc_id]
+        fused.append(doc)
+    return fused
+
+
+def collection_version(
+    settings: RetrieverSettings = DEFAULT_SETTINGS,
+) -> tuple[int, str | None, int]:
+    """Return a token that changes whenever the persisted collection may have changed.
+
+    Combines the generation of the collection's store, bumped whenever it is
+    (re)opened or dropped, with the ingest run and document count read from
+    the collection itself, so that caches derived from search results detect
+    a re-ingest by another process. Reads the collection: call it off the
+    event loop.
+    """
+    generation = _generations.get(settings.store_key, 0)
+    store = _stores.get(repr(settings.store_key))
+    if store is None:
+        return generation, None, 0
+    vector_store = store.vector_store
+    # A fresh handle: the opened one keeps the metadata it was opened with.
+    collection = vector_store._client.get_collection(vector_store._collection.name)
+    return generation, ingest_run(collection), collection.count()
@@ -0,0 +1,212 @@
+"""Rule-based fast path for user turns that do not need the model.
+
+Every turn used to go through a full `call_model` round trip with tool
+binding, even "thanks" or "2". `classify` recognizes a few unambiguous kinds
+of turns with keyword and pattern rules (not a learned classifier) and
+returns a `Decision`; the `route_turn` node in
+`chef_agent.graph` then answers small talk and recipe choices directly and
+dispatches obvious recipe searches and ingredient checks straight to their
+tools. Anything the rules are not sure about goes to the model.
+
+Short replies depend on what the assistant said last: "2" only picks a recipe
+after a numbered list of recipes, namely the recipe in state whose title the
+second item names, and "ok" or "thanks" only gets a canned reply when the
+assistant did not ask anything ("ok" may answer a question).
+
+Route decisions are counted in the `chef_router_routes_total` metric, see
+`route_hits()`.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Literal, Sequence
+
+from langchain_core.documents import Document
+
+from chef_agent.metrics import ROUTES
+
+Route = Literal["smalltalk", "recipe_choice", "search", "ingredient_check", "llm"]
+
+SMALLTALK_REPLIES = {
+    "greeting": "Hi! What would you like to cook today?",
+    "thanks": "You're welcome! Let me know if you need anything else.",
+    "ack": "Great! Let me know if you need anything else.",
+    "bye": "Goodbye, and happy cooking!",
+}
+"""Canned replies for small talk, by kind."""
+
+_SMALLTALK = {
+    **dict.fromkeys(
+        [
+            "hi",
+            "hello",
+            "hey",
+            "hi there",
+            "hello there",
+            "good morning",
+            "good evening",
+        ],
+        "greeting",
+    ),
+    **dict.fromkeys(
+        [
+            "thanks",
+            "thank you",
+            "thx",
+            "ty",
+            "thanks a lot",
+            "thank you so much",
+            "cheers",
+        ],
+        "thanks",
+    ),
+    **dict.fromkeys(
+        ["ok", "okay", "cool", "great", "nice", "got it", "perfect", "awesome"], "ack"
+    ),
+    **dict.fromkeys(["bye", "goodbye", "see you", "see ya"], "bye"),
+}
+
+_INGREDIENT_CHECK = re.compile(
+    r"^(?:what|which)(?: recipes?| dishes?| meals?)? (?:can|could|should) i "
+    r"(?:make|cook|bake|prepare) (?:with|using|from) (?P<items>.+)$"
+)
+_SEARCH = [
+    re.compile(
+        r"^(?:find|show|give|get|search(?: for)?|suggest)(?: me)?(?: an?| some)? "
+        r"(?P<query>.+?) recipes?$"
+    ),
+    re.compile(r"^how (?:do|can|should) i (?:make|cook|bake|prepare) (?P<query>.+)$"),
+    re.compile(r"^how to (?:make|cook|bake|prepare) (?P<query>.+)$"),
+    re.compile(r"^(?:recipes?|ideas?) (?:for|with) (?P<query>.+)$"),
+    re.compile(r"^(?P<query>[a-z' -]+?) recipes?$"),
+]
+_NUMBERED_ITEM = re.compile(
+    r"^\s*(?:\*\*)?(?P<number>\d+)[.)]\s+(?P<item>.+)$", re.MULTILINE
+)
+_ITEM_SPLIT = re.compile(r"\s*(?:,|\band\b|&|\bplus\b)\s*")
+# Words that refer back to the conversation: the model has to resolve them.
+_REFERENCES = frozenset(
+    "it this that them these those one ones same another other again more".split()
+)
+
+
+@dataclass(frozen=True)
+class Decision:
+    """How a user turn is handled."""
+
+    route: Route
+    reply: str = ""
+    query: str = ""
+    ingredients: list[str] = field(default_factory=list)
+    recipe: Document | None = None
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s,'&-]", " ", text.lower())
+    return " ".join(text.split()).strip(" ,")
+
+
+def _refers_back(text: str) -> bool:
+    return any(word in _REFERENCES for word in re.findall(r"[a-z]+", text))
+
+
+def _words(text: str) -> list[str]:
+    return _normalize(text).replace(",", " ").split()
+
+
+def _listed_item(previous: str, number: int) -> list[str]:
+    for match in _NUMBERED_ITEM.finditer(previous):
+        if int(match["number"]) == number:
+            return _words(match["item"])
+    return []
+
+
+def _title(doc: Document) -> list[str]:
+    title = doc.metadata.get("title")
+    if not title and doc.page_content.startswith("# "):
+        title = doc.page_content[2:].split("\n", 1)[0]
+    return _words(str(title or ""))
+
+
+def _listed_recipe(
+    previous: str, number: int, documents: Sequence[Document]
+) -> Document | None:
+    """Return the recipe whose title the `number`-th listed item starts with.
+
+    The list is the model's free text, so its order says nothing about the
+    order of `documents`. The longest matching title wins; None if no title
+    or several recipes with it match.
+    """
+    item = _listed_item(previous, number)
+    if not item:
+        return None
+    matches: dict[tuple[str, ...], list[Document]] = {}
+    for doc in documents:
+        title = _title(doc)
+        if doc.metadata.get("type") != "recipe" or not title:
+            continue
+        if title == item[: len(title)]:
+            matches.setdefault(tuple(title), []).append(doc)
+    if not matches:
+        return None
+    best = matches[max(matches, key=len)]
+    return best[0] if len(best) == 1 else None
+
+
+def classify(
+    text: str, documents: Sequence[Document] = (), previous: str = ""
+) -> Decision:
+    """Classify a user message, falling back to the "llm" route when unsure.
+
+    Args:
+        text: The user's message.
+        documents: The documents in state, used to resolve recipe choices
+            such as "2" by the title listed at that number in `previous`.
+        previous: The text of the assistant's previous message, if any.
+    """
+    normalized = _normalize(text)
+    if not normalized:
+        return Decision("llm")
+
+    kind = _SMALLTALK.get(normalized.rstrip("!. "))
+    if kind:
+        if "?" in previous:
+            return Decision("llm")
+        return Decision("smalltalk", reply=SMALLTALK_REPLIES[kind])
+
+    if normalized.isdigit():
+        recipe = _listed_recipe(previous, int(normalized), documents)
+        if recipe is None:
+            return Decision("llm")
+        return Decision("recipe_choice", recipe=recipe)
+
+    if _refers_back(normalized):
+        return Decision("llm")
+
+    match = _INGREDIENT_CHECK.match(normalized)
+    if match:
+        items = [item for item in _ITEM_SPLIT.split(match["items"]) if item]
+        if items:
+            return Decision("ingredient_check", ingredients=items)
+
+    for pattern in _SEARCH:
+        if pattern.match(normalized):
+            return Decision("search", query=text.strip())
+    return Decision("llm")
+
+
+def record_route(route: Route) -> None:
+    """Count a routing decision."""
+    ROUTES.inc(route=route)
+
+
+def route_hits() -> dict[str, int]:
+    """Return the number of turns handled by each route in this process."""
+    return {key[0]: int(value) for key, value in ROUTES.values().items()}
+
+
+def reset_route_hits() -> None:
+    """Reset the route counters."""
+    ROUTES.reset()
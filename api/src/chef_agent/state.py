@@ -6,14 +6,76 @@ sources: https://github.com/langchain-ai/chat-langchain/blob/master/backend/retr
 """
 
 from dataclasses import dataclass, field
-from typing import Annotated, Literal, Optional, Sequence
+from typing import Annotated, Literal, Optional, Sequence, Union
 
+import numpy as np
 from langchain_core.documents import Document
 from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
 from langgraph.managed import IsLastStep
 from typing_extensions import TypedDict
 
+MAX_STATE_DOCUMENTS = 15
+"""Maximum number of documents kept in state; the oldest are dropped first."""
+
+MAX_STATE_DOCUMENT_CHARS = 24_000
+"""Character budget (roughly 6k tokens) for the page content of documents kept in state."""
+
+STATE_DOCUMENT_METADATA = ("type", "title", "source_id", "_depth", "_similarity_score")
+"""Metadata kept on documents in state. Bulky fields such as `keywords` are dropped."""
+
+
+def compact_document(doc: Document) -> Document:
+    """Return the compact form of a document kept in state.
+
+    Only the metadata in `STATE_DOCUMENT_METADATA` is kept, with numpy scalars
+    (e.g. similarity scores) converted to Python numbers so checkpoints can
+    serialize them. Recipes without a `title` get one from their markdown
+    heading.
+    """
+    metadata = {
+        k: v.item() if isinstance(v, np.generic) else v
+        for k in STATE_DOCUMENT_METADATA
+        if k in doc.metadata
+        for v in [doc.metadata[k]]
+    }
+    if "title" not in metadata and doc.page_content.startswith("# "):
+        metadata["title"] = doc.page_content[2:].split("\n", 1)[0].strip()
+    return Document(id=doc.id, page_content=doc.page_content, metadata=metadata)
+
+
+def reduce_docs(
+    existing: Sequence[Document] | None,
+    new: Union[Sequence[Document], Document, Literal["delete"], None],
+) -> list[Document]:
+    """Merge newly retrieved documents into the documents already in state.
+
+    Documents are deduplicated by id, with the newest copy moving to the end, and
+    stored in their compact form. The oldest documents are dropped once
+    `MAX_STATE_DOCUMENTS` or `MAX_STATE_DOCUMENT_CHARS` is exceeded. Pass
+    "delete" to clear the documents.
+    """
+    if new == "delete":
+        return []
+    if isinstance(new, Document):
+        new = [new]
+
+    merged: dict[str, Document] = {}
+    for doc in [*(existing or []), *(new or [])]:
+        key = doc.id or doc.page_content
+        merged.pop(key, None)
+        merged[key] = compact_document(doc)
+
+    kept: list[Document] = []
+    chars = 0
+    for doc in reversed(list(merged.values())[-MAX_STATE_DOCUMENTS:]):
+        chars += len(doc.page_content)
+        if kept and chars > MAX_STATE_DOCUMENT_CHARS:
+            break
+        kept.append(doc)
+    return kept[::-1]
+
+
 @dataclass
 class InputState:
     """Represent the structure of the input state.
@@ -36,6 +98,18 @@ class OutputResponse(TypedDict):
     answer: str    
     sources: list[Document]
 
+class SourceExplaination(TypedDict):
+    """Explanation of why a source is relevant to the question."""
+
+    source_id: str
+    explaination: str
+
+
+class SourceExplainations(TypedDict):
+    """Explanations for every provided source."""
+
+    explainations: list[SourceExplaination]
+
 # class QueryRouter(TypedDict):
 #     """Classify user query"""
 
@@ -55,8 +129,8 @@ class ChefState(InputState):
     # query_router: QueryRouter = field(default_factory=lambda: QueryRouter(type="prepare_search_query", search_scope_type="all"))
     # """The router's classification for the query."""
 
-    documents: list[Document] = field(default_factory=list)
-    """Populated documents from retrieval nodes."""
+    documents: Annotated[list[Document], reduce_docs] = field(default_factory=list)
+    """Populated documents from retrieval nodes, merged and bounded by `reduce_docs`."""
 
     # answer: Optional[OutputResponse] = None
 
@@ -0,0 +1,56 @@
+"""Stream chef graph runs as a flat sequence of events.
+
+The graph streams on two LangGraph stream modes:
+
+- "custom": the `search` tool emits `{"event": "sources", ...}` as soon as
+  retrieval completes and `{"event": "explaination", ...}` for each source
+  explanation as it finishes.
+- "messages": the answer of `call_model` token by token, and the replies of
+  the `route_turn` fast path. Explanation requests are tagged so their tokens
+  are not streamed.
+
+`astream_events` merges both into `{"event": ...}` dicts, with answer tokens as
+`{"event": "token", "content": ...}`, so clients can show sources right after
+retrieval instead of waiting for the whole search tool.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableConfig
+
+from chef_agent.utils import get_message_text
+
+STREAM_MODES = ["custom", "messages"]
+"""The LangGraph stream modes `astream_events` consumes."""
+
+ANSWER_NODES = frozenset({"call_model", "route_turn"})
+"""Nodes whose message output is streamed to the user."""
+
+
+def message_event(message: Any, metadata: dict[str, Any]) -> dict[str, Any] | None:
+    """Return the token event for a "messages" stream item, or None to skip it."""
+    if metadata.get("langgraph_node") not in ANSWER_NODES:
+        return None
+    if not isinstance(message, (AIMessage, AIMessageChunk)):
+        return None
+    content = get_message_text(message)
+    if not content:
+        return None
+    return {"event": "token", "content": content}
+
+
+async def astream_events(
+    graph: Any, input: Any, config: RunnableConfig | None = None
+) -> AsyncIterator[dict[str, Any]]:
+    """Run `graph` on `input` and yield source, explanation and token events."""
+    async for mode, chunk in graph.astream(input, config, stream_mode=STREAM_MODES):
+        if mode == "custom":
+            yield chunk
+        else:
+            message, metadata = chunk
+            event = message_event(message, metadata)
+            if event is not None:
+                yield event
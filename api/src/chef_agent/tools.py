@@ -6,28 +6,44 @@ These tools are intended as free examples to get started. For production use,
 consider implementing more robust and specialized tools tailored to your needs.
 """
 
-from typing import Any, Callable, List, Optional, cast
+import asyncio
+from typing import Any, Callable, List, cast
 
 # from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, ensure_config
 from langsmith import traceable
 from typing_extensions import Annotated
 
-from chef_agent.state import ChefState
+from chef_agent.cache import (
+    explaination_cache_key,
+    get_explaination_cache,
+    get_search_cache,
+    search_cache_namespace,
+)
+from chef_agent.state import ChefState, SourceExplainations, compact_document
 from chef_agent.utils import load_chat_model, format_docs
 from chef_agent.configuration import Configuration
-from chef_agent.prompts import SOURCE_EXPLAINATION_PROMPT
+from chef_agent.prompts import (
+    BATCHED_SOURCE_EXPLAINATION_PROMPT,
+    SOURCE_EXPLAINATION_PROMPT,
+)
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma.vectorstores import Chroma
-from langchain_graph_retriever.transformers import ShreddingTransformer
-from langchain_graph_retriever.adapters.chroma import ChromaAdapter
-from graph_retriever.strategies import Eager
-from langchain_graph_retriever import GraphRetriever
+from chef_agent.coverage import PANTRY_STAPLES, CoverageMatch
+from chef_agent.metrics import (
+    EXPLAINATION_DURATION,
+    EXPLAINATION_SOURCES,
+    SEARCH_SOURCES,
+    STAGE_METADATA_KEY,
+)
+from chef_agent.retrieval import (
+    aget_retriever,
+    ahybrid_retrieve,
+    collection_version,
+    get_coverage_index,
+)
 
-from langchain_core.language_models import BaseChatModel
 from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import (
@@ -39,44 +55,52 @@ from langchain_core.runnables import (
 from langchain_core.tools import InjectedToolArg, tool
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.messages import ToolMessage
+from langgraph.config import get_stream_writer
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.types import Command, interrupt
 from langgraph.prebuilt import InjectedState
 
 
-################ Search Using Graph Retriever ################
-def load_retriver():
-    print("Loading Graph Retriever...")
-    # print current working directory
-    import os
-
-    print(os.getcwd())
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    shredder = ShreddingTransformer()
-    vector_store = ChromaAdapter(
-        Chroma(
-            embedding_function=embeddings,
-            collection_name="recipe_qa_combined",
-            persist_directory="./src/chef_agent/data/recipe_qa_combined_chroma_db",
-        ),
-        shredder,
-        {"keywords"},
-    )
+def _source_id(doc: Document, index: int) -> str:
+    return doc.id or str(index)
+
 
-    traversal_retriever = GraphRetriever(
-        store=vector_store,
-        edges=[("keywords", "keywords"), ("source_id", "source_id")],
-        strategy=Eager(k=5, start_k=5, max_depth=3),
+def _stream_event(event: dict[str, Any]) -> None:
+    """Emit `event` on the graph's "custom" stream, if running inside a graph."""
+    try:
+        writer = get_stream_writer()
+    except (KeyError, RuntimeError):
+        return
+    writer(event)
+
+
+def _stream_explaination(doc: Document, explaination: str) -> None:
+    _stream_event(
+        {"event": "explaination", "source_id": doc.id, "explaination": explaination}
     )
-    return traversal_retriever
 
 
-@traceable(run_type="llm")
-def source_explaination(question, docs: list[Document], config: RunnableConfig = None):
+def _stream_sources(docs: list[Document]) -> None:
+    sources = []
+    for doc in docs:
+        metadata = compact_document(doc).metadata
+        sources.append(
+            {"id": doc.id, "title": metadata.get("title"), "type": metadata.get("type")}
+        )
+    _stream_event({"event": "sources", "sources": sources})
+
+
+async def _per_source_explaination(
+    question: str, docs: list[Document], config: RunnableConfig | None = None
+) -> list[dict[str, Any]]:
     configuration = Configuration.from_runnable_config(config)
     llm = load_chat_model(configuration.model)
 
     se_prompt = ChatPromptTemplate.from_template(SOURCE_EXPLAINATION_PROMPT)
-    explaination_chain = se_prompt | llm | StrOutputParser()
+    # Explanations are streamed as whole events, not token by token.
+    explaination_chain = (se_prompt | llm | StrOutputParser()).with_config(
+        tags=[TAG_NOSTREAM], metadata={STAGE_METADATA_KEY: "explaination"}
+    )
 
     se_chain = RunnableParallel(
         question=RunnableLambda(lambda x: x["question"]),
@@ -87,31 +111,220 @@ def source_explaination(question, docs: list[Document], config: RunnableConfig =
     formatted_docs = [
         {"question": question, "source": doc, **format_docs(doc)} for doc in docs
     ]
-    se_response = se_chain.batch(formatted_docs)
+    se_response: list[dict[str, Any]] = [{} for _ in formatted_docs]
+    async for i, response in se_chain.abatch_as_completed(
+        formatted_docs,
+        config={
+            **ensure_config(config),
+            "max_concurrency": configuration.max_explaination_concurrency,
+        },
+    ):
+        se_response[i] = response
+        _stream_explaination(response["docs"], response["explaination"])
     return se_response
 
 
+async def _batched_source_explaination(
+    question: str, docs: list[Document], config: RunnableConfig | None = None
+) -> list[dict[str, Any]]:
+    configuration = Configuration.from_runnable_config(config)
+    llm = load_chat_model(configuration.model)
+
+    se_prompt = ChatPromptTemplate.from_template(BATCHED_SOURCE_EXPLAINATION_PROMPT)
+    se_chain = (se_prompt | llm.with_structured_output(SourceExplainations)).with_config(
+        tags=[TAG_NOSTREAM], metadata={STAGE_METADATA_KEY: "explaination"}
+    )
+
+    source_ids = [_source_id(doc, i) for i, doc in enumerate(docs)]
+    sources = "\n".join(
+        f'<source source_id="{source_id}">\n{format_docs(doc)["context"]}\n</source>'
+        for source_id, doc in zip(source_ids, docs)
+    )
+    try:
+        response = cast(
+            SourceExplainations,
+            await se_chain.ainvoke({"question": question, "sources": sources}, config),
+        )
+        explained = {e["source_id"]: e["explaination"] for e in response["explainations"]}
+    except (OutputParserException, KeyError, TypeError, ValueError):
+        explained = {}
+    for source_id, doc in zip(source_ids, docs):
+        if source_id in explained:
+            _stream_explaination(doc, explained[source_id])
+
+    # Fall back to one request per source for anything the batch did not cover.
+    missing = [doc for source_id, doc in zip(source_ids, docs) if source_id not in explained]
+    fallback = iter(await _per_source_explaination(question, missing, config) if missing else [])
+    return [
+        {"question": question, "docs": doc, "explaination": explained[source_id]}
+        if source_id in explained
+        else next(fallback)
+        for source_id, doc in zip(source_ids, docs)
+    ]
+
+
+@traceable(run_type="llm")
+async def source_explaination(
+    question: str, docs: list[Document], config: RunnableConfig | None = None
+) -> list[dict[str, Any]]:
+    """Explain why each retrieved document is relevant to the question.
+
+    Depending on `Configuration.explaination_mode`, either one request is issued
+    per document (run concurrently, capped by
+    `Configuration.max_explaination_concurrency`) or all documents are explained
+    in a single structured-output request. Explanations are cached per
+    normalized question, document id, model and the prompt of the mode that
+    generated them, so the two modes never serve each other's explanations.
+
+    Inside a graph run, each explanation is also emitted on the "custom"
+    stream as soon as it is available (cached ones first).
+
+    The duration and the number of cached and generated explanations are
+    recorded in `chef_agent.metrics`.
+    """
+    if not docs:
+        return []
+    configuration = Configuration.from_runnable_config(config)
+    with EXPLAINATION_DURATION.time(mode=configuration.explaination_mode):
+        return await _cached_source_explaination(question, docs, configuration, config)
+
+
+async def _cached_source_explaination(
+    question: str,
+    docs: list[Document],
+    configuration: Configuration,
+    config: RunnableConfig | None = None,
+) -> list[dict[str, Any]]:
+    if configuration.explaination_mode == "batched":
+        explain = _batched_source_explaination
+        prompt = BATCHED_SOURCE_EXPLAINATION_PROMPT
+    else:
+        explain = _per_source_explaination
+        prompt = SOURCE_EXPLAINATION_PROMPT
+    if not configuration.use_explaination_cache:
+        EXPLAINATION_SOURCES.inc(len(docs), origin="model")
+        return await explain(question, docs, config)
+
+    cache = get_explaination_cache()
+    keys = [
+        explaination_cache_key(question, doc.id, prompt, configuration.model)
+        if doc.id
+        else None
+        for doc in docs
+    ]
+    # Disk lookups run in a worker thread and are serialized by SQLite anyway.
+    cached = [await cache.aget(key) if key else None for key in keys]
+    missing = [doc for doc, hit in zip(docs, cached) if hit is None]
+    EXPLAINATION_SOURCES.inc(len(docs) - len(missing), origin="cache")
+    EXPLAINATION_SOURCES.inc(len(missing), origin="model")
+    for doc, hit in zip(docs, cached):
+        if hit is not None:
+            _stream_explaination(doc, hit)
+    generated = iter(await explain(question, missing, config) if missing else [])
+
+    se_response = []
+    for key, doc, hit in zip(keys, docs, cached):
+        if hit is None:
+            explaination = next(generated)
+            if key:
+                await cache.aset(key, explaination["explaination"])
+        else:
+            explaination = {"question": question, "docs": doc, "explaination": hit}
+        se_response.append(explaination)
+    return se_response
+
+
+async def _aexplain_sources(
+    x: dict[str, Any], config: RunnableConfig
+) -> list[dict[str, Any]]:
+    return await source_explaination(x["question"], x["sources"], config)
+
+
+def _emit_sources(x: dict[str, Any]) -> dict[str, Any]:
+    _stream_sources(x["sources"])
+    return x
+
+
 ss_seperator = f"\n{'#'*20}\n"
 
 
+def _search_command(response: dict[str, Any], tool_call_id: str) -> Command:
+    return Command(
+        update={
+            "messages": [
+                ToolMessage(
+                    content=response["search_summary"],
+                    tool_call_id=tool_call_id,
+                )
+            ],
+            # Compact here too: the update is checkpointed before `reduce_docs` runs.
+            "documents": [compact_document(doc) for doc in response["sources"]],
+            "is_post_search_step": True,
+        }
+    )
+
+
 @tool
 async def search(
     query: str,
     *,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    state: Annotated[ChefState, InjectedState],
     config: Annotated[RunnableConfig, InjectedToolArg],
 ):
     """Search for general web results.
 
     This function performs a search for relevent sources such as recipes and cooking related topics.
     """
-    traversal_retriever = load_retriver()
+    configuration = Configuration.from_runnable_config(config)
+    settings = configuration.retriever_settings()
+    traversal_retriever = await aget_retriever(settings)
+    ingredients = list(state.selected_ingredients or [])
+    if configuration.retrieval_mode == "hybrid":
+
+        async def hybrid(q: str) -> list[Document]:
+            return await ahybrid_retrieve(
+                q,
+                ingredients,
+                k=configuration.max_search_results,
+                rrf_k=configuration.rrf_k,
+                settings=settings,
+            )
+
+        retriever: Any = RunnableLambda(hybrid)
+    else:
+        retriever = traversal_retriever
+
+    # Serve paraphrases of earlier queries from the semantic result cache. The
+    # query embedding is cached, so the retriever reuses it below. Results
+    # that depend on selected ingredients are not cached.
+    use_search_cache = configuration.use_search_cache and not ingredients
+    if use_search_cache:
+        search_cache = get_search_cache(
+            search_cache_namespace(
+                settings,
+                configuration.retrieval_mode,
+                # Cached results include the model's explanations.
+                configuration.model,
+                configuration.explaination_mode,
+            )
+        )
+        version = await asyncio.to_thread(collection_version, settings)
+        query_embedding = await traversal_retriever.adapter.aembed_query(query)
+        cached = search_cache.lookup(
+            query_embedding, configuration.search_cache_threshold, version
+        )
+        if cached is not None:
+            SEARCH_SOURCES.observe(len(cached["sources"]), cache="hit")
+            _stream_sources(cached["sources"])
+            return _search_command(cached, tool_call_id)
+
     search_chain = (
-        RunnableParallel(sources=traversal_retriever, question=RunnablePassthrough())
+        RunnableParallel(sources=retriever, question=RunnablePassthrough())
+        # Show what was found before the explanations are generated.
+        | RunnableLambda(_emit_sources)
         | RunnablePassthrough.assign(
-            explainations=RunnableLambda(
-                lambda x: source_explaination(x["question"], x["sources"])
-            )
+            explainations=RunnableLambda(_aexplain_sources)
         )
         | RunnablePassthrough.assign(
             search_summary=RunnableLambda(
@@ -122,18 +335,14 @@ async def search(
         )
     )
     response = await search_chain.ainvoke(query, config=config)
-    return Command(
-        update={
-            "messages": [
-                ToolMessage(
-                    content=response["search_summary"],
-                    tool_call_id=tool_call_id,
-                )
-            ],
-            "documents": response["sources"],
-            "is_post_search_step": True,
-        }
-    )
+    SEARCH_SOURCES.observe(len(response["sources"]), cache="miss")
+    if use_search_cache:
+        search_cache.add(
+            query_embedding,
+            {"sources": response["sources"], "search_summary": response["search_summary"]},
+            version,
+        )
+    return _search_command(response, tool_call_id)
 
 @tool
 async def request_recipe_choice_from_sources( inferred_recipe_id: str, *, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[ChefState, InjectedState],
@@ -232,4 +441,64 @@ async def request_recipe_choice_from_sources( inferred_recipe_id: str, *, tool_c
 
 
 
-TOOLS: List[Callable[..., Any]] = [search, request_recipe_choice_from_sources]
+def _format_match(match: CoverageMatch) -> str:
+    missing = ", ".join(match.missing) if match.missing else "nothing"
+    total = len(match.matched) + len(match.missing)
+    return (
+        f"{match.title} [{match.id}]: uses {len(match.matched)} of {total} "
+        f"ingredients, missing {missing}"
+    )
+
+
+@tool
+async def check_ingredients(
+    ingredients: list[str],
+    recipe_id: str | None = None,
+    max_missing: int = 2,
+    *,
+    state: Annotated[ChefState, InjectedState],
+    config: Annotated[RunnableConfig, InjectedToolArg],
+) -> str:
+    """Check which recipes can be cooked with the given ingredients.
+
+    Use this instead of search for questions like "what can I make with eggs and spinach"
+    or "what am I missing for this recipe". Without a recipe_id (and no selected recipe),
+    lists the recipes missing at most `max_missing` ingredients; with one, lists what is
+    missing for that recipe. The user's selected ingredients are always included.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    index = await asyncio.to_thread(get_coverage_index, configuration.retriever_settings())
+    if index is None:
+        return "Ingredient checks are not available; use search instead."
+
+    available = list(dict.fromkeys([*ingredients, *(state.selected_ingredients or [])]))
+    _, unknown = index.encode(available)
+    notes = f" (assuming {', '.join(PANTRY_STAPLES)})"
+    if unknown:
+        notes += f". Unknown ingredients: {', '.join(unknown)}"
+
+    recipe_id = recipe_id or (state.selected_recipe.id if state.selected_recipe else None)
+    if recipe_id:
+        match = index.check(recipe_id, available)
+        if match is None:
+            return f"Recipe {recipe_id} was not found in the ingredient index."
+        return f"With {', '.join(available) or 'no ingredients'}{notes}:\n{_format_match(match)}"
+
+    matches = index.cookable(
+        available, max_missing=max_missing, k=configuration.max_search_results
+    )
+    if not matches:
+        return (
+            f"No recipe can be made with {', '.join(available) or 'no ingredients'} "
+            f"missing at most {max_missing} ingredients{notes}."
+        )
+    return f"Recipes for {', '.join(available)}{notes}:\n" + "\n".join(
+        f"{i}. {_format_match(match)}" for i, match in enumerate(matches, start=1)
+    )
+
+
+TOOLS: List[Callable[..., Any]] = [
+    search,
+    request_recipe_choice_from_sources,
+    check_ingredients,
+]
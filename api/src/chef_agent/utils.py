@@ -1,9 +1,15 @@
 """Utility & helper functions."""
 
-from typing import Union
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence, Union, cast
+
 from langchain.chat_models import init_chat_model
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
 from langchain_core.documents import Document
 from langsmith import traceable
 
@@ -20,27 +26,146 @@ def get_message_text(msg: BaseMessage) -> str:
         return "".join(txts).strip()
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+# This module owns the model registry. `react_agent.utils` and `agent.utils`
+# keep identical copies of it; change them together.
+MODEL_CACHE_SIZE = 8
+"""Maximum number of chat model instances kept alive by the model registry."""
+
+_model_cache: OrderedDict[Hashable, Any] = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def _freeze_kwargs(kwargs: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+
+def _tool_names(tools: Sequence[Any]) -> tuple[str, ...]:
+    return tuple(getattr(t, "name", None) or getattr(t, "__name__", repr(t)) for t in tools)
+
+
+def _cached_model(key: Hashable, factory: Callable[[], Any]) -> Any:
+    with _model_cache_lock:
+        cached = _model_cache.get(key)
+        if cached is not None:
+            _model_cache.move_to_end(key)
+            return cached
+    # Build outside the lock; a concurrent miss at worst builds a duplicate.
+    model = factory()
+    with _model_cache_lock:
+        model = _model_cache.setdefault(key, model)
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def load_chat_model(fully_specified_name: str, **kwargs: Any) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Instances are cached by provider, model and keyword arguments, so repeated
+    calls reuse the same client and its HTTP connection pool.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
+        **kwargs: Additional keyword arguments passed to `init_chat_model`.
     """
     provider, model = fully_specified_name.split("/", maxsplit=1)
-    return init_chat_model(model, model_provider=provider)
+    key = (provider, model, _freeze_kwargs(kwargs), None)
+    return cast(
+        BaseChatModel,
+        _cached_model(
+            key, lambda: init_chat_model(model, model_provider=provider, **kwargs)
+        ),
+    )
+
+
+def load_chat_model_with_tools(
+    fully_specified_name: str, tools: Sequence[Any], **kwargs: Any
+) -> Runnable[LanguageModelInput, BaseMessage]:
+    """Load a chat model with `tools` bound to it.
 
-@traceable(run_type="chain")
-def format_docs(docs: Union[list[Document], Document], config=None):
+    The bound model is cached alongside the plain model so tool schemas are
+    only serialized once per distinct tool set.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+        tools: The tools to bind to the model.
+        **kwargs: Additional keyword arguments passed to `init_chat_model`.
+    """
+    provider, model = fully_specified_name.split("/", maxsplit=1)
+    key = (provider, model, _freeze_kwargs(kwargs), _tool_names(tools))
+    return cast(
+        Runnable[LanguageModelInput, BaseMessage],
+        _cached_model(
+            key,
+            lambda: load_chat_model(fully_specified_name, **kwargs).bind_tools(tools),
+        ),
+    )
+
+
+def clear_model_cache() -> None:
+    """Drop all cached chat model instances."""
+    with _model_cache_lock:
+        _model_cache.clear()
+
+_QA_SECTION = re.compile(r"<(question|answer)>\s*(.*?)\s*</\1>", re.DOTALL)
+
+FORMATTED_DOCS_CACHE_SIZE = 4096
+"""Maximum number of formatted documents memoized by `format_doc`."""
+
+_formatted_docs: OrderedDict[str, tuple[str, str]] = OrderedDict()
+_formatted_docs_lock = threading.Lock()
+
+
+def _render_doc(doc: Document) -> str:
+    doc_type = doc.metadata.get("type")
+    source_id = doc.metadata.get("source_id") or doc.id
+    if doc_type == "recipe":
+        # Recipe page content is already markdown headed by the title.
+        return f"[recipe {source_id}]\n{doc.page_content.strip()}"
+    if doc_type == "question-answer":
+        # Skip the embedded recipe context; the linked recipe is referenced by id.
+        sections = dict(_QA_SECTION.findall(doc.page_content))
+        if sections:
+            return (
+                f"[question-answer {doc.id} for recipe {source_id}]\n"
+                f"Q: {sections.get('question', '')}\n"
+                f"A: {sections.get('answer', '')}"
+            )
+    return f"[{doc_type or 'source'} {source_id}]\n{doc.page_content.strip()}"
+
+
+def format_doc(doc: Document) -> str:
+    """Render a document compactly for use in prompts.
+
+    Recipes keep their markdown; question-answer documents are reduced to the
+    question and answer. Results are memoized per `Document.id`.
+    """
+    if not doc.id:
+        return _render_doc(doc)
+    with _formatted_docs_lock:
+        cached = _formatted_docs.get(doc.id)
+        if cached is not None and cached[0] == doc.page_content:
+            _formatted_docs.move_to_end(doc.id)
+            return cached[1]
+    rendered = _render_doc(doc)
+    with _formatted_docs_lock:
+        _formatted_docs[doc.id] = (doc.page_content, rendered)
+        _formatted_docs.move_to_end(doc.id)
+        while len(_formatted_docs) > FORMATTED_DOCS_CACHE_SIZE:
+            _formatted_docs.popitem(last=False)
+    return rendered
+
+
+def format_docs(
+    docs: Union[list[Document], Document], config: Any = None
+) -> dict[str, str]:
+    """Format one or more documents into a single prompt context string."""
     if isinstance(docs, Document):
-        docs = [docs]
-    print(docs)
-    # formatted_docs = []
-    # for doc in docs:
-    #     doc_type = doc.metadata.get("type")
-    #     f_doc = f"text: {doc.page_content} metadata: {doc.metadata}"
-    #     if doc_type == "recipe":
-    return {
-        "context": "\n\n".join(
-            f"text: {doc.page_content} metadata: {doc.metadata}" for doc in docs
-        )
-    }
\ No newline at end of file
+        return {"context": format_doc(docs)}
+    return {"context": "\n\n".join(format_doc(doc) for doc in docs)}
+
+
+# Tracing every call is noisy and costly on the hot path, so it is opt-in.
+if os.getenv("CHEF_AGENT_TRACE_FORMATTING", "").lower() in ("1", "true", "yes"):
+    format_docs = traceable(run_type="chain")(format_docs)
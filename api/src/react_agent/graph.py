@@ -14,7 +14,7 @@ from langgraph.prebuilt import ToolNode
 from react_agent.configuration import Configuration
 from react_agent.state import InputState, State
 from react_agent.tools import TOOLS
-from react_agent.utils import load_chat_model
+from react_agent.utils import load_chat_model_with_tools
 
 # Define the function that calls the model
 
@@ -35,8 +35,8 @@ async def call_model(
     """
     configuration = Configuration.from_runnable_config(config)
 
-    # Initialize the model with tool binding. Change the model or add more tools here.
-    model = load_chat_model(configuration.model).bind_tools(TOOLS)
+    # Load the cached model with tool binding. Change the model or add more tools here.
+    model = load_chat_model_with_tools(configuration.model, TOOLS)
 
     # Format the system prompt. Customize this to change the agent's behavior.
     system_message = configuration.system_prompt.format(
@@ -1,8 +1,13 @@
 """Utility & helper functions."""
 
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence, cast
+
 from langchain.chat_models import init_chat_model
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
 
 
 def get_message_text(msg: BaseMessage) -> str:
@@ -17,11 +22,87 @@ def get_message_text(msg: BaseMessage) -> str:
         return "".join(txts).strip()
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+# The model registry is owned by `chef_agent.utils`; keep this copy identical.
+# It is not imported from there because importing `chef_agent` compiles the
+# chef graph.
+MODEL_CACHE_SIZE = 8
+"""Maximum number of chat model instances kept alive by the model registry."""
+
+_model_cache: OrderedDict[Hashable, Any] = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def _freeze_kwargs(kwargs: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+
+def _tool_names(tools: Sequence[Any]) -> tuple[str, ...]:
+    return tuple(
+        getattr(t, "name", None) or getattr(t, "__name__", repr(t)) for t in tools
+    )
+
+
+def _cached_model(key: Hashable, factory: Callable[[], Any]) -> Any:
+    with _model_cache_lock:
+        cached = _model_cache.get(key)
+        if cached is not None:
+            _model_cache.move_to_end(key)
+            return cached
+    # Build outside the lock; a concurrent miss at worst builds a duplicate.
+    model = factory()
+    with _model_cache_lock:
+        model = _model_cache.setdefault(key, model)
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def load_chat_model(fully_specified_name: str, **kwargs: Any) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Instances are cached by provider, model and keyword arguments, so repeated
+    calls reuse the same client and its HTTP connection pool.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
+        **kwargs: Additional keyword arguments passed to `init_chat_model`.
     """
     provider, model = fully_specified_name.split("/", maxsplit=1)
-    return init_chat_model(model, model_provider=provider)
+    key = (provider, model, _freeze_kwargs(kwargs), None)
+    return cast(
+        BaseChatModel,
+        _cached_model(
+            key, lambda: init_chat_model(model, model_provider=provider, **kwargs)
+        ),
+    )
+
+
+def load_chat_model_with_tools(
+    fully_specified_name: str, tools: Sequence[Any], **kwargs: Any
+) -> Runnable[LanguageModelInput, BaseMessage]:
+    """Load a chat model with `tools` bound to it.
+
+    The bound model is cached alongside the plain model so tool schemas are
+    only serialized once per distinct tool set.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+        tools: The tools to bind to the model.
+        **kwargs: Additional keyword arguments passed to `init_chat_model`.
+    """
+    provider, model = fully_specified_name.split("/", maxsplit=1)
+    key = (provider, model, _freeze_kwargs(kwargs), _tool_names(tools))
+    return cast(
+        Runnable[LanguageModelInput, BaseMessage],
+        _cached_model(
+            key,
+            lambda: load_chat_model(fully_specified_name, **kwargs).bind_tools(tools),
+        ),
+    )
+
+
+def clear_model_cache() -> None:
+    """Drop all cached chat model instances."""
+    with _model_cache_lock:
+        _model_cache.clear()
@@ -0,0 +1,477 @@
+"""Offline benchmark of the chef graph.
+
+Runs `chef_agent.graph.graph` end to end without network access:
+
+- a scripted fake chat model plays the agent (one `search` tool call, then an
+  answer) and the source explainer, with a configurable latency per call;
+- deterministic fake embeddings over a fixture Chroma collection of generated
+  recipes and question-answer pairs, with the adjacency, lexical and coverage
+  indexes built as `chef-ingest` would.
+
+Reports p50/p95 latency per node (`route_turn`, `call_model`, `tools`), for
+retrieval (the whole hybrid retrieval and its graph traversal) and source
+explanation, end-to-end latency per run, throughput at the given number of
+concurrent sessions and the peak RSS of the process.
+
+    python tests/benchmarks/graph_benchmark.py --runs 50 --concurrency 8
+    python tests/benchmarks/graph_benchmark.py --output baseline.json
+    python tests/benchmarks/graph_benchmark.py --baseline baseline.json
+
+With `--baseline`, exits with status 1 if any p95 regressed by more than the
+tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Optional, Sequence
+from unittest import mock
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+INGREDIENTS = [
+    "Chicken", "Rice", "Eggs", "Spinach", "Tomatoes", "Onion", "Garlic", "Butter",
+    "Flour", "Sugar", "Milk", "Cheese", "Potatoes", "Carrots", "Beef", "Pasta",
+    "Lemon", "Basil", "Mushrooms", "Cream", "Salmon", "Beans", "Corn", "Honey",
+]  # fmt: skip
+DISHES = ["Casserole", "Soup", "Salad", "Stir Fry", "Bake", "Skillet", "Pie", "Stew"]
+QUERIES = [
+    "I'd like a weeknight dinner with chicken and rice",
+    "Something comforting with potatoes and cheese",
+    "Quick lunch ideas using eggs and spinach",
+    "A light salmon dish with lemon for tonight",
+    "Vegetarian options with beans and corn please",
+    "Dessert that uses honey and cream",
+    "Hearty beef meal for a cold evening",
+    "Pasta with mushrooms and garlic for two",
+]
+"""Benchmark questions; none of them match the fast-path router's rules."""
+
+TIMED_RUNS = {
+    "route_turn": "route_turn",
+    "call_model": "call_model",
+    "tools": "tools",
+    "hybrid": "retrieval",
+    "_aexplain_sources": "explanation",
+}
+"""Maps traced run names to the reported stage."""
+
+
+def fixture_documents(recipes: int = 200) -> list[Document]:
+    """Generate recipe and question-answer documents in the ingested format."""
+    rng = np.random.default_rng(0)
+    docs = []
+    for i in range(recipes):
+        keywords = sorted(
+            INGREDIENTS[j] for j in rng.choice(len(INGREDIENTS), 5, replace=False)
+        )
+        title = f"{keywords[0]} and {keywords[1]} {DISHES[i % len(DISHES)]}"
+        source_id = f"{i}_{re.sub('[^a-z]', '', title.lower())}"
+        md = (
+            f"# {title}\n\n## Ingredients\n"
+            + "".join(f"- 1 c. {k.lower()}\n" for k in keywords)
+            + "\n## Directions\n- Combine everything.\n- Cook until done.\n"
+        )
+        docs.append(
+            Document(
+                id=source_id,
+                page_content=md,
+                metadata={
+                    "keywords": keywords,
+                    "source_id": source_id,
+                    "type": "recipe",
+                },
+            )
+        )
+        if i % 4 == 0:
+            docs.append(
+                Document(
+                    id=f"qa{i}",
+                    page_content=(
+                        f"\n<question>\nHow long should the {title} cook? \n</question>\n\n"
+                        f"<answer>\nUntil done. \n</answer>\n\n<context>\n{md}\n</context>\n"
+                    ),
+                    metadata={"source_id": source_id, "type": "question-answer"},
+                )
+            )
+    return docs
+
+
+def build_fixture(
+    directory: Path, collection_name: str, embeddings: Any, recipes: int
+) -> None:
+    """Write the fixture collection and its indexes under `directory`."""
+    from langchain_chroma.vectorstores import Chroma
+    from langchain_graph_retriever.transformers import ShreddingTransformer
+
+    from chef_agent.adjacency import adjacency_path_for, build_adjacency_index
+    from chef_agent.coverage import build_coverage_index, coverage_path_for
+    from chef_agent.lexical import build_lexical_index, lexical_path_for
+
+    persist_directory = str(directory / "chroma")
+    store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=persist_directory,
+    )
+    docs = list(ShreddingTransformer().transform_documents(fixture_documents(recipes)))
+    store.add_documents(docs, ids=[doc.id for doc in docs])
+    collection = store._collection
+    build_adjacency_index(
+        collection, adjacency_path_for(persist_directory, collection_name)
+    )
+    build_lexical_index(
+        collection, lexical_path_for(persist_directory, collection_name)
+    )
+    build_coverage_index(
+        collection, coverage_path_for(persist_directory, collection_name)
+    )
+
+
+class FakeChefModel(BaseChatModel):
+    """Scripted chat model playing both the agent and the source explainer.
+
+    The agent calls `search` with the user's question, then answers once the
+    tool result is in. Explanation prompts get one sentence per source, or a
+    `SourceExplainations` tool call for batched prompts. Every call sleeps
+    `latency` seconds.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chef"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> FakeChefModel:
+        return self
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text) // 4 + 1
+
+    def _respond(self, messages: list[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        text = last.content if isinstance(last.content, str) else str(last.content)
+        if "<sources>" in text:
+            explainations = [
+                {
+                    "source_id": i,
+                    "explaination": f"Found relevent source {i} : it matches.",
+                }
+                for i in re.findall(r'source_id="([^"]+)"', text)
+            ]
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "SourceExplainations",
+                        "args": {"explainations": explainations},
+                        "id": f"call_{uuid.uuid4().hex}",
+                    }
+                ],
+            )
+        if "<source>" in text:
+            title = re.search(r"# (.+)", text)
+            return AIMessage(
+                content=f"Found relevent source : {title[1] if title else 'it'} matches."
+            )
+        # The agent's context ends with the retrieved documents, so look for
+        # the user's question and a tool result after it.
+        turn = []
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                question = str(message.content)
+                break
+            turn.append(message)
+        else:
+            question = text
+        if any(isinstance(message, ToolMessage) for message in turn):
+            return AIMessage(content="Here are a few recipes that fit what you have.")
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "search",
+                    "args": {"query": question},
+                    "id": f"call_{uuid.uuid4().hex}",
+                }
+            ],
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+class StageTimer(BaseCallbackHandler):
+    """Record the duration of the traced runs listed in `TIMED_RUNS`."""
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self.durations: dict[str, list[float]] = {}
+        self._started: dict[Any, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, stage: Optional[str], run_id: Any) -> None:
+        if stage:
+            with self._lock:
+                self._started[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: Any) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started:
+                stage, start = started
+                self.durations.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def on_chain_start(
+        self, serialized: Any, inputs: Any, *, run_id: Any, **kwargs: Any
+    ) -> None:
+        self._start(TIMED_RUNS.get(kwargs.get("name") or ""), run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: Any, **kwargs: Any
+    ) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+
+    def on_retriever_start(
+        self, serialized: Any, query: str, *, run_id: Any, **kwargs: Any
+    ) -> None:
+        self._start("traversal", run_id)
+
+    def on_retriever_end(self, documents: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+
+
+def summarize(durations: Sequence[float]) -> dict[str, float]:
+    """Return the count and p50/p95 in milliseconds of `durations` (in seconds)."""
+    values = np.asarray(durations) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+async def run_benchmark(
+    runs: int = 32,
+    concurrency: int = 4,
+    latency: float = 0.0,
+    recipes: int = 200,
+    explaination_mode: str = "per_source",
+    use_cache: bool = False,
+) -> dict[str, Any]:
+    """Run the chef graph `runs` times over `concurrency` concurrent sessions."""
+    work = Path(tempfile.mkdtemp(prefix="chef-bench-"))
+    os.environ.setdefault("CHEF_AGENT_CHECKPOINTER", "memory")
+    os.environ.setdefault("CHEF_AGENT_CACHE_DIR", str(work / "cache"))
+    os.environ.setdefault("CHEF_AGENT_EMBEDDING_CACHE_PERSIST", "0")
+
+    import chef_agent.graph  # noqa: F401
+    from chef_agent import retrieval
+
+    graph_module = sys.modules["chef_agent.graph"]
+    tools_module = sys.modules["chef_agent.tools"]
+    collection_name = "bench"
+    persist_directory = str(work / "chroma")
+    embeddings = DeterministicFakeEmbedding(size=256)
+    build_fixture(work, collection_name, embeddings, recipes)
+    model = FakeChefModel(latency=latency)
+
+    settings = retrieval.RetrieverSettings(
+        persist_directory=persist_directory,
+        collection_name=collection_name,
+        embedding_model="fake-embedding",
+    )
+
+    with ExitStack() as stack:
+        for module, name in [
+            (graph_module, "load_chat_model"),
+            (graph_module, "load_chat_model_with_tools"),
+            (tools_module, "load_chat_model"),
+        ]:
+            stack.enter_context(mock.patch.object(module, name, lambda *a, **k: model))
+        retrieval.invalidate_retriever()
+        stack.callback(retrieval.invalidate_retriever)
+        stack.enter_context(
+            mock.patch.object(
+                retrieval, "STORAGE_ROOT", str(Path(settings.persist_directory).parent)
+            )
+        )
+        # Open the fixture collection with the fake embeddings.
+        retrieval._stores.set(
+            repr(settings.store_key), retrieval.load_store(settings, embeddings)
+        )
+
+        timer = StageTimer()
+        end_to_end: list[float] = []
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(runs):
+            queue.put_nowait(i)
+
+        async def session() -> None:
+            while not queue.empty():
+                i = queue.get_nowait()
+                config = {
+                    "callbacks": [timer],
+                    "configurable": {
+                        "thread_id": f"bench-{i}",
+                        "explaination_mode": explaination_mode,
+                        "use_explaination_cache": use_cache,
+                        "use_search_cache": use_cache,
+                        "persist_directory": persist_directory,
+                        "collection_name": collection_name,
+                        "embedding_model": settings.embedding_model,
+                    },
+                }
+                start = time.perf_counter()
+                await graph_module.graph.ainvoke(
+                    {"messages": [("user", QUERIES[i % len(QUERIES)])]}, config
+                )
+                end_to_end.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "runs": runs,
+        "concurrency": concurrency,
+        "latency_s": latency,
+        "recipes": recipes,
+        "explaination_mode": explaination_mode,
+        "throughput_rps": round(runs / elapsed, 3),
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "end_to_end": summarize(end_to_end),
+        "stages": {stage: summarize(d) for stage, d in sorted(timer.durations.items())},
+    }
+
+
+def regressions(
+    report: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float = 0.25,
+    slack_ms: float = 1.0,
+) -> list[str]:
+    """Return a description of every p95 that exceeds its baseline by more than `tolerance`."""
+    current = {"end_to_end": report["end_to_end"], **report["stages"]}
+    expected = {"end_to_end": baseline["end_to_end"], **baseline["stages"]}
+    found = []
+    for stage, stats in expected.items():
+        if stage not in current:
+            continue
+        limit = stats["p95_ms"] * (1 + tolerance) + slack_ms
+        if current[stage]["p95_ms"] > limit:
+            found.append(
+                f"{stage}: p95 {current[stage]['p95_ms']:.1f}ms > {limit:.1f}ms "
+                f"(baseline {stats['p95_ms']:.1f}ms)"
+            )
+    return found
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Format a benchmark report as a table."""
+    lines = [
+        f"{report['runs']} runs, {report['concurrency']} concurrent, "
+        f"{report['latency_s'] * 1000:.0f}ms model latency, {report['recipes']} recipes",
+        f"{'stage':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}",
+    ]
+    for stage, stats in {
+        "end_to_end": report["end_to_end"],
+        **report["stages"],
+    }.items():
+        lines.append(
+            f"{stage:<14}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+        )
+    lines.append(f"throughput: {report['throughput_rps']:.2f} runs/s")
+    lines.append(f"peak RSS: {report['peak_rss_mb']:.1f} MB")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark from command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per model call."
+    )
+    parser.add_argument("--recipes", type=int, default=200)
+    parser.add_argument(
+        "--explaination-mode", choices=["per_source", "batched"], default="per_source"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Enable the result caches."
+    )
+    parser.add_argument("--output", help="Write the report to this JSON file.")
+    parser.add_argument("--baseline", help="Compare p95s to this JSON report.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        run_benchmark(
+            args.runs,
+            args.concurrency,
+            args.latency,
+            args.recipes,
+            args.explaination_mode,
+            args.cache,
+        )
+    )
+    sys.stdout.write(format_report(report) + "\n")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        found = regressions(
+            report, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        for regression in found:
+            sys.stdout.write(f"REGRESSION {regression}\n")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BENCHMARK = Path(__file__).with_name("graph_benchmark.py")
+
+
+def test_benchmark_runs_offline(tmp_path) -> None:
+    output = tmp_path / "report.json"
+    subprocess.run(
+        [
+            sys.executable,
+            str(BENCHMARK),
+            "--runs=4",
+            "--concurrency=2",
+            "--recipes=40",
+            f"--output={output}",
+        ],
+        check=True,
+        capture_output=True,
+        timeout=300,
+    )
+    report = json.loads(output.read_text())
+    assert report["end_to_end"]["count"] == 4
+    for stage in ["call_model", "tools", "retrieval", "traversal", "explanation"]:
+        assert (
+            report["stages"][stage]["p95_ms"] >= report["stages"][stage]["p50_ms"] > 0
+        )
+    assert report["stages"]["call_model"]["count"] == 8
+    assert report["throughput_rps"] > 0 and report["peak_rss_mb"] > 0
+
+    # A report is never a regression of itself.
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(BENCHMARK),
+            "--runs=4",
+            "--recipes=40",
+            f"--baseline={output}",
+            "--tolerance=100",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stdout
@@ -0,0 +1,193 @@
+import numpy as np
+import pytest
+from graph_retriever.edges import IdEdge, MetadataEdge
+from graph_retriever.utils.top_k import top_k
+from langchain_chroma.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_graph_retriever.adapters.chroma import ChromaAdapter
+from langchain_graph_retriever.transformers import ShreddingTransformer
+from langchain_graph_retriever.transformers.shredding import DEFAULT_PATH_DELIMITER
+
+from chef_agent import adjacency
+from chef_agent.adjacency import AdjacencyIndex, IndexedAdapter, build_adjacency_index
+from chef_agent.chroma import CompatChromaAdapter
+from chef_agent.collection import INGEST_RUN_KEY, PATH_DELIMITER
+from chef_agent.retrieval import _with_adjacency_index
+
+
+@pytest.fixture
+def adapter(tmp_path) -> ChromaAdapter:
+    keywords = ["Salt", "Egg", "Flour", "Butter", "Sugar"]
+    docs = [
+        Document(
+            id=f"{i}_recipe",
+            page_content=f"# Recipe {i}",
+            metadata={
+                "keywords": [keywords[i % 5], keywords[(i * 3) % 5]],
+                "source_id": f"{i}_recipe",
+                "type": "recipe",
+            },
+        )
+        for i in range(30)
+    ] + [
+        Document(
+            id=f"qa{i}",
+            page_content=f"<question>Recipe {i}?</question>",
+            metadata={"source_id": f"{i}_recipe", "type": "question-answer"},
+        )
+        for i in range(0, 30, 3)
+    ]
+    shredder = ShreddingTransformer()
+    store = Chroma(
+        collection_name="test",
+        embedding_function=DeterministicFakeEmbedding(size=8),
+        persist_directory=str(tmp_path / "db"),
+    )
+    store.add_documents(list(shredder.transform_documents(docs)))
+    return ChromaAdapter(store, shredder, {"keywords"})
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _matching(adapter, edges):
+    """Brute-force the contents with an incoming edge in `edges`."""
+    ids = [f"{i}_recipe" for i in range(30)] + [f"qa{i}" for i in range(0, 30, 3)]
+    contents = adapter.get(ids)
+    return [
+        c
+        for c in contents
+        for e in edges
+        if (isinstance(e, IdEdge) and c.id == e.id)
+        or (
+            isinstance(e, MetadataEdge)
+            and e.value in _as_list(c.metadata.get(e.incoming_field))
+        )
+    ]
+
+
+def test_indexed_adapter_matches_store_expansions(adapter, tmp_path) -> None:
+    assert (
+        build_adjacency_index(adapter.vector_store._collection, tmp_path / "adj") == 40
+    )
+    index = AdjacencyIndex.load(tmp_path / "adj")
+    assert index is not None
+    indexed = IndexedAdapter(adapter, index)
+    query = DeterministicFakeEmbedding(size=8).embed_query("salty eggs")
+
+    for edges in [
+        {MetadataEdge("keywords", "Salt")},
+        {MetadataEdge("keywords", "Egg"), MetadataEdge("keywords", "Sugar")},
+        {MetadataEdge("source_id", "3_recipe")},
+        {MetadataEdge("keywords", "Missing"), IdEdge("7_recipe")},
+    ]:
+        expected = [
+            c.id for c in top_k(_matching(adapter, edges), embedding=query, k=4)
+        ]
+        assert [c.id for c in indexed.adjacent(edges, query, 4, None)] == expected
+
+    # Attributes of the wrapped adapter stay reachable.
+    assert indexed.vector_store is adapter.vector_store
+
+
+@pytest.mark.asyncio
+async def test_indexed_adapter_async_uses_cached_content(adapter, tmp_path) -> None:
+    build_adjacency_index(adapter.vector_store._collection, tmp_path / "adj")
+    indexed = IndexedAdapter(adapter, AdjacencyIndex(tmp_path / "adj"))
+    query = DeterministicFakeEmbedding(size=8).embed_query("flour")
+    edges = {MetadataEdge("source_id", "6_recipe")}
+
+    first = await indexed.aadjacent(edges, query, 5, None)
+    assert sorted(c.id for c in first) == ["6_recipe", "qa6"]
+    calls = []
+    adapter_aget = adapter.aget
+
+    async def counting_aget(*args, **kwargs):
+        calls.append(args)
+        return await adapter_aget(*args, **kwargs)
+
+    object.__setattr__(adapter, "aget", counting_aget)
+    second = await indexed.aadjacent(edges, query, 5, None)
+    assert [c.id for c in second] == [c.id for c in first]
+    assert calls == []
+
+
+def test_index_is_stale_once_another_ingest_run_writes(adapter, tmp_path) -> None:
+    collection = adapter.vector_store._collection
+    collection.modify(metadata={INGEST_RUN_KEY: "first"})
+    build_adjacency_index(collection, tmp_path / "adj")
+    assert isinstance(_with_adjacency_index(adapter, tmp_path / "adj"), IndexedAdapter)
+
+    # The document count is unchanged, but the documents may not be.
+    collection.modify(metadata={INGEST_RUN_KEY: "second"})
+    assert _with_adjacency_index(adapter, tmp_path / "adj") is adapter
+
+
+def test_shredded_fields_use_the_transformer_delimiter() -> None:
+    assert PATH_DELIMITER == DEFAULT_PATH_DELIMITER
+
+
+def test_blocked_top_k_matches_a_single_block(adapter, tmp_path, monkeypatch) -> None:
+    build_adjacency_index(adapter.vector_store._collection, tmp_path / "adj")
+    index = AdjacencyIndex(tmp_path / "adj")
+    assert index.embeddings.dtype == np.float16
+    query = DeterministicFakeEmbedding(size=8).embed_query("butter")
+    rows = np.arange(index.count)
+
+    expected = index.top_k(rows, query, 7)
+    monkeypatch.setattr(adjacency, "_BLOCK_ROWS", 3)
+    assert index.top_k(rows, query, 7) == expected
+    assert index.top_k(rows, query, 100) == index.top_k(rows, query, index.count)
+
+
+def test_high_frequency_keywords_use_the_store_search(tmp_path) -> None:
+    docs = [
+        Document(
+            id=f"{i}",
+            page_content=f"# Recipe {i}",
+            metadata={"keywords": ["Salt"] + (["Saffron"] if i % 50 == 0 else [])},
+        )
+        for i in range(500)
+    ]
+    shredder = ShreddingTransformer()
+    store = Chroma(
+        collection_name="common",
+        embedding_function=DeterministicFakeEmbedding(size=8),
+        persist_directory=str(tmp_path / "db"),
+    )
+    store.add_documents(list(shredder.transform_documents(docs)))
+    adapter = CompatChromaAdapter(store, shredder, {"keywords"})
+    build_adjacency_index(store._collection, tmp_path / "adj")
+    index = AdjacencyIndex(tmp_path / "adj")
+    indexed = IndexedAdapter(adapter, index, max_candidates=100)
+
+    delegated = []
+    adapter_adjacent = adapter.adjacent
+
+    def counting_adjacent(*args, **kwargs):
+        delegated.append(args[0])
+        return adapter_adjacent(*args, **kwargs)
+
+    object.__setattr__(adapter, "adjacent", counting_adjacent)
+    scored = []
+    index_top_k = index.top_k
+
+    def counting_top_k(rows, *args):
+        scored.append(len(rows))
+        return index_top_k(rows, *args)
+
+    index.top_k = counting_top_k
+    query = DeterministicFakeEmbedding(size=8).embed_query("salty")
+
+    salt = {MetadataEdge("keywords", "Salt")}
+    assert index.candidates(salt) == 500
+    assert len(list(indexed.adjacent(salt, query, 4, None))) == 4
+    assert delegated == [salt]
+    assert scored == []
+
+    saffron = {MetadataEdge("keywords", "Saffron")}
+    assert len(list(indexed.adjacent(saffron, query, 4, None))) == 4
+    assert delegated == [salt]
+    assert scored == [10]
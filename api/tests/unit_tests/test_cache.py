@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from chef_agent.cache import (
+    LRUCache,
+    SQLiteCache,
+    TieredCache,
+    explaination_cache_key,
+)
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache: LRUCache[str] = LRUCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    assert cache.set("c", "3") == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_lru_cache_expires_entries() -> None:
+    cache: LRUCache[str] = LRUCache(maxsize=2, ttl=10)
+    cache.set("a", "1", stored_at=0)
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_reads_through_to_disk(tmp_path) -> None:
+    disk = SQLiteCache(
+        tmp_path / "cache.sqlite", max_entries=2, prune_every=1, flush_every=1
+    )
+    cache: TieredCache[str] = TieredCache(memory_size=4, disk=disk)
+    cache.set("a", "1")
+
+    # A fresh process only has the on-disk tier.
+    restarted: TieredCache[str] = TieredCache(memory_size=4, disk=disk)
+    assert restarted.get("a") == "1"
+    assert restarted.get("a") == "1"
+    assert restarted.get("missing") is None
+    stats = restarted.snapshot()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+    cache.set("b", "2")
+    cache.set("c", "3")
+    assert disk.get("a") is None
+
+
+def test_sqlite_cache_commits_writes_in_batches(tmp_path) -> None:
+    path = tmp_path / "cache.sqlite"
+    disk = SQLiteCache(path, flush_every=2, flush_interval=60)
+    other_worker = SQLiteCache(path)
+    disk.set("a", b"1")
+    # Buffered writes are served locally but not yet committed.
+    assert disk.get("a") is not None
+    assert other_worker.get("a") is None
+    disk.set("b", b"2")
+    assert other_worker.get("a") is not None
+    disk.set("c", b"3")
+    disk.close()
+    assert other_worker.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_async_access(tmp_path) -> None:
+    disk = SQLiteCache(tmp_path / "cache.sqlite")
+    cache: TieredCache[str] = TieredCache(memory_size=4, disk=disk)
+    await cache.aset("a", "1")
+    restarted: TieredCache[str] = TieredCache(memory_size=4, disk=disk)
+    assert await restarted.aget("a") == "1"
+    assert await restarted.aget("a") == "1"
+    assert await restarted.aget("missing") is None
+    stats = restarted.snapshot()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_explaination_cache_key_normalizes_question() -> None:
+    key = explaination_cache_key("Recipes for  salmon?", "doc-1", "prompt", "m")
+    assert key == explaination_cache_key("recipes for salmon", "doc-1", "prompt", "m")
+    assert key != explaination_cache_key("recipes for salmon", "doc-1", "prompt", "m2")
+    assert key != explaination_cache_key("recipes for salmon", "doc-2", "prompt", "m")
+
+
+def test_cached_embeddings_skip_repeated_queries() -> None:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from chef_agent.embeddings import CachedEmbeddings
+
+    class CountingEmbeddings(DeterministicFakeEmbedding):
+        calls: int = 0
+
+        def embed_query(self, text: str) -> list[float]:
+            self.calls += 1
+            return super().embed_query(text)
+
+    inner = CountingEmbeddings(size=8)
+    embeddings = CachedEmbeddings(inner, model="fake", cache=TieredCache(memory_size=4))
+    first = embeddings.embed_query("Recipes for salmon")
+    again = embeddings.embed_query("recipes for  salmon?")
+    assert inner.calls == 1
+    assert again == pytest.approx(first, rel=1e-6)
+
+
+def test_local_embeddings_load_once_and_normalize(monkeypatch) -> None:
+    import sys
+    import types
+
+    import numpy as np
+
+    from chef_agent import embeddings
+
+    class FakeSentenceTransformer:
+        loaded: list = []
+
+        def __init__(self, name, device, backend) -> None:
+            self.loaded.append((name, device, backend))
+            self.encoded: list = []
+
+        def get_sentence_embedding_dimension(self) -> int:
+            return 3
+
+        def encode(self, texts, batch_size, normalize_embeddings, **kwargs):
+            self.encoded.append((list(texts), batch_size))
+            vectors = np.array([[len(t), 1.0, 0.0] for t in texts])
+            return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    embeddings._load_sentence_transformer.cache_clear()
+
+    local = embeddings.load_embeddings("local/mini")
+    assert isinstance(local, embeddings.LocalEmbeddings)
+    assert FakeSentenceTransformer.loaded == [("mini", "cpu", "torch")]
+    assert local.model.encoded == [(["warm up"], 64)]  # warmed up on load
+    assert local.dimension == 3
+
+    vectors = local.embed_documents(["a", "bb", "ccc"])
+    assert local.model.encoded[-1] == (["a", "bb", "ccc"], 64)
+    assert np.linalg.norm(vectors, axis=1) == pytest.approx([1, 1, 1])
+    assert asyncio.run(local.aembed_query("bb")) == pytest.approx(vectors[1])
+
+    embeddings.LocalEmbeddings("mini", warm_up=False)
+    assert len(FakeSentenceTransformer.loaded) == 1
+    embeddings._load_sentence_transformer.cache_clear()
+
+
+def test_semantic_cache_matches_nearby_embeddings() -> None:
+    from chef_agent.cache import SemanticCache
+
+    cache: SemanticCache[str] = SemanticCache(maxsize=2)
+    cache.add([1.0, 0.0, 0.0], "salmon", version=1)
+    cache.add([0.0, 1.0, 0.0], "pasta", version=1)
+
+    assert cache.lookup([0.99, 0.05, 0.0], threshold=0.95, version=1) == "salmon"
+    assert cache.lookup([0.7, 0.7, 0.0], threshold=0.95, version=1) is None
+
+    # The oldest entry is overwritten once the cache is full.
+    cache.add([0.0, 0.0, 1.0], "soup", version=1)
+    assert cache.lookup([1.0, 0.0, 0.0], threshold=0.95, version=1) is None
+    assert cache.lookup([0.0, 0.0, 2.0], threshold=0.95, version=1) == "soup"
+
+    # A new collection version invalidates every entry.
+    assert cache.lookup([0.0, 1.0, 0.0], threshold=0.95, version=2) is None
@@ -0,0 +1,152 @@
+import asyncio
+import operator
+import threading
+from dataclasses import dataclass, field
+from typing import Annotated
+
+from langchain_core.documents import Document
+from langgraph.graph import StateGraph
+
+from chef_agent.checkpoint import CompactDocumentSerializer, PrunedSqliteSaver
+
+
+def _store(ids, store=None):
+    return {
+        i: Document(
+            id=i,
+            page_content=f"# Recipe {i}",
+            metadata={"type": "recipe", "keywords": ["x"]},
+        )
+        for i in ids
+        if i != "gone"
+    }
+
+
+def test_serializer_stores_document_references() -> None:
+    serde = CompactDocumentSerializer(load_documents=_store)
+    doc = Document(
+        id="a",
+        page_content="# Recipe a",
+        metadata={"type": "recipe", "keywords": ["x"] * 100, "_similarity_score": 0.5},
+    )
+    _, data = serde.dumps_typed({"documents": [doc], "selected_recipe": doc})
+    assert b"# Recipe a" not in data
+
+    restored = serde.loads_typed(("msgpack", data))
+    assert restored["documents"][0] == Document(
+        id="a",
+        page_content="# Recipe a",
+        metadata={"type": "recipe", "_similarity_score": 0.5, "title": "Recipe a"},
+    )
+
+
+def test_serializer_keeps_documents_not_in_the_store() -> None:
+    serde = CompactDocumentSerializer(load_documents=_store)
+    gone = Document(id="gone", page_content="old")
+    edited = Document(id="a", page_content="# My recipe a")
+    _, data = serde.dumps_typed([gone, edited])
+    assert b"old" in data
+    assert b"# My recipe a" in data
+    assert serde.loads_typed(("msgpack", data)) == [gone, edited]
+
+
+@dataclass
+class _State:
+    count: Annotated[int, operator.add] = 0
+    docs: list[Document] = field(default_factory=list)
+
+
+def test_sqlite_saver_prunes_old_checkpoints(tmp_path) -> None:
+    async def run() -> None:
+        saver = PrunedSqliteSaver(
+            tmp_path / "checkpoints.sqlite",
+            keep_last=3,
+            serde=CompactDocumentSerializer(load_documents=_store),
+        )
+        builder = StateGraph(_State)
+        builder.add_node(
+            "step",
+            lambda s: {
+                "count": 1,
+                "docs": [Document(id="a", page_content="# Recipe a")],
+            },
+        )
+        builder.add_edge("__start__", "step")
+        graph = builder.compile(checkpointer=saver)
+
+        config = {"configurable": {"thread_id": "t1"}}
+        for _ in range(4):
+            await graph.ainvoke({"count": 0}, config)
+
+        state = await graph.aget_state(config)
+        assert state.values["count"] == 4
+        assert state.values["docs"][0].page_content == "# Recipe a"
+        assert len([c async for c in saver.alist(config)]) == 3
+        await saver.conn.close()
+
+    asyncio.run(run())
+
+
+def test_saver_rehydrates_from_the_run_store_off_the_event_loop(tmp_path) -> None:
+    loads = []
+
+    def load(ids, store):
+        loads.append((store, threading.current_thread() is threading.main_thread()))
+        return {i: Document(id=i, page_content=f"{store[1]} {i}") for i in ids}
+
+    async def run() -> None:
+        saver = PrunedSqliteSaver(
+            tmp_path / "checkpoints.sqlite",
+            serde=CompactDocumentSerializer(load_documents=load),
+        )
+        builder = StateGraph(_State)
+        builder.add_node(
+            "step",
+            lambda s: {"count": 1, "docs": [Document(id="a", page_content="other a")]},
+        )
+        builder.add_edge("__start__", "step")
+        graph = builder.compile(checkpointer=saver)
+
+        config = {
+            "configurable": {
+                "thread_id": "t1",
+                "collection_name": "other",
+                "persist_directory": str(tmp_path),
+            }
+        }
+        await graph.ainvoke({"count": 0}, config)
+        state = await graph.aget_state({"configurable": {"thread_id": "t1"}})
+        assert state.values["docs"][0].page_content == "other a"
+        await saver.conn.close()
+
+    asyncio.run(run())
+    assert loads
+    assert all(store[:2] == (str(tmp_path), "other") for store, _ in loads)
+    assert not any(on_main_thread for _, on_main_thread in loads)
+
+
+def test_sqlite_saver_serves_sync_calls(tmp_path) -> None:
+    saver = PrunedSqliteSaver(
+        tmp_path / "checkpoints.sqlite",
+        keep_last=2,
+        serde=CompactDocumentSerializer(load_documents=_store),
+    )
+    builder = StateGraph(_State)
+    builder.add_node(
+        "step",
+        lambda s: {"count": 1, "docs": [Document(id="a", page_content="# Recipe a")]},
+    )
+    builder.add_edge("__start__", "step")
+    graph = builder.compile(checkpointer=saver)
+
+    config = {"configurable": {"thread_id": "t1"}}
+    for _ in range(3):
+        graph.invoke({"count": 0}, config)
+
+    state = graph.get_state(config)
+    assert state.values["count"] == 3
+    assert state.values["docs"][0].page_content == "# Recipe a"
+    assert len(list(saver.list(config))) == 2
+
+    saver.delete_thread("t1")
+    assert saver.get_tuple(config) is None
@@ -0,0 +1,66 @@
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from chef_agent.context import TokenCounter, build_context
+
+
+class _WordCountModel:
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+def _counter() -> TokenCounter:
+    return TokenCounter(_WordCountModel())  # type: ignore[arg-type]
+
+
+def _turn(i: int) -> list:
+    return [
+        HumanMessage(content=f"question {i} " + "word " * 20, id=f"h{i}"),
+        AIMessage(
+            content="",
+            id=f"a{i}",
+            tool_calls=[{"name": "search", "args": {"query": "q"}, "id": f"t{i}"}],
+        ),
+        ToolMessage(content="result " * 20, tool_call_id=f"t{i}", id=f"r{i}"),
+        AIMessage(content="answer " * 20, id=f"f{i}"),
+    ]
+
+
+def test_build_context_keeps_everything_within_budget() -> None:
+    counter = _counter()
+    messages = _turn(0)
+    context = build_context(
+        "system", messages, [], counter, max_tokens=1000, max_document_tokens=100
+    )
+    assert context[1:] == messages
+
+
+def test_build_context_drops_oldest_turns() -> None:
+    counter = _counter()
+    messages = [m for i in range(10) for m in _turn(i)]
+    context = build_context(
+        "system", messages, [], counter, max_tokens=300, max_document_tokens=100
+    )
+    assert counter(context) <= 300
+    assert isinstance(context[1], SystemMessage)
+    assert "question 8" in context[1].content
+    assert "question 0" not in context[1].content
+    history = context[2:]
+    assert isinstance(history[0], HumanMessage)
+    assert history[-1] is messages[-1]
+
+
+def test_build_context_ranks_documents() -> None:
+    counter = _counter()
+    docs = [
+        Document(
+            id=str(i), page_content="text " * 40, metadata={"_similarity_score": i / 10}
+        )
+        for i in range(5)
+    ]
+    context = build_context(
+        "system", _turn(0), docs, counter, max_tokens=1000, max_document_tokens=120
+    )
+    sources = context[-1].content
+    assert "[source 4]" in sources
+    assert "[source 0]" not in sources
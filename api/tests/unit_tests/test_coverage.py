@@ -0,0 +1,124 @@
+import sys
+
+import chromadb
+import pytest
+
+from chef_agent import coverage
+from chef_agent.coverage import CoverageIndex, build_coverage_index
+from chef_agent.state import ChefState
+
+RECIPES = {
+    "1_spinachquiche": ["Eggs", "Spinach", "Pie crust", "Salt"],
+    "2_chocolatecake": ["Eggs", "Cocoa", "Sugar", "Flour"],
+    "3_scrambledeggs": ["Eggs", "Butter", "Pepper"],
+    "4_brownies": ["Eggs", "Brown sugar", "Cocoa"],
+    "5_tomatosoup": ["Tomatoes", "Onion", "Water"],
+}
+
+
+def _build(tmp_path, recipes):
+    client = chromadb.PersistentClient(path=str(tmp_path / "db"))
+    collection = client.get_or_create_collection("test")
+    collection.add(
+        ids=list(recipes) + ["qa1"],
+        documents=[f"# Recipe {i}\n\n## Ingredients" for i in recipes] + ["<question>"],
+        metadatas=[
+            {"type": "recipe", **{f'keywords→"{k}"': "§" for k in keywords}}
+            for keywords in recipes.values()
+        ]
+        + [{"type": "question-answer"}],
+        embeddings=[[float(i), 1.0] for i in range(len(recipes) + 1)],
+    )
+    count = build_coverage_index(collection, tmp_path / "coverage", page_size=2)
+    assert count == len(recipes)
+    return tmp_path / "coverage"
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return _build(tmp_path, RECIPES)
+
+
+@pytest.mark.parametrize("block_rows", [2, 65_536])
+def test_cookable_ranks_by_missing_ingredients(
+    index_path, monkeypatch, block_rows
+) -> None:
+    # Recipes are counted a block at a time; ranking spans blocks.
+    monkeypatch.setattr(coverage, "_BLOCK_ROWS", block_rows)
+    index = CoverageIndex(index_path)
+
+    matches = index.cookable(["eggs", "butter"], max_missing=0)
+    assert [m.id for m in matches] == ["3_scrambledeggs"]
+    assert matches[0].missing == [] and matches[0].coverage == 1.0
+
+    matches = index.cookable(["egg", "sugar", "cocoa"], max_missing=2)
+    assert [m.id for m in matches] == [
+        "4_brownies",
+        "2_chocolatecake",
+        "3_scrambledeggs",
+        "1_spinachquiche",
+    ]
+    # "sugar" covers "Brown sugar"; the staples cover "Salt" and "Pepper".
+    assert matches[0].missing == []
+    assert matches[1].missing == ["Flour"]
+    assert matches[3].missing == ["Pie crust", "Spinach"]
+    assert index.cookable(["saffron"], max_missing=5) == []
+
+
+def test_check_reports_missing_and_unknown(index_path) -> None:
+    index = CoverageIndex(index_path)
+    match = index.check("1_spinachquiche", ["Eggs", "spinach"])
+    assert match is not None
+    assert match.title == "Recipe 1_spinachquiche"
+    assert match.matched == ["Eggs", "Salt", "Spinach"]
+    assert match.missing == ["Pie crust"]
+    assert index.check("missing", ["eggs"]) is None
+    assert index.encode(["eggs", "dragonfruit"])[1] == ["dragonfruit"]
+
+
+def test_ingredients_cover_only_keywords_naming_them(tmp_path) -> None:
+    index = CoverageIndex(
+        _build(
+            tmp_path,
+            {
+                "1_stuffedpeppers": ["Green pepper", "Ground beef", "Rice", "Salt"],
+                "2_soup": ["Celery salt", "Chopped onions", "Water"],
+                "3_sundae": ["Ice cream", "Heavy cream"],
+            },
+        )
+    )
+
+    match = index.check("1_stuffedpeppers", ["ground beef", "rice"])
+    assert match is not None
+    assert match.missing == ["Green pepper"]
+    assert index.check("1_stuffedpeppers", ["beef"]).missing == ["Green pepper", "Rice"]
+    # Staples are matched exactly.
+    assert index.check("2_soup", ["onion"]).missing == ["Celery salt"]
+    # "heavy" and "ice" name other ingredients: only a descriptor is skipped.
+    assert index.check("3_sundae", ["cream"]).missing == ["Heavy cream", "Ice cream"]
+    assert index.encode(["pepper"], exact=True)[1] == ["pepper"]
+
+
+@pytest.mark.asyncio
+async def test_check_ingredients_tool_uses_selected_ingredients(
+    index_path, monkeypatch
+) -> None:
+    retrieval = sys.modules["chef_agent.retrieval"]
+    tools = sys.modules["chef_agent.tools"]
+    monkeypatch.setitem(
+        retrieval._coverage_indexes,
+        (retrieval.PERSIST_DIRECTORY, retrieval.COLLECTION_NAME),
+        CoverageIndex(index_path),
+    )
+
+    state = ChefState(selected_ingredients=["butter"])
+    result = await tools.check_ingredients.ainvoke(
+        {"ingredients": ["eggs"], "max_missing": 0, "state": state}
+    )
+    assert "Recipe 3_scrambledeggs [3_scrambledeggs]" in result
+    assert "missing nothing" in result
+
+    result = await tools.check_ingredients.ainvoke(
+        {"ingredients": [], "recipe_id": "2_chocolatecake", "state": state}
+    )
+    assert "missing Cocoa, Eggs, Flour, Sugar" in result
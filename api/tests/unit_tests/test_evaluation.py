@@ -0,0 +1,113 @@
+import asyncio
+import re
+import zlib
+
+import numpy as np
+import pytest
+from langchain_chroma.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_graph_retriever.transformers import ShreddingTransformer
+
+from chef_agent.adjacency import adjacency_path_for, build_adjacency_index
+from chef_agent.cache import TieredCache
+from chef_agent.evaluation import (
+    SettingResult,
+    evaluate,
+    load_qa_examples,
+    mark_frontier,
+)
+from chef_agent.retrieval import RetrieverSettings, load_retriver
+
+DISHES = ["Soup", "Salad", "Pie", "Stew", "Bake", "Tart"]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors, so questions land next to their QA document."""
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(64)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % 64] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+@pytest.fixture
+def base_retriever(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "chef_agent.embeddings.get_embedding_cache", lambda: TieredCache(memory_size=64)
+    )
+    docs = []
+    for i, dish in enumerate(DISHES * 3):
+        source_id = f"{i}_recipe"
+        docs.append(
+            Document(
+                id=source_id,
+                page_content=f"# Recipe {i}\n\n## Directions\n- Cook.",
+                metadata={"keywords": [dish], "source_id": source_id, "type": "recipe"},
+            )
+        )
+        docs.append(
+            Document(
+                id=f"qa{i}",
+                page_content=(
+                    f"\n<question>\nHow long does {dish.lower()} number {i} rest? \n</question>\n\n"
+                    "<answer>\nAn hour. \n</answer>\n"
+                ),
+                metadata={"source_id": source_id, "type": "question-answer"},
+            )
+        )
+    persist_directory = str(tmp_path / "db")
+    store = Chroma(
+        collection_name="eval",
+        embedding_function=BagOfWordsEmbeddings(),
+        persist_directory=persist_directory,
+    )
+    store.add_documents(list(ShreddingTransformer().transform_documents(docs)))
+    build_adjacency_index(
+        store._collection, adjacency_path_for(persist_directory, "eval")
+    )
+    settings = RetrieverSettings(
+        persist_directory=persist_directory,
+        collection_name="eval",
+        embedding_model="bow",
+    )
+    return load_retriver(settings, BagOfWordsEmbeddings())
+
+
+def test_evaluate_reports_recall_and_store_calls(base_retriever) -> None:
+    examples = load_qa_examples(base_retriever.store.vector_store._collection, limit=10)
+    assert len(examples) == 10
+    assert examples[0].question.startswith("How long does")
+
+    results = asyncio.run(
+        evaluate(base_retriever, examples, k=[3], start_k=[1], max_depth=[0, 1])
+    )
+    by_depth = {r.max_depth: r for r in results}
+    # Without traversal only the QA document itself is found.
+    assert by_depth[0].recall < 0.5
+    assert by_depth[0].store_calls_by_method == {"search": 1.0}
+    # One hop along `source_id` reaches the linked recipe. The adjacency index
+    # answers the expansion: only the selected recipes are fetched.
+    assert by_depth[1].recall == 1.0
+    assert by_depth[1].store_calls_by_method["search"] == 1.0
+    assert any(r.frontier for r in results)
+
+
+def _result(p50_ms: float, recall: float) -> SettingResult:
+    return SettingResult(
+        k=5, start_k=5, max_depth=1, questions=1, recall=recall, mrr=recall,
+        p50_ms=p50_ms, p95_ms=p50_ms, mean_ms=p50_ms, store_calls=1,
+    )  # fmt: skip
+
+
+def test_mark_frontier() -> None:
+    results = [_result(1, 0.5), _result(2, 0.4), _result(3, 0.8), _result(4, 0.8)]
+    mark_frontier(results)
+    assert [r.frontier for r in results] == [True, False, True, False]
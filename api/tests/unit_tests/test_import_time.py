@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+LAZY_MODULES = (
+    "chromadb",
+    "langchain_chroma",
+    "langchain_openai",
+    "openai",
+    "langchain_community",
+    "sentence_transformers",
+    "graph_retriever",
+    "langchain_graph_retriever",
+)
+"""Modules that must only be imported when first used, not at graph import."""
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of every module imported."""
+    env = {**os.environ, "CHEF_AGENT_CHECKPOINTER": "memory"}
+    env.pop("CHEF_AGENT_WARM_RETRIEVER", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["chef_agent", "react_agent"])
+def test_graph_import_skips_provider_and_vector_store_modules(module) -> None:
+    times = _import_times(module)
+    eager = sorted(
+        name
+        for name in times
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    slowest = sorted(times.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    assert not eager, f"{module} imports {eager} eagerly; slowest imports: {slowest}"
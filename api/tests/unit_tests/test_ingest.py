@@ -0,0 +1,240 @@
+import json
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+from chef_agent.ingest import BatchEmbedder, ChromaWriter, IngestSettings, aingest  # noqa: E402
+from chef_agent.ingest.transforms import prepare_recipes  # noqa: E402
+
+
+def _recipes() -> "pd.DataFrame":
+    rows = [
+        (0, "Salmon Bake", ["1 salmon", "salt"], ["Bake."], ["salmon", "salt", "a"]),
+        (1, "No-Bake Cookies", ["oats"], ["Mix.", "Chill."], ['"oats"', "oats"]),
+        (2, "Salmon Bake", ["dup"], ["dup"], ["dup"]),
+        (3, None, ["x"], ["x"], ["x"]),
+    ]
+    return pd.DataFrame(
+        {
+            "Unnamed: 0": [r[0] for r in rows],
+            "title": [r[1] for r in rows],
+            "ingredients": [json.dumps(r[2]) for r in rows],
+            "directions": [json.dumps(r[3]) for r in rows],
+            "NER": [json.dumps(r[4]) for r in rows],
+        }
+    )
+
+
+_QA = json.dumps(
+    [
+        {
+            "id": "q1",
+            "question": "How long?",
+            "answers": {"text": "Ten minutes", "answer_start": 0},
+            "context": "Salmon Bake\nBake it.",
+        }
+    ]
+)
+
+
+def test_prepare_recipes_matches_notebook_format() -> None:
+    seen: set[str] = set()
+    recipes = prepare_recipes(_recipes(), seen)
+    assert list(recipes["source_id"]) == ["0_salmonbake", "1_nobakecookies"]
+    assert recipes["md"].iloc[0] == (
+        "# Salmon Bake\n\n## Ingredients\n- 1 salmon\n- salt\n\n## Directions\n- Bake.\n"
+    )
+    assert list(recipes["keywords"]) == [["Salmon", "Salt"], ["Oats"]]
+    # Titles seen in earlier chunks are skipped.
+    assert prepare_recipes(_recipes(), seen).empty
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.mark.asyncio
+async def test_batch_embedder_retries_rate_limits() -> None:
+    class Flaky(DeterministicFakeEmbedding):
+        calls: int = 0
+
+        async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+            self.calls += 1
+            if self.calls == 2:
+                raise RateLimitError()
+            return self.embed_documents(texts)
+
+    embedder = BatchEmbedder(
+        Flaky(size=4), batch_size=2, max_concurrency=1, initial_backoff=0.001
+    )
+    texts = [f"text {i}" for i in range(5)]
+    vectors = await embedder.aembed(texts)
+    assert vectors == DeterministicFakeEmbedding(size=4).embed_documents(texts)
+    assert embedder.rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_writes_recipes_and_qa(tmp_path) -> None:
+    recipes_path = tmp_path / "recipes.parquet"
+    _recipes().to_parquet(recipes_path)
+    qa_path = tmp_path / "qa.json"
+    qa_path.write_text(_QA)
+    writer = ChromaWriter(str(tmp_path / "db"), "test")
+    stats = await aingest(
+        IngestSettings(
+            recipes_path=str(recipes_path),
+            qa_path=str(qa_path),
+            persist_directory=str(tmp_path / "db"),
+            chunk_size=2,
+        ),
+        embeddings=DeterministicFakeEmbedding(size=4),
+        writer=writer,
+    )
+    assert (stats.recipes, stats.qa, stats.skipped) == (2, 1, 2)
+    stored = writer.collection.get(ids=["0_salmonbake", "q1"])
+    metadata = dict(zip(stored["ids"], stored["metadatas"]))
+    assert metadata["0_salmonbake"]['keywords→"Salmon"'] == "§"
+    assert metadata["q1"]["source_id"] == "0_salmonbake"
+
+
+@pytest.mark.asyncio
+async def test_incremental_ingest_resumes_and_only_embeds_changes(tmp_path) -> None:
+    class FailingWriter(ChromaWriter):
+        fail_after: int | None = None
+
+        def upsert(self, documents, embeddings) -> None:
+            if self.fail_after is not None:
+                if self.fail_after == 0:
+                    raise RuntimeError("interrupted")
+                self.fail_after -= 1
+            super().upsert(documents, embeddings)
+
+    recipes_path = tmp_path / "recipes.parquet"
+    recipes = _recipes()
+    recipes.to_parquet(recipes_path)
+    settings = IngestSettings(
+        recipes_path=str(recipes_path),
+        persist_directory=str(tmp_path / "db"),
+        chunk_size=1,
+    )
+    embeddings = DeterministicFakeEmbedding(size=4)
+    writer = FailingWriter(settings.persist_directory, settings.collection_name)
+
+    writer.fail_after = 1
+    with pytest.raises(RuntimeError):
+        await aingest(settings, embeddings=embeddings, writer=writer)
+    assert writer.count() == 1
+
+    writer.fail_after = None
+    stats = await aingest(settings, embeddings=embeddings, writer=writer)
+    assert stats.resumed
+    assert (stats.written, stats.unchanged) == (1, 1)
+
+    stats = await aingest(settings, embeddings=embeddings, writer=writer)
+    assert not stats.resumed
+    assert (stats.written, stats.unchanged, stats.embedding_requests) == (0, 2, 0)
+
+    recipes = recipes.drop(index=1)
+    recipes.loc[0, "directions"] = json.dumps(["Bake for 20 minutes."])
+    recipes.to_parquet(recipes_path)
+    stats = await aingest(settings, embeddings=embeddings, writer=writer)
+    assert (stats.written, stats.unchanged, stats.deleted) == (1, 0, 1)
+    assert writer.collection.get()["ids"] == ["0_salmonbake"]
+
+
+def test_similar_pairs_matches_brute_force() -> None:
+    import numpy as np
+
+    from chef_agent.ingest.keywords import normalize_rows, similar_pairs
+
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(40, 8)).astype(np.float32)
+    vectors = np.concatenate([base, base[:10] + 1e-4, np.zeros((2, 8))])
+    normalized, _ = normalize_rows(vectors)
+    sims = normalized @ normalized.T
+    expected = {(i, j) for i, j in zip(*np.nonzero(sims > 0.99)) if i < j}
+
+    for workers in (1, 2):
+        pairs = similar_pairs(vectors, 0.99, block_size=16, workers=workers)
+        assert {tuple(p) for p in pairs.tolist()} == expected
+    assert len(expected) >= 10
+
+
+def test_keyword_groups_merge_similar_names() -> None:
+    import numpy as np
+
+    from chef_agent.ingest.keywords import keyword_groups
+
+    vectors = {
+        "Powdered sugar": [1.0, 0.0, 0.0],
+        "Powder sugar": [1.0, 0.001, 0.0],
+        "Butter": [0.0, 1.0, 0.0],
+    }
+
+    def vectorize(names):
+        return np.array([vectors.get(n, [0.0, 0.0, 0.0]) for n in names])
+
+    recipes = pd.DataFrame(
+        {
+            "source_id": ["1_a", "2_b", "3_c"],
+            "ner": [["powdered sugar", "butter"], ["Powder sugar"], ["xyzzy", "a"]],
+        }
+    )
+    groups = keyword_groups(recipes, vectorize, workers=1)
+    keywords = {
+        sid: sorted(names)
+        for sid, names in zip(groups["source_id"], groups["cleaned_ner"])
+    }
+    assert keywords == {
+        "1_a": ["Butter", "Powder sugar", "Powdered sugar"],
+        "2_b": ["Powder sugar", "Powdered sugar"],
+    }
+
+
+def test_writer_rejects_embeddings_of_another_dimension(tmp_path) -> None:
+    from langchain_core.documents import Document
+
+    writer = ChromaWriter(str(tmp_path / "db"), "test")
+    assert writer.dimension() is None
+    writer.upsert([Document(id="a", page_content="a")], [[0.1, 0.2, 0.3]])
+
+    reopened = ChromaWriter(str(tmp_path / "db"), "test")
+    assert reopened.dimension() == 3
+    with pytest.raises(ValueError, match="3-dimensional"):
+        reopened.upsert([Document(id="b", page_content="b")], [[0.1] * 8])
+    assert reopened.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_partial_ingest_only_deletes_slices_it_covered(tmp_path) -> None:
+    recipes_path = tmp_path / "recipes.parquet"
+    _recipes().to_parquet(recipes_path)
+    qa_path = tmp_path / "qa.json"
+    qa_path.write_text(_QA)
+    settings = IngestSettings(
+        recipes_path=str(recipes_path),
+        qa_path=str(qa_path),
+        persist_directory=str(tmp_path / "db"),
+        chunk_size=2,
+    )
+    embeddings = DeterministicFakeEmbedding(size=4)
+    writer = ChromaWriter(settings.persist_directory, settings.collection_name)
+    await aingest(settings, embeddings=embeddings, writer=writer)
+    assert writer.count() == 3
+
+    # A smaller limit and no QA file: nothing was covered in full.
+    settings.limit, settings.qa_path = 1, None
+    stats = await aingest(settings, embeddings=embeddings, writer=writer)
+    assert (stats.unchanged, stats.deleted) == (1, 0)
+    assert writer.count() == 3
+
+    # Reading every recipe again removes the recipes that are gone, but not QA.
+    _recipes().drop(index=1).to_parquet(recipes_path)
+    settings.limit = None
+    stats = await aingest(settings, embeddings=embeddings, writer=writer)
+    assert stats.deleted == 1
+    assert sorted(writer.collection.get()["ids"]) == ["0_salmonbake", "q1"]
@@ -0,0 +1,126 @@
+import sys
+from types import SimpleNamespace
+
+import chromadb
+import pytest
+from langchain_core.documents import Document
+
+from chef_agent.cache import LRUCache
+from chef_agent.lexical import LexicalIndex, build_lexical_index, rrf_fuse, tokenize
+
+RECIPES = {
+    "1_spinachquiche": (
+        "Spinach Quiche",
+        ["4 eggs", "1 c. spinach", "pie crust"],
+        ["Eggs", "Spinach"],
+    ),
+    "2_chocolatecake": (
+        "Chocolate Cake",
+        ["2 eggs", "cocoa", "sugar"],
+        ["Eggs", "Cocoa", "Sugar"],
+    ),
+    "3_greensalad": (
+        "Green Salad",
+        ["lettuce", "spinach leaves"],
+        ["Lettuce", "Spinach"],
+    ),
+    "4_tomatosoup": ("Tomato Soup", ["tomatoes", "onion"], ["Tomatoes", "Onion"]),
+}
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "db"))
+    collection = client.get_or_create_collection("test")
+    ids = list(RECIPES)
+    collection.add(
+        ids=ids + ["qa1"],
+        documents=[
+            f"# {title}\n\n## Ingredients\n- "
+            + "\n- ".join(ingredients)
+            + "\n\n## Directions\n- Eggs."
+            for title, ingredients, _ in RECIPES.values()
+        ]
+        + ["<question>eggs spinach?</question>"],
+        metadatas=[
+            {
+                "source_id": i,
+                "type": "recipe",
+                **{f'keywords→"{k}"': "§" for k in keywords},
+            }
+            for i, (_, _, keywords) in RECIPES.items()
+        ]
+        + [{"source_id": "1_spinachquiche", "type": "question-answer"}],
+        embeddings=[[float(i), 1.0] for i in range(5)],
+    )
+    return collection
+
+
+def test_tokenize_normalizes_plurals_and_stopwords() -> None:
+    assert tokenize("What can I make with Eggs, tomatoes and berries?") == [
+        "egg",
+        "tomato",
+        "berry",
+    ]
+
+
+def test_lexical_index_ranks_ingredient_matches(collection, tmp_path) -> None:
+    assert build_lexical_index(collection, tmp_path / "bm25", page_size=2) == 4
+    index = LexicalIndex(tmp_path / "bm25")
+
+    hits = index.search("what can I make with eggs and spinach", k=3)
+    assert [doc_id for doc_id, _ in hits][:1] == ["1_spinachquiche"]
+    assert {doc_id for doc_id, _ in hits} == {
+        "1_spinachquiche",
+        "2_chocolatecake",
+        "3_greensalad",
+    }
+    # Directions are not indexed.
+    assert index.search("tomato", k=5) == index.search("tomatoes", k=5)
+    assert index.search("saffron") == []
+
+
+def test_rrf_fuse_rewards_agreement() -> None:
+    fused = rrf_fuse([["a", "b", "c"], ["c", "d"]], k=1)
+    assert [item for item, _ in fused] == ["c", "a", "b", "d"]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_retrieve_fuses_graph_and_lexical(
+    collection, tmp_path, monkeypatch
+) -> None:
+    build_lexical_index(collection, tmp_path / "bm25")
+    retrieval = sys.modules["chef_agent.retrieval"]
+
+    async def ainvoke(query):
+        return [
+            Document(id="4_tomatosoup", page_content="# Tomato Soup"),
+            Document(id="3_greensalad", page_content="# Green Salad"),
+        ]
+
+    async def aget_by_ids(ids):
+        metadata = {'keywords→"Eggs"': "§", "__shredded_keys": '["keywords"]'}
+        return [
+            Document(id=i, page_content=f"# {RECIPES[i][0]}", metadata=dict(metadata))
+            for i in ids
+        ]
+
+    fake = SimpleNamespace(
+        ainvoke=ainvoke,
+        adapter=SimpleNamespace(vector_store=SimpleNamespace(aget_by_ids=aget_by_ids)),
+    )
+    monkeypatch.setattr(retrieval, "_retrievers", LRUCache())
+    retrieval._retrievers.set(repr(retrieval.DEFAULT_SETTINGS), fake)
+    monkeypatch.setitem(
+        retrieval._lexical_indexes,
+        (retrieval.PERSIST_DIRECTORY, retrieval.COLLECTION_NAME),
+        LexicalIndex(tmp_path / "bm25"),
+    )
+
+    docs = await retrieval.ahybrid_retrieve("salad", ["eggs", "spinach"], k=3)
+    ids = [doc.id for doc in docs]
+    assert ids[0] == "3_greensalad"
+    assert len(ids) == 3 and "1_spinachquiche" in ids
+    fetched = next(doc for doc in docs if doc.id == "1_spinachquiche")
+    assert fetched.metadata["keywords"] == ["Eggs"]
+    assert fetched.metadata["_lexical_score"] > 0
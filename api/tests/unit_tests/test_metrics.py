@@ -0,0 +1,115 @@
+import itertools
+import urllib.request
+from dataclasses import dataclass, field
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph
+
+from chef_agent import metrics
+from chef_agent.metrics import (
+    LLM_TOKENS,
+    NODE_DURATION,
+    NODE_ERRORS,
+    MetricsRegistry,
+    render_prometheus,
+    serve_metrics,
+)
+
+
+def test_render_prometheus_text_format() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls.", ["tool"])
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=[0.1, 1])
+    counter.inc(tool="search")
+    counter.inc(2, tool='say "hi"')
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    assert registry.render() == (
+        "# HELP calls_total Calls.\n"
+        "# TYPE calls_total counter\n"
+        'calls_total{tool="say \\"hi\\""} 2\n'
+        'calls_total{tool="search"} 1\n'
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 2\n'
+        "latency_seconds_sum 0.55\n"
+        "latency_seconds_count 2\n"
+    )
+    assert registry.counter("calls_total", "Calls.", ["tool"]) is counter
+    with pytest.raises(ValueError):
+        counter.inc(model="x")
+
+
+@dataclass
+class State:
+    messages: list = field(default_factory=list)
+
+
+@pytest.mark.asyncio
+async def test_graph_runs_record_node_durations_and_tokens() -> None:
+    NODE_DURATION.reset()
+    NODE_ERRORS.reset()
+    LLM_TOKENS.reset()
+    reply = AIMessage(
+        "Hello!",
+        usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15},
+    )
+    model = GenericFakeChatModel(messages=itertools.cycle([reply]))
+
+    async def answer(state: State, config) -> dict:
+        return {"messages": [await model.ainvoke("hi", config)]}
+
+    async def fail(state: State) -> dict:
+        raise RuntimeError("boom")
+
+    builder = StateGraph(State)
+    builder.add_node(answer)
+    builder.add_node(fail)
+    builder.add_edge("__start__", "answer")
+    builder.add_edge("answer", "fail")
+    with pytest.raises(RuntimeError):
+        await builder.compile().ainvoke({})
+
+    assert NODE_DURATION.count(node="answer") == 1
+    assert NODE_DURATION.count(node="fail") == 1
+    assert NODE_ERRORS.value(node="answer") == 0
+    assert NODE_ERRORS.value(node="fail") == 1
+    model_name = next(iter(LLM_TOKENS.values()))[1]
+    assert LLM_TOKENS.value(stage="answer", model=model_name, direction="input") == 12
+    assert LLM_TOKENS.value(stage="answer", model=model_name, direction="output") == 3
+    assert 'chef_node_duration_seconds_count{node="answer"} 1' in render_prometheus()
+
+
+def test_metrics_are_served_on_localhost_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("CHEF_AGENT_METRICS_HOST", raising=False)
+    server = serve_metrics(0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert b"# TYPE chef_node_duration_seconds histogram" in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_serve_metrics_is_idempotent_per_address(monkeypatch) -> None:
+    monkeypatch.delenv("CHEF_AGENT_METRICS_HOST", raising=False)
+    monkeypatch.setattr(metrics, "_servers", {})
+    probe = serve_metrics(0)
+    port = probe.server_address[1]
+    probe.shutdown()
+    probe.server_close()
+
+    server = serve_metrics(port)
+    try:
+        # e.g. the graph module imported again with CHEF_AGENT_METRICS_PORT set.
+        assert serve_metrics(port) is server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+import chromadb
+import pytest
+from langchain_chroma.vectorstores import Chroma
+
+from chef_agent import retrieval
+from chef_agent.cache import LRUCache
+from chef_agent.collection import INGEST_RUN_KEY
+from chef_agent.configuration import Configuration
+from chef_agent.retrieval import RetrieverSettings
+
+
+def test_retriever_is_built_once_per_settings(monkeypatch) -> None:
+    stores = []
+
+    def fake_load_store(settings, embeddings=None):
+        stores.append(object())
+        return stores[-1]
+
+    monkeypatch.setattr(retrieval, "load_store", fake_load_store)
+    monkeypatch.setattr(
+        retrieval, "build_retriever", lambda store, settings: (store, settings)
+    )
+    retrieval.invalidate_retriever()
+
+    first = retrieval.get_retriever()
+    assert asyncio.run(retrieval.aget_retriever()) is first
+    assert len(stores) == 1
+
+    # Other traversal settings share the store; another collection opens its own.
+    shallow = retrieval.get_retriever(RetrieverSettings(max_depth=1, strategy="mmr"))
+    assert shallow is not first and shallow[0] is first[0]
+    other = retrieval.get_retriever(RetrieverSettings(collection_name="other"))
+    assert other[0] is not first[0]
+    assert len(stores) == 2
+
+    retrieval.invalidate_retriever()
+    assert retrieval.get_retriever() is not first
+    assert len(stores) == 3
+
+    reloaded = retrieval.reload_retriever()
+    assert retrieval.get_retriever() is reloaded
+    assert len(stores) == 4
+    retrieval.invalidate_retriever()
+
+
+@pytest.fixture
+def chroma_stores(monkeypatch, tmp_path):
+    """Open stores as bare Chroma collections in `tmp_path`."""
+
+    def load_store(settings):
+        store = Chroma(
+            collection_name=settings.collection_name, persist_directory=str(tmp_path)
+        )
+        return SimpleNamespace(vector_store=store)
+
+    monkeypatch.setattr(retrieval, "load_store", load_store)
+    monkeypatch.setattr(retrieval, "build_retriever", lambda store, settings: store)
+    retrieval.invalidate_retriever()
+    yield tmp_path
+    retrieval.invalidate_retriever()
+
+
+def test_collection_version_changes_only_with_its_own_store(chroma_stores) -> None:
+    other = RetrieverSettings(collection_name="other")
+
+    retrieval.get_retriever()
+    version = retrieval.collection_version()
+    # Opening another collection leaves the cached results of this one valid.
+    retrieval.get_retriever(other)
+    assert retrieval.collection_version() == version
+
+    retrieval.reload_retriever(other)
+    assert retrieval.collection_version() != version
+    version = retrieval.collection_version()
+    retrieval.invalidate_retriever()
+    assert retrieval.collection_version() != version
+
+
+def test_collection_version_sees_writes_of_other_clients(chroma_stores) -> None:
+    retrieval.get_retriever()
+    version = retrieval.collection_version()
+    # Another client, e.g. `chef-ingest` in another process.
+    client = chromadb.PersistentClient(path=str(chroma_stores))
+    collection = client.get_collection(retrieval.COLLECTION_NAME)
+    collection.modify(metadata={INGEST_RUN_KEY: "next"})
+    assert retrieval.collection_version() != version
+    version = retrieval.collection_version()
+    collection.add(ids=["a"], embeddings=[[0.1, 0.2]])
+    assert retrieval.collection_version() != version
+
+
+def test_only_existing_collections_under_the_storage_root_are_opened(
+    monkeypatch, tmp_path
+) -> None:
+    opened = []
+    monkeypatch.setattr(retrieval, "STORAGE_ROOT", str(tmp_path / "root"))
+    monkeypatch.setattr(retrieval, "load_store", lambda s: opened.append(s) or s)
+    monkeypatch.setattr(retrieval, "build_retriever", lambda store, settings: store)
+    retrieval.invalidate_retriever()
+    (tmp_path / "root" / "db").mkdir(parents=True)
+
+    for directory in [tmp_path / "elsewhere", tmp_path / "root" / "db" / "..", "/"]:
+        with pytest.raises(ValueError, match="outside"):
+            retrieval.get_retriever(RetrieverSettings(persist_directory=str(directory)))
+    with pytest.raises(ValueError, match="does not exist"):
+        retrieval.get_retriever(
+            RetrieverSettings(persist_directory=str(tmp_path / "root" / "new"))
+        )
+    with pytest.raises(ValueError, match="outside"):
+        retrieval.get_coverage_index(RetrieverSettings(persist_directory="/tmp"))
+    assert opened == []
+    assert not (tmp_path / "root" / "new").exists()
+
+    settings = RetrieverSettings(persist_directory=str(tmp_path / "root" / "db"))
+    assert retrieval.get_retriever(settings) is settings
+    retrieval.invalidate_retriever()
+
+
+def test_open_stores_are_bounded(monkeypatch) -> None:
+    opened = []
+    monkeypatch.setattr(retrieval, "_stores", LRUCache(2))
+    monkeypatch.setattr(
+        retrieval, "load_store", lambda s: opened.append(s.collection_name) or s
+    )
+    monkeypatch.setattr(retrieval, "build_retriever", lambda store, settings: store)
+    retrieval.invalidate_retriever()
+
+    for name in ["a", "b", "c", "a"]:
+        retrieval.get_retriever(RetrieverSettings(collection_name=name, max_depth=1))
+    assert len(retrieval._stores) == 2
+    # "a" is still cached as a retriever; a new setting on it reopens the store.
+    retrieval.get_retriever(RetrieverSettings(collection_name="a", max_depth=2))
+    assert opened == ["a", "b", "c", "a"]
+    retrieval.invalidate_retriever()
+
+
+def test_configuration_retriever_settings() -> None:
+    assert Configuration().retriever_settings() == retrieval.DEFAULT_SETTINGS
+    settings = Configuration(
+        retrieval_k=4,
+        retrieval_strategy="mmr",
+        retrieval_max_depth=1,
+        retrieval_edges=["keywords"],
+    ).retriever_settings()
+    assert (settings.k, settings.strategy, settings.max_depth) == (4, "mmr", 1)
+    assert Configuration(max_search_results=20).retriever_settings().k == 5
+    assert settings.edges == ("keywords",)
+    assert type(settings.build_strategy()).__name__ == "Mmr"
+    assert retrieval.PERSIST_DIRECTORY.startswith("/")
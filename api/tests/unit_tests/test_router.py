@@ -0,0 +1,130 @@
+import sys
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chef_agent.router import classify, reset_route_hits, route_hits
+from chef_agent.state import ChefState
+
+RECIPES = [
+    Document(id="1_pancakes", page_content="# Pancakes", metadata={"type": "recipe"}),
+    Document(id="qa1", page_content="<question>", metadata={"type": "question-answer"}),
+    Document(id="2_waffles", page_content="# Waffles", metadata={"type": "recipe"}),
+]
+RECIPE_LIST = "Here are two recipes:\n1. **Pancakes**\n2. **Waffles**\n\nWhich one?"
+
+
+@pytest.mark.parametrize(
+    "text, route",
+    [
+        ("Thanks!", "smalltalk"),
+        ("hello", "smalltalk"),
+        ("2", "recipe_choice"),
+        ("7", "llm"),
+        ("What can I make with eggs, spinach and feta?", "ingredient_check"),
+        ("Find me some vegan lasagna recipes", "search"),
+        ("How do I make banana bread?", "search"),
+        ("chocolate chip cookie recipes", "search"),
+        ("How do I make it without eggs?", "llm"),
+        ("Can I swap butter for oil in this?", "llm"),
+        ("yes", "llm"),
+    ],
+)
+def test_classify(text, route) -> None:
+    previous = RECIPE_LIST if text.isdigit() else ""
+    assert classify(text, RECIPES, previous).route == route
+
+
+@pytest.mark.parametrize(
+    "text, previous, route",
+    [
+        ("2", RECIPE_LIST, "recipe_choice"),
+        ("2", "", "llm"),
+        ("2", "How many people are you cooking for?", "llm"),
+        ("ok", "Enjoy your pancakes!", "smalltalk"),
+        ("thanks", "", "smalltalk"),
+        ("ok", "Shall I make it vegan?", "llm"),
+        ("great", RECIPE_LIST, "llm"),
+    ],
+)
+def test_classify_depends_on_the_previous_reply(text, previous, route) -> None:
+    assert classify(text, RECIPES, previous).route == route
+
+
+def test_classify_extracts_arguments() -> None:
+    assert classify("2", RECIPES, RECIPE_LIST).recipe is RECIPES[2]
+    decision = classify("which recipes could I cook using rice & chicken plus peas")
+    assert decision.ingredients == ["rice", "chicken", "peas"]
+    assert (
+        classify("How do I make banana bread?").query == "How do I make banana bread?"
+    )
+
+
+def test_recipe_choice_matches_the_listed_title() -> None:
+    # The model lists recipes in its own order, not in the order of state.
+    reordered = (
+        "You could make:\n1. **Waffles**: crispy and golden\n"
+        "2. Pancakes, with maple syrup\n3. Crepes"
+    )
+    assert classify("1", RECIPES, reordered).recipe is RECIPES[2]
+    assert classify("2", RECIPES, reordered).recipe is RECIPES[0]
+    # No recipe in state has the listed title.
+    assert classify("3", RECIPES, reordered).route == "llm"
+
+    titled = [
+        Document(
+            id="a", page_content="x", metadata={"type": "recipe", "title": "Tacos"}
+        ),
+        Document(
+            id="b", page_content="y", metadata={"type": "recipe", "title": "Fish tacos"}
+        ),
+    ]
+    assert classify("1", titled, "1. Fish tacos\n2. Tacos").recipe is titled[1]
+    assert classify("2", titled, "1. Fish tacos\n2. Tacos").recipe is titled[0]
+
+
+@pytest.mark.asyncio
+async def test_route_turn_short_circuits_and_dispatches() -> None:
+    graph = sys.modules["chef_agent.graph"]
+    reset_route_hits()
+
+    command = await graph.route_turn(
+        ChefState(messages=[HumanMessage("thank you")]), {}
+    )
+    assert command.goto == "__end__"
+    assert isinstance(command.update["messages"][0], AIMessage)
+
+    state = ChefState(
+        messages=[HumanMessage("waffles"), AIMessage(RECIPE_LIST), HumanMessage("1")],
+        documents=RECIPES,
+    )
+    command = await graph.route_turn(state, {})
+    assert command.update["selected_recipe"] is RECIPES[0]
+
+    state = ChefState(
+        messages=[AIMessage("Do you have eggs?"), HumanMessage("ok")],
+        documents=RECIPES,
+    )
+    command = await graph.route_turn(state, {})
+    assert command.goto == "call_model"
+
+    command = await graph.route_turn(
+        ChefState(messages=[HumanMessage("how to bake sourdough")]), {}
+    )
+    assert command.goto == "tools"
+    (call,) = command.update["messages"][0].tool_calls
+    assert call["name"] == "search"
+    assert call["args"] == {"query": "how to bake sourdough"}
+
+    command = await graph.route_turn(
+        ChefState(messages=[HumanMessage("Thanks!")]),
+        {"configurable": {"use_fast_router": False}},
+    )
+    assert command.goto == "call_model"
+    assert route_hits() == {
+        "smalltalk": 1,
+        "recipe_choice": 1,
+        "llm": 1,
+        "search": 1,
+    }
@@ -0,0 +1,43 @@
+from langchain_core.documents import Document
+
+from chef_agent import state
+from chef_agent.state import reduce_docs
+
+
+def _doc(doc_id: str, content: str = "# Salmon Bake\n\n## Ingredients") -> Document:
+    return Document(
+        id=doc_id,
+        page_content=content,
+        metadata={"type": "recipe", "source_id": doc_id, "keywords": ["salmon"]},
+    )
+
+
+def test_reduce_docs_deduplicates_and_compacts() -> None:
+    docs = reduce_docs([_doc("a"), _doc("b")], [_doc("a")])
+    assert [d.id for d in docs] == ["b", "a"]
+    assert docs[-1].metadata == {
+        "type": "recipe",
+        "source_id": "a",
+        "title": "Salmon Bake",
+    }
+    assert reduce_docs(docs, "delete") == []
+
+
+def test_reduce_docs_is_bounded(monkeypatch) -> None:
+    monkeypatch.setattr(state, "MAX_STATE_DOCUMENTS", 3)
+    docs = reduce_docs([], [_doc(str(i)) for i in range(5)])
+    assert [d.id for d in docs] == ["2", "3", "4"]
+
+    monkeypatch.setattr(state, "MAX_STATE_DOCUMENT_CHARS", 15)
+    docs = reduce_docs(docs, [_doc("big", "x" * 10)])
+    assert [d.id for d in docs] == ["big"]
+
+
+def test_compact_document_converts_numpy_scores() -> None:
+    import numpy as np
+
+    doc = Document(
+        id="1", page_content="# Pie", metadata={"_similarity_score": np.float64(0.5)}
+    )
+    score = state.compact_document(doc).metadata["_similarity_score"]
+    assert type(score) is float and score == 0.5
@@ -0,0 +1,71 @@
+import itertools
+import sys
+from dataclasses import dataclass, field
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph
+
+from chef_agent.streaming import astream_events
+
+
+@dataclass
+class State:
+    answer: list = field(default_factory=list)
+
+
+def _fake_model(text: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.cycle([AIMessage(text)]))
+
+
+@pytest.mark.asyncio
+async def test_stream_sources_explanations_then_answer_tokens(monkeypatch) -> None:
+    tools = sys.modules["chef_agent.tools"]
+    monkeypatch.setattr(
+        tools, "load_chat_model", lambda model: _fake_model("Relevant.")
+    )
+    docs = [
+        Document(id="1_pie", page_content="# Apple Pie\n", metadata={"type": "recipe"}),
+        Document(
+            id="2_tart", page_content="# Pear Tart\n", metadata={"type": "recipe"}
+        ),
+    ]
+    answer_model = _fake_model("Try the apple pie.")
+
+    async def search(state: State, config) -> dict:
+        tools._stream_sources(docs)
+        await tools.source_explaination("pie?", docs, config)
+        return {}
+
+    async def call_model(state: State, config) -> dict:
+        return {"answer": [await answer_model.ainvoke("pie?", config)]}
+
+    builder = StateGraph(State)
+    builder.add_node(search)
+    builder.add_node(call_model)
+    builder.add_edge("__start__", "search")
+    builder.add_edge("search", "call_model")
+    graph = builder.compile()
+
+    events = [
+        event
+        async for event in astream_events(
+            graph, {}, {"configurable": {"use_explaination_cache": False}}
+        )
+    ]
+    assert events[0] == {
+        "event": "sources",
+        "sources": [
+            {"id": "1_pie", "title": "Apple Pie", "type": "recipe"},
+            {"id": "2_tart", "title": "Pear Tart", "type": "recipe"},
+        ],
+    }
+    assert sorted(e["source_id"] for e in events[1:3]) == ["1_pie", "2_tart"]
+    for event in events[1:3]:
+        assert event["event"] == "explaination"
+        assert event["explaination"] == "Relevant."
+    tokens = events[3:]
+    assert len(tokens) > 1 and {e["event"] for e in tokens} == {"token"}
+    assert "".join(e["content"] for e in tokens) == "Try the apple pie."
@@ -0,0 +1,140 @@
+import asyncio
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from chef_agent import tools
+from chef_agent.cache import TieredCache
+
+DOCS = [
+    Document(
+        id=f"{i}_{dish}",
+        page_content=f"# {dish.title()}\n",
+        metadata={"type": "recipe"},
+    )
+    for i, dish in enumerate(["pie", "tart", "stew", "soup", "bake", "salad"], start=1)
+]
+
+
+class ProbeChatModel(BaseChatModel):
+    """Answers "Relevant <n>." and records how many calls were in flight at once."""
+
+    batch_response: Any = None
+    calls: int = 0
+    active: int = 0
+    peak: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "probe"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        call = self.calls
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        message = AIMessage(f"Relevant {call}.")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(_: Any) -> Any:
+            if isinstance(self.batch_response, Exception):
+                raise self.batch_response
+            return self.batch_response
+
+        return RunnableLambda(respond)
+
+
+def _config(**configurable: Any) -> dict[str, Any]:
+    return {"configurable": {"use_explaination_cache": False, **configurable}}
+
+
+@pytest.fixture
+def model(monkeypatch) -> ProbeChatModel:
+    probe = ProbeChatModel()
+    monkeypatch.setattr(tools, "load_chat_model", lambda model: probe)
+    return probe
+
+
+@pytest.mark.asyncio
+async def test_per_source_explanations_respect_the_concurrency_cap(model) -> None:
+    config = _config(explaination_mode="per_source", max_explaination_concurrency=2)
+    explained = await tools.source_explaination("pie?", DOCS, config)
+    assert model.calls == len(DOCS)
+    assert model.peak == 2
+    # Results keep the order of the documents, whatever order they complete in.
+    assert [e["docs"].id for e in explained] == [doc.id for doc in DOCS]
+
+
+@pytest.mark.asyncio
+async def test_batched_explanations_map_source_ids_back_to_documents(model) -> None:
+    docs = DOCS[:4]
+    model.batch_response = {
+        "explainations": [
+            {"source_id": "3_stew", "explaination": "Stew fits."},
+            {"source_id": "1_pie", "explaination": "Pie fits."},
+            # Misnumbered: not one of the provided sources.
+            {"source_id": "7_cake", "explaination": "Cake fits."},
+        ]
+    }
+    explained = await tools.source_explaination(
+        "pie?", docs, _config(explaination_mode="batched")
+    )
+    assert [e["docs"].id for e in explained] == [doc.id for doc in docs]
+    assert explained[0]["explaination"] == "Pie fits."
+    assert explained[2]["explaination"] == "Stew fits."
+    # The two sources the batch did not cover fall back to one request each.
+    assert model.calls == 2
+    assert {explained[1]["explaination"], explained[3]["explaination"]} == {
+        "Relevant 1.",
+        "Relevant 2.",
+    }
+
+
+@pytest.mark.asyncio
+async def test_batched_explanations_fall_back_when_the_batch_fails(model) -> None:
+    model.batch_response = OutputParserException("not json")
+    docs = DOCS[:3]
+    explained = await tools.source_explaination(
+        "pie?", docs, _config(explaination_mode="batched")
+    )
+    assert model.calls == len(docs)
+    assert [e["docs"].id for e in explained] == [doc.id for doc in docs]
+    assert all(e["explaination"].startswith("Relevant") for e in explained)
+
+
+@pytest.mark.asyncio
+async def test_explanations_are_cached_per_mode(model, monkeypatch) -> None:
+    cache = TieredCache(memory_size=16)
+    monkeypatch.setattr(tools, "get_explaination_cache", lambda: cache)
+    docs = DOCS[:2]
+    model.batch_response = {
+        "explainations": [
+            {"source_id": doc.id, "explaination": f"Batched {doc.id}."} for doc in docs
+        ]
+    }
+    per_source = {"use_explaination_cache": True, "explaination_mode": "per_source"}
+    batched = {"use_explaination_cache": True, "explaination_mode": "batched"}
+
+    first = await tools.source_explaination("pie?", docs, _config(**per_source))
+    assert model.calls == 2
+    # The batched prompt produces different text: per-source entries are not reused.
+    explained = await tools.source_explaination("pie?", docs, _config(**batched))
+    assert [e["explaination"] for e in explained] == [
+        "Batched 1_pie.",
+        "Batched 2_tart.",
+    ]
+    again = await tools.source_explaination("pie?", docs, _config(**per_source))
+    assert model.calls == 2
+    assert [e["explaination"] for e in again] == [e["explaination"] for e in first]
@@ -0,0 +1,67 @@
+from chef_agent import utils
+
+
+class _StubModel:
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.bound = []
+
+    def bind_tools(self, tools):
+        self.bound.append(tools)
+        return ("bound", self, tuple(tools))
+
+
+def test_load_chat_model_is_cached(monkeypatch) -> None:
+    created = []
+
+    def fake_init(model, model_provider, **kwargs):
+        created.append((model_provider, model, kwargs))
+        return _StubModel(model)
+
+    monkeypatch.setattr(utils, "init_chat_model", fake_init)
+    monkeypatch.setattr(utils, "MODEL_CACHE_SIZE", 2)
+    utils.clear_model_cache()
+
+    first = utils.load_chat_model("openai/gpt-4o-mini")
+    assert utils.load_chat_model("openai/gpt-4o-mini") is first
+    assert utils.load_chat_model("openai/gpt-4o-mini", temperature=0) is not first
+    assert len(created) == 2
+
+    def search():
+        """Search."""
+
+    bound = utils.load_chat_model_with_tools("openai/gpt-4o-mini", [search])
+    assert utils.load_chat_model_with_tools("openai/gpt-4o-mini", [search]) is bound
+    assert first.bound == [[search]]
+
+    # Least recently used entries are evicted once the registry is full.
+    utils.load_chat_model("anthropic/claude-3-5-sonnet-latest")
+    assert utils.load_chat_model("openai/gpt-4o-mini") is not first
+    utils.clear_model_cache()
+
+
+def test_format_docs_renders_compact_templates(capsys) -> None:
+    from langchain_core.documents import Document
+
+    recipe = Document(
+        id="1487_salmonbake",
+        page_content="# Salmon Bake\n\n## Ingredients\n- salmon",
+        metadata={
+            "type": "recipe",
+            "source_id": "1487_salmonbake",
+            "keywords": ["salmon"],
+        },
+    )
+    qa = Document(
+        id="qa-1",
+        page_content="\n<question>\nHow long? \n</question>\n\n<answer>\n20 minutes \n</answer>\n\n<context>\n# Salmon Bake\n</context>\n",
+        metadata={"type": "question-answer", "source_id": "1487_salmonbake"},
+    )
+
+    context = utils.format_docs([recipe, qa])["context"]
+    assert context == (
+        "[recipe 1487_salmonbake]\n# Salmon Bake\n\n## Ingredients\n- salmon\n\n"
+        "[question-answer qa-1 for recipe 1487_salmonbake]\nQ: How long?\nA: 20 minutes"
+    )
+    assert utils.format_doc(recipe) is utils.format_doc(recipe)
+    assert capsys.readouterr().out == ""